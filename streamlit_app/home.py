@@ -1,15 +1,26 @@
+import json
 import streamlit as st
-from services.data_loader import load_data
+from services.api_client import API_BASE_URL
+from services.tracing import start_trace, traced_request
 import requests 
 
 
 # --- Django API URLs ---
-DJANGO_API_BASE_URL = "http://127.0.0.1:8000/api/"
+DJANGO_API_BASE_URL = API_BASE_URL
 SEARCH_API = DJANGO_API_BASE_URL + "search_brands/"
 PROCESS_API = DJANGO_API_BASE_URL + "process_data/"
 ENGAGEMENT_API = DJANGO_API_BASE_URL + "engagement_scores/"
 FORECAST_API = DJANGO_API_BASE_URL + "forecast_trends/"
 DELETE_FILES_API = DJANGO_API_BASE_URL + "delete_files/"
+PIPELINE_API = DJANGO_API_BASE_URL + "pipeline/"
+STREAM_TIMEOUT = 60  # seconds without any event (the server sends keep-alives) before giving up
+
+STAGE_LABELS = {
+    "process_data": "Processing tweets",
+    "engagement_scores": "Calculating engagement scores",
+    "forecast_trends": "Forecasting trends",
+}
+STAGE_ICONS = {"pending": "⏳", "running": "🔄", "done": "✅", "failed": "❌", "cancelled": "⛔", "skipped": "⏭️"}
 
 # --- Streamlit Page Config ---
 st.set_page_config(
@@ -17,6 +28,7 @@ st.set_page_config(
     page_icon="📊",
     layout="wide"
 )
+start_trace("home")
 
 # --- Header ---
 st.markdown(
@@ -36,11 +48,11 @@ input_string = st.text_input("Enter brand names separated by commas:")
 def call_api(endpoint, payload=None, method="GET"):
     try:
         if method == "POST":
-            response = requests.post(endpoint, json=payload)
+            response = traced_request("POST", endpoint, json=payload)
         else:
-            response = requests.get(endpoint)
+            response = traced_request("GET", endpoint)
         
-        if response.status_code == 200:
+        if response.status_code in (200, 202):
             return response.json()
         else:
             st.error(f" API Error: {response.json().get('error', 'Unknown Error')}")
@@ -74,78 +86,70 @@ if input_string:
         st.warning(f"⚠️ Brands not found: {', '.join(not_available)}")
 
     # --- Track Processing State ---
-    if "processing" not in st.session_state:
-        st.session_state.processing = False
-
-    if "stop_processing" not in st.session_state:
-        st.session_state.stop_processing = False
-
-    def run_pipeline():
-        """Function to run the data processing pipeline with a proper progress bar."""
-        st.session_state.processing = True  
-        st.session_state.stop_processing = False 
-
-        with st.spinner("Processing data..."):
-            progress_bar = st.progress(0)
-            total_steps = 5  
-            step_size = 100 // total_steps  # Percentage increment per step
-
-            # Helper function to update progress
-            def update_progress(step, message="Processing..."):
-                progress_value = step * step_size
-                progress_bar.progress(progress_value)
-                st.write(f"🔄 {message}")
-
-            # Step 1: Process tweets
-            update_progress(1, "Processing tweets...")
-            process_response = call_api(PROCESS_API, {"brands": valid_brands}, method="POST")
-            if process_response:
-                st.success("✅ Data processing complete!")
-            else:
-                st.error("❌ Error processing data.")
-                return  # Stop execution if API fails
-
-            # Step 2: Fetch engagement scores
-            update_progress(2, "Fetching engagement scores...")
-            engagement_response = call_api(ENGAGEMENT_API)
-            if engagement_response:
-                st.success("✅ Engagement scores retrieved!")
-            else:
-                st.error("❌ Error fetching engagement scores.")
-                return  # Stop execution if API fails
-
-            # Step 3: Forecast trends
-            update_progress(3, "Forecasting trends...")
-            forecast_response = call_api(FORECAST_API, {"brands": valid_brands}, method="POST")
-            if forecast_response:
-                st.success("✅ Trend forecasting complete!")
-            else:
-                st.error("❌ Error forecasting trends.")
-                return  # Stop execution if API fails
-
-            # Step 4: Final processing and cleanup (if applicable)
-            update_progress(4, "Finalizing data processing...")
-            # Simulate additional processing steps if needed
-            st.write("🔄 Finalizing results...")
-
-            # Step 5: Mark completion
-            update_progress(5, "Pipeline completed!")
-            st.success("🎉 Data processing pipeline completed successfully!")
-
-        # Reset processing state
-        st.session_state.processing = False
+    if "job_id" not in st.session_state:
+        st.session_state.job_id = None
+
+    def start_pipeline():
+        """Submit the whole pipeline as one background job on the Django side."""
+        job = call_api(PIPELINE_API, {"brands": valid_brands}, method="POST")
+        if job:
+            st.session_state.job_id = job["job_id"]
+
+    def job_updates(job_id):
+        """Yield the job's state from the server's NDJSON event stream each time it changes."""
+        with traced_request("GET", f"{PIPELINE_API}{job_id}/events/", params={"format": "ndjson"},
+                            stream=True, timeout=STREAM_TIMEOUT) as response:
+            if response.status_code != 200:
+                st.error(f" API Error: {response.json().get('error', 'Unknown Error')}")
+                return
+            for line in response.iter_lines():
+                if line:  # empty lines are keep-alives
+                    yield json.loads(line)
+
+    def follow_pipeline(job_id):
+        """Show real per-stage progress, streamed from the server, until the job finishes."""
+        progress_bar = st.progress(0)
+        stage_lines = st.empty()
+
+        job = None
+        try:
+            for job in job_updates(job_id):
+                progress_bar.progress(int(job["progress"] * 100))
+                lines = []
+                for stage in job["stages"]:
+                    label = STAGE_LABELS.get(stage["name"], stage["name"])
+                    timing = f" ({stage['seconds']:.1f}s)" if stage["seconds"] is not None else ""
+                    message = f" — {stage['message']}" if stage["message"] else ""
+                    eta = f", about {stage['eta_seconds']:.0f}s left" if stage["status"] == "running" and stage["eta_seconds"] else ""
+                    lines.append(f"{STAGE_ICONS.get(stage['status'], '')} {label}{timing}{message}{eta}")
+                stage_lines.markdown("  \n".join(lines))
+        except requests.exceptions.RequestException as e:
+            st.error(f"Network Error: {e}")
+
+        st.session_state.job_id = None
+        if job is None or job["status"] not in ("done", "failed", "cancelled"):
+            return
+        if job["status"] == "done":
+            st.success(f"🎉 Data processing pipeline completed in {job['seconds']:.1f}s!")
+        elif job["status"] == "cancelled":
+            st.warning("⛔ Pipeline stopped.")
+        else:
+            st.error(f"❌ Pipeline failed: {job['error']}")
 
 
     # --- Display UI ---
     st.markdown("### 🔄 Start Data Processing Pipeline")
     col1, col2 = st.columns([3, 1])
+    processing = st.session_state.job_id is not None
 
-    if col1.button("🚀 Run Data Processing", disabled=st.session_state.processing):
-        run_pipeline()
+    if col1.button("🚀 Run Data Processing", disabled=processing):
+        start_pipeline()
 
-    if st.session_state.processing:
+    if st.session_state.job_id is not None:
+        # Clicking Stop reruns the script, which interrupts the event stream below
         if col2.button("⛔ Stop Processing"):
-            st.session_state.stop_processing = True
+            call_api(f"{PIPELINE_API}{st.session_state.job_id}/cancel/", method="POST")
+        follow_pipeline(st.session_state.job_id)
 
     # --- Show Next Steps Only if Valid Brands Exist ---
     if valid_brands:
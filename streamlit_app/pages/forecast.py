@@ -1,25 +1,35 @@
-import os
 import streamlit as st
 from services.engagement_forecast import visualize_forecast
-from services.data_loader import load_data
+from services.api_client import fetch_table, fetch_brands
+from services.tracing import start_trace
 
 st.set_page_config(
     page_title="Forecasting",
     page_icon="📈",
     layout="wide"
 )
+start_trace("forecast")
 
 st.title("📊 Engagement Analysis and forecast")
 
 # 📥 Load Data
-PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-final_processed = os.path.join(PROJECT_DIR, "data_lake/processed", "mini_final_with_trends.parquet")
+brands = fetch_brands("forecast")
 
-df = load_data(final_processed)
+# Only the selected brands' forecasts are fetched
+st.sidebar.header("Analysis Controls")
+selected_brands = st.sidebar.multiselect(
+    "Select Brands", brands, default=brands[:min(2, len(brands))]
+)
+
+df = fetch_table("forecast", brands=selected_brands) if selected_brands else None
 
-if df is not None:
+if not brands:
+    st.error("⚠️ No data available for forecast.")
+elif not selected_brands:
+    st.warning("Please select at least one brand")
+elif df is not None:
 	try:
-		visualize_forecast(df)
+		visualize_forecast(df, selected_brands=selected_brands)
 	except Exception as e:
 		st.error(f"Data loading error: {str(e)}")
 else:
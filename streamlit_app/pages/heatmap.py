@@ -1,18 +1,16 @@
-import os
 import streamlit as st
 from services.analysis import generate_sentiment_heatmap
-from services.data_loader import load_data
+from services.api_client import fetch_table
+from services.tracing import start_trace
 
 
 st.set_page_config(page_title="Sentiment Heatmap", page_icon="🔥", layout="wide")
+start_trace("heatmap")
 
 st.title("📊 Sentiment Heatmap Analysis")
 
 # 📥 Load Data
-PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-engagement_score_path = os.path.join(PROJECT_DIR, "data_lake/engagement_score", "engagement_score.parquet")
-
-df = load_data(engagement_score_path)
+df = fetch_table("engagement_scores")
 
 if df is not None:
 	try:
@@ -1,20 +1,17 @@
-import os
 import streamlit as st
-from services.data_loader import load_data
+from services.api_client import fetch_table
+from services.tracing import start_trace
 from services.report_generator import generate_full_report
 
 st.set_page_config(page_title="Report", layout="wide")
+start_trace("report")
 
 st.title("📊 Report of Analysis")
 
 # 📥 Load Data
-PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-engagement_score = os.path.join(PROJECT_DIR, "data_lake/engagement_score", "engagement_score.parquet")
-final_processed = os.path.join(PROJECT_DIR, "data_lake/processed", "mini_final_with_trends.parquet")
-count = os.path.join(PROJECT_DIR, "data_lake/count", "count.parquet")
-df_final = load_data(final_processed)
-df_eng = load_data(engagement_score)
-df_count = load_data(count)
+df_final = fetch_table("forecast")
+df_eng = fetch_table("engagement_scores")
+df_count = fetch_table("mention_counts")
 
 # Explicitly check if each DataFrame is not None
 if df_eng is not None and df_final is not None and df_count is not None:
@@ -1,59 +1,58 @@
 import pandas as pd
 import streamlit as st
 import plotly.graph_objects as go
+from services.memo import memoize
 
-def generate_sentiment_heatmap(df: pd.DataFrame):
+
+def sentiment_label(score):
+    """Map a sentiment score to a label."""
+    if pd.isna(score):
+        return ""
+    if score >= 0.1:
+        return "Positive"
+    elif score <= -0.1:
+        return "Negative"
+    else:
+        return "Neutral"
+
+
+def annotation_text(score):
+    """Heatmap cell text: the label on one line and the score on the next."""
+    if pd.isna(score):
+        return ""
+    label = sentiment_label(score)
+    return f"{label}<br>{score:.2f}"
+
+
+@memoize()
+def brand_options(df: pd.DataFrame) -> list:
+    return sorted(df["brand"].unique())
+
+
+@memoize()
+def daily_sentiment(df: pd.DataFrame, selected_brands: list) -> pd.DataFrame:
     """
-    Generates an Excel-style annotated sentiment heatmap that includes:
-      - A sentiment label on the first line and its numeric score (formatted to 2 decimals) on a new line.
-      - A multi-select sidebar to choose brands.
-      - A built-in Plotly date range slider on the x-axis.
-      - Y-axis (brand names) styled in a bright white font on a dark theme.
+    Average sentiment per brand (rows) and day (columns) for the selected brands.
     """
-    # Ensure 'date' is in datetime format
-    df["date"] = pd.to_datetime(df["date"])
-    
-    # Sidebar for multiple brand selections
-    st.sidebar.header("Analysis Controls")
-    brands = sorted(df["brand"].unique())
-    selected_brands = st.sidebar.multiselect(
-        "Select Brands",
-        brands,
-        default=brands[:min(2, len(brands))]
-    )
-    
-    if not selected_brands:
-        st.warning("Select at least one brand")
-        return
-    
     # Filter data for the selected brands
     filtered_data = df[df["brand"].isin(selected_brands)].copy()
+    filtered_data["date"] = pd.to_datetime(filtered_data["date"])
     
     # Aggregate average sentiment scores by date and brand
-    agg_data = filtered_data.groupby([filtered_data["date"].dt.date, "brand"])["sentiment"] \
+    agg_data = filtered_data.groupby([filtered_data["date"].dt.date, "brand"], observed=True)["sentiment"] \
                              .mean().reset_index()
     
     # Pivot the data so that rows are brands and columns are dates
     pivot_data = agg_data.pivot(index="brand", columns="date", values="sentiment")
-    pivot_data = pivot_data.reindex(sorted(pivot_data.columns), axis=1)
-    
-    # Function to map sentiment score to a label
-    def sentiment_label(score):
-        if pd.isna(score):
-            return ""
-        if score >= 0.1:
-            return "Positive"
-        elif score <= -0.1:
-            return "Negative"
-        else:
-            return "Neutral"
-    
-    # Create annotation text with the label on one line and the score on the next
-    def annotation_text(score):
-        if pd.isna(score):
-            return ""
-        label = sentiment_label(score)
-        return f"{label}<br>{score:.2f}"
+    return pivot_data.reindex(sorted(pivot_data.columns), axis=1)
+
+
+@memoize()
+def sentiment_heatmap_figure(df: pd.DataFrame, selected_brands: list) -> go.Figure:
+    """
+    Annotated heatmap of daily_sentiment, with a date range slider on the x-axis.
+    """
+    pivot_data = daily_sentiment(df, selected_brands)
     
     # Create text annotations for each cell
     text_labels = pivot_data.applymap(annotation_text).values
@@ -92,6 +91,31 @@ def generate_sentiment_heatmap(df: pd.DataFrame):
     
     # Make the brand names (y-axis tick labels) larger and bright white.
     fig.update_yaxes(tickfont=dict(size=18, color="white", family="Arial Black"))
+    return fig
+
+
+def generate_sentiment_heatmap(df: pd.DataFrame):
+    """
+    Generates an Excel-style annotated sentiment heatmap that includes:
+      - A sentiment label on the first line and its numeric score (formatted to 2 decimals) on a new line.
+      - A multi-select sidebar to choose brands.
+      - A built-in Plotly date range slider on the x-axis.
+      - Y-axis (brand names) styled in a bright white font on a dark theme.
+
+    The figure is memoized on the data version and the brand selection.
+    """
+    # Sidebar for multiple brand selections
+    st.sidebar.header("Analysis Controls")
+    brands = brand_options(df)
+    selected_brands = st.sidebar.multiselect(
+        "Select Brands",
+        brands,
+        default=brands[:min(2, len(brands))]
+    )
+    
+    if not selected_brands:
+        st.warning("Select at least one brand")
+        return
     
     # Display the chart in Streamlit
-    st.plotly_chart(fig)
+    st.plotly_chart(sentiment_heatmap_figure(df, selected_brands))
@@ -0,0 +1,88 @@
+import os
+import pandas as pd
+import pyarrow as pa
+from services.tracing import traced_request
+from services.data_loader import frame_cache, prepare_frame
+from services.memo import set_version
+
+# Base URL of the Django API; the dashboard does not need to run on the same host
+API_BASE_URL = os.getenv("DJANGO_API_BASE_URL", "http://127.0.0.1:8000/api/")
+DATA_API = API_BASE_URL + "data/"
+
+PAGE_SIZE = 200_000
+TIMEOUT = 60
+# Times a paged fetch starts over after the table changed under it before giving up
+MAX_RESTARTS = 3
+
+
+
+def fetch_table(name: str, columns: list = None, brands: list = None,
+                start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    """
+    Fetch a pipeline output table (engagement_scores, mention_counts or forecast) from the API.
+
+    Pages are transferred as Arrow IPC streams and followed by cursor until the table is
+    complete. Returns None if the pipeline has not produced the table yet.
+    The frame shares its data with the cached one: copy it before modifying it.
+    """
+    params = {"format": "arrow", "limit": PAGE_SIZE}
+    if columns:
+        params["columns"] = ",".join(columns)
+    if brands:
+        params["brands"] = ",".join(brands)
+    if start_date:
+        params["start_date"] = str(start_date)
+    if end_date:
+        params["end_date"] = str(end_date)
+
+    # The last table fetched for this query is cached with the ETag of its first page: a rerun
+    # revalidates it with If-None-Match and reuses it on 304 instead of transferring it again
+    cache_key = ("api", name, tuple(sorted(params.items())))
+    cached = frame_cache.get(cache_key)
+
+    tables = []
+    etag = None
+    restarts = 0
+    while True:
+        first_page = "cursor" not in params
+        headers = {"If-None-Match": cached[0]} if cached and first_page else {}
+        response = traced_request("GET", f"{DATA_API}{name}/", params=params, headers=headers, timeout=TIMEOUT)
+        if response.status_code == 304:
+            # Same table version as the cached copy
+            return set_version(cached[1].copy(deep=False), (name, cached[0]))
+        if response.status_code == 404:
+            return None
+        if response.status_code == 409:
+            # The table was rewritten while paging; start over on the new version
+            restarts += 1
+            if restarts > MAX_RESTARTS:
+                raise ValueError(f"Data API error: {name} kept changing while it was fetched")
+            tables.clear()
+            params.pop("cursor", None)
+            continue
+        if response.status_code != 200:
+            raise ValueError(f"Data API error: {response.json().get('error', response.status_code)}")
+
+        if first_page:
+            etag = response.headers.get("ETag")
+        tables.append(pa.ipc.open_stream(response.content).read_all())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params["cursor"] = next_cursor
+
+    df = prepare_frame(pa.concat_tables(tables).to_pandas())
+    if not etag:
+        return df
+    frame_cache.put(cache_key, etag, df)
+    return set_version(df.copy(deep=False), (name, etag))
+
+
+def fetch_brands(name: str) -> list:
+    """
+    Brands present in a pipeline output table, without fetching its rows.
+    """
+    response = traced_request("GET", f"{DATA_API}{name}/brands/", timeout=TIMEOUT)
+    if response.status_code != 200:
+        return []
+    return response.json().get("brands", [])
@@ -1,31 +1,68 @@
 import os
+import threading
+from collections import OrderedDict
 import pandas as pd
 
-def load_data(file_path: str) -> pd.DataFrame:
+DATE_COLUMNS = ("date", "ds")
+
+
+class FrameCache:
+    """
+    DataFrames shared by all dashboard sessions (Streamlit runs them in one process), each
+    stored with the version of its source, e.g. the API ETag of a table.
+    Entries are evicted least recently used first once their total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (version, df, nbytes)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        (version, df) cached under `key`, or None. The frame is shared: copy before modifying.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def put(self, key, version, df: pd.DataFrame) -> None:
+        """
+        Store `df` as the current version of `key`, replacing any older one. Frames larger
+        than the whole budget are not cached.
+        """
+        nbytes = int(df.memory_usage(deep=True, index=True).sum())
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (version, df, nbytes)
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+
+# Memory budget of the shared cache, in megabytes
+frame_cache = FrameCache(int(os.getenv("DASHBOARD_CACHE_MB", 512)) * 2**20)
+
+
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Load raw data from a file in various formats.
+    Parse date columns and store `brand` as a categorical, once, before a frame is cached:
+    pages then filter and group it without converting it on every rerun.
+    Group by brand with observed=True, or brands missing from a filtered frame come back.
     """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"File not found: {file_path}")
-    
-    _, ext = os.path.splitext(file_path)
-    file_type = ext[1:].lower()  # Remove the dot and convert to lowercase
-    
-    try:
-        if file_type == 'parquet':
-            df = pd.read_parquet(file_path, engine="pyarrow")
-        elif file_type == 'csv':
-            df = pd.read_csv(file_path)
-        elif file_type == 'json':
-            df = pd.read_json(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_type}")
-        
-        return df
-
-    except ImportError as e:
-        raise ImportError(f"Missing package dependency: {e}")
-    except PermissionError as e:
-        raise PermissionError(f"Permission denied when accessing {file_path}: {e}")
-    except Exception as e:
-        raise ValueError(f"Data loading failed: {e}")
+    for column in DATE_COLUMNS:
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column])
+    if "brand" in df.columns and not isinstance(df["brand"].dtype, pd.CategoricalDtype):
+        df["brand"] = df["brand"].astype("category")
+    return df
+
@@ -2,10 +2,96 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from services.memo import memoize
 
-def visualize_forecast(df: pd.DataFrame):
+
+@memoize()
+def filter_forecast(df: pd.DataFrame, selected_brands: list, start_date, end_date) -> pd.DataFrame:
+    """
+    Rows of the selected brands between start_date and end_date (inclusive).
+    """
+    ds = pd.to_datetime(df["ds"])
+    filtered_data = df[
+        (df["brand"].isin(selected_brands)) & 
+        (ds >= pd.to_datetime(start_date)) & 
+        (ds <= pd.to_datetime(end_date))
+    ].copy()
+    filtered_data["ds"] = pd.to_datetime(filtered_data["ds"])
+    return filtered_data
+
+
+@memoize()
+def forecast_figure(df: pd.DataFrame, selected_brands: list, start_date, end_date) -> go.Figure:
+    """
+    Forecast lines per brand and type, with the actual points of each brand.
+    """
+    filtered_data = filter_forecast(df, selected_brands, start_date, end_date)
+
+    # Create line plot for forecast data
+    fig = px.line(
+        filtered_data,
+        x="ds",
+        y="yhat",
+        color="brand",
+        line_dash="type",
+        title="Brand Engagement Forecast",
+        labels={"ds": "Date", "yhat": "Predicted Value", "brand": "Brand"}
+    )
+
+    # Add actual data points for each selected brand, if available
+    for brand in selected_brands:
+        actuals = filtered_data[
+            (filtered_data["brand"] == brand) & (filtered_data["type"] == "actual")
+        ]
+        if "y" in actuals.columns and not actuals.empty:
+            fig.add_trace(
+                go.Scatter(
+                    x=actuals["ds"],
+                    y=actuals["y"],
+                    mode="markers",
+                    name=f"{brand} (Actual)",
+                    marker=dict(size=8)
+                )
+            )
+
+    # Update plot layout
+    fig.update_layout(
+        height=600,
+        template="plotly_white",
+        hovermode="x unified",
+        xaxis=dict(rangeslider=dict(visible=True))
+    )
+    return fig
+
+
+@memoize()
+def forecast_metrics(df: pd.DataFrame, selected_brands: list, start_date, end_date) -> dict:
+    """
+    Per brand, the average of the actuals (None without actuals, absent without a 'y'
+    column) and of the forecasts (None without forecasts).
+    """
+    filtered_data = filter_forecast(df, selected_brands, start_date, end_date)
+    metrics = {}
+    for brand in selected_brands:
+        brand_data = filtered_data[filtered_data["brand"] == brand]
+        brand_metrics = {}
+        if "y" in brand_data.columns:
+            actuals = brand_data[brand_data["type"] == "actual"]["y"]
+            brand_metrics["actual_avg"] = actuals.mean() if not actuals.empty else None
+        forecasts = brand_data[brand_data["type"] == "forecasted"]["yhat"]
+        brand_metrics["forecast_avg"] = forecasts.mean() if not forecasts.empty else None
+        metrics[brand] = brand_metrics
+    return metrics
+
+
+def visualize_forecast(df: pd.DataFrame, selected_brands: list = None):
     """
     Visualize historical and forecast data for brand engagement.
+
+    When selected_brands is given, df is expected to hold just those brands (loaded
+    per brand by the caller) and the brand selector is left to the caller.
+    The filtered data, figure and metrics are memoized on the data version and the
+    brand and date selection.
     """
     st.title("Brand Engagement Analysis & Forecast")
 
@@ -22,21 +108,19 @@ def visualize_forecast(df: pd.DataFrame):
         return
 
     try:
-        # Convert 'ds' to datetime
-        df["ds"] = pd.to_datetime(df["ds"])
-
         # Sidebar for controls
-        st.sidebar.header("Analysis Controls")
-        brands = sorted(df["brand"].unique())
-        selected_brands = st.sidebar.multiselect(
-            "Select Brands", brands, default=brands[:min(2, len(brands))]
-        )
+        if selected_brands is None:
+            st.sidebar.header("Analysis Controls")
+            brands = sorted(df["brand"].unique())
+            selected_brands = st.sidebar.multiselect(
+                "Select Brands", brands, default=brands[:min(2, len(brands))]
+            )
         if not selected_brands:
             st.warning("Please select at least one brand")
             return
 
         # Date range filter
-        min_date, max_date = df["ds"].min(), df["ds"].max()
+        min_date, max_date = pd.to_datetime(df["ds"]).agg(["min", "max"])
         date_range = st.sidebar.date_input("Select Date Range", [min_date, max_date])
         if len(date_range) != 2:
             st.error("Please select a valid date range")
@@ -47,68 +131,27 @@ def visualize_forecast(df: pd.DataFrame):
             return
 
         # Filter data by selected brands and date range
-        filtered_data = df[
-            (df["brand"].isin(selected_brands)) & 
-            (df["ds"] >= pd.to_datetime(start_date)) & 
-            (df["ds"] <= pd.to_datetime(end_date))
-        ].copy()
+        filtered_data = filter_forecast(df, selected_brands, start_date, end_date)
         if filtered_data.empty:
             st.warning("No data available for the selected filters")
             return
 
-        # Create line plot for forecast data
-        fig = px.line(
-            filtered_data,
-            x="ds",
-            y="yhat",
-            color="brand",
-            line_dash="type",
-            title="Brand Engagement Forecast",
-            labels={"ds": "Date", "yhat": "Predicted Value", "brand": "Brand"}
-        )
-
-        # Add actual data points for each selected brand, if available
-        for brand in selected_brands:
-            actuals = filtered_data[
-                (filtered_data["brand"] == brand) & (filtered_data["type"] == "actual")
-            ]
-            if "y" in actuals.columns and not actuals.empty:
-                fig.add_trace(
-                    go.Scatter(
-                        x=actuals["ds"],
-                        y=actuals["y"],
-                        mode="markers",
-                        name=f"{brand} (Actual)",
-                        marker=dict(size=8)
-                    )
-                )
-
-        # Update plot layout
-        fig.update_layout(
-            height=600,
-            template="plotly_white",
-            hovermode="x unified",
-            xaxis=dict(rangeslider=dict(visible=True))
-        )
-
         # Display the chart
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(forecast_figure(df, selected_brands, start_date, end_date), use_container_width=True)
 
         # Display brand-specific metrics in columns
         st.subheader("Brand Metrics")
+        metrics = forecast_metrics(df, selected_brands, start_date, end_date)
         metric_cols = st.columns(len(selected_brands))
         for idx, brand in enumerate(selected_brands):
-            brand_data = filtered_data[filtered_data["brand"] == brand]
             with metric_cols[idx]:
                 st.markdown(f"### {brand}")
-                # Calculate and display actual average if available
-                if "y" in brand_data.columns:
-                    actuals = brand_data[brand_data["type"] == "actual"]["y"]
-                    actual_avg = actuals.mean() if not actuals.empty else None
+                # Display actual average if available
+                if "actual_avg" in metrics[brand]:
+                    actual_avg = metrics[brand]["actual_avg"]
                     st.metric("Actual Average", f"{actual_avg:.2f}" if actual_avg is not None else "N/A")
-                # Calculate and display forecast average
-                forecasts = brand_data[brand_data["type"] == "forecasted"]["yhat"]
-                forecast_avg = forecasts.mean() if not forecasts.empty else None
+                # Display forecast average
+                forecast_avg = metrics[brand]["forecast_avg"]
                 st.metric("Forecast Average", f"{forecast_avg:.2f}" if forecast_avg is not None else "N/A")
 
     except Exception as e:
@@ -0,0 +1,84 @@
+import weakref
+import datetime
+import threading
+import functools
+from collections import OrderedDict
+import pandas as pd
+
+# Data version of the frames handed out by the loaders, by object identity: unlike
+# df.attrs, it is not inherited by frames derived from them (filters, slices, copies)
+_versions = {}
+_versions_lock = threading.Lock()
+
+_HASHABLE = (str, int, float, bool, type(None), datetime.date, pd.Timestamp, pd.Period)
+
+
+def set_version(df: pd.DataFrame, version) -> pd.DataFrame:
+    """
+    Tag a frame as holding data `version` (e.g. the table's ETag), making it usable as a
+    memoize key. A tagged frame must not be modified afterwards.
+    """
+    with _versions_lock:
+        _versions[id(df)] = version
+    weakref.finalize(df, _forget, id(df))
+    return df
+
+
+def _forget(frame_id: int) -> None:
+    with _versions_lock:
+        _versions.pop(frame_id, None)
+
+
+def data_version(df: pd.DataFrame):
+    with _versions_lock:
+        return _versions.get(id(df))
+
+
+def _key_part(value):
+    """
+    Hashable stand-in for one argument, or None if it cannot be part of a key.
+    """
+    if isinstance(value, pd.DataFrame):
+        version = data_version(value)
+        return None if version is None else ("frame", version)
+    if isinstance(value, (list, tuple)):
+        parts = tuple(_key_part(item) for item in value)
+        return None if None in parts else ("seq", parts)
+    if isinstance(value, _HASHABLE):
+        return ("value", value)
+    return None
+
+
+def memoize(maxsize: int = 32):
+    """
+    Cache a pure function of dashboard data and filter selections, shared by all sessions.
+
+    Calls are keyed on the data version of their DataFrame arguments (see set_version) and
+    on the other arguments, so going back to an earlier brand, date or month selection
+    reuses its result, and new data misses. Calls with an untagged frame or an unhashable
+    argument are not cached. Results are shared between callers: treat them as read-only.
+    The `maxsize` most recently used results per function are kept.
+    """
+    def decorator(fn):
+        cache = OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = _key_part(list(args) + sorted(kwargs.items()))
+            if key is None:
+                return fn(*args, **kwargs)
+            with lock:
+                if key in cache:
+                    cache.move_to_end(key)
+                    return cache[key]
+            result = fn(*args, **kwargs)
+            with lock:
+                cache[key] = result
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return result
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
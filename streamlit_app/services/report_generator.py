@@ -3,6 +3,8 @@ import random
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
+from services.analysis import annotation_text
+from services.memo import memoize
 
 # ===============================
 # Decision Engine Functions
@@ -117,7 +119,7 @@ def generate_recommendations_for_months(selected_months, eng_data, tr_data, ment
         filtered_eng = eng_data[(eng_data["date"] >= start_date) & (eng_data["date"] <= end_date)]
         filtered_tr = tr_data[(tr_data["ds"] >= start_date) & (tr_data["ds"] <= end_date)]
         
-        month_engagement = filtered_eng.groupby("brand").agg({
+        month_engagement = filtered_eng.groupby("brand", observed=True).agg({
             "likeCount": "mean",
             "replyCount": "mean",
             "retweetCount": "mean",
@@ -126,7 +128,7 @@ def generate_recommendations_for_months(selected_months, eng_data, tr_data, ment
             "engagement_score": "mean"
         }).reset_index()
         
-        month_trend = filtered_tr.groupby("brand").agg({
+        month_trend = filtered_tr.groupby("brand", observed=True).agg({
             "trend": "mean",
             "yhat": "mean"
         }).reset_index()
@@ -144,75 +146,33 @@ def generate_recommendations_for_months(selected_months, eng_data, tr_data, ment
     return final_data
 
 # ===============================
-# Full Report Generation Function
+# Full Report Building Blocks
 # ===============================
-def generate_full_report(raw_engagement: pd.DataFrame, raw_trend: pd.DataFrame, raw_mentions: pd.DataFrame):
+# Memoized on the data version and the brand/month selection: switching the global
+# filters back to an earlier selection reuses its figures and recommendation.
+@memoize()
+def report_filters(raw_engagement: pd.DataFrame, raw_trend: pd.DataFrame, raw_mentions: pd.DataFrame):
     """
-    Generates a comprehensive full report that includes:
-      - Sentiment Heatmap
-      - Engagement Forecast
-      - Brand Mentions
-      - Decision Engine Recommendation
-      
-    Uses a single set of global filters for brand and month.
-    
-    This function accepts only three arguments. Internally, it creates copies of the
-    raw data to serve as engagement_score, final_processed, and brand_counts.
+    Options of the global filters: the brands in any of the three tables, and the months
+    (YYYY-MM) of the engagement data.
     """
-    # Create copies from the raw data
-    engagement_score = raw_engagement.copy()
-    final_processed = raw_trend.copy()
-    brand_counts = raw_mentions.copy()
-    
-    # Standardize date columns
-    engagement_score["date"] = pd.to_datetime(engagement_score["date"])
-    final_processed.rename(columns={"ds": "date"}, inplace=True)
-    final_processed["date"] = pd.to_datetime(final_processed["date"])
-    
-    if "date" in brand_counts.columns:
-        brand_counts["date"] = pd.to_datetime(brand_counts["date"])
-        brand_counts["month"] = brand_counts["date"].dt.to_period("M").astype(str)
-    
-    # Global Brand and Month Filters
-    brands_from_engagement = set(engagement_score["brand"].unique())
-    brands_from_forecast = set(final_processed["brand"].unique())
-    brands_from_counts = set(brand_counts["brand"].unique())
+    brands_from_engagement = set(raw_engagement["brand"].unique())
+    brands_from_forecast = set(raw_trend["brand"].unique())
+    brands_from_counts = set(raw_mentions["brand"].unique())
     all_brands = sorted(brands_from_engagement | brands_from_forecast | brands_from_counts)
     
-    engagement_score["date"] = pd.to_datetime(engagement_score["date"])
-    global_months = sorted(engagement_score["date"].dt.to_period("M").astype(str).unique())
-    
-    st.sidebar.header("Global Filters")
-    selected_brand = st.sidebar.selectbox("Select Brand", all_brands, index=0)
-    selected_month = st.sidebar.selectbox("Select Month (YYYY-MM)", global_months, index=0)
-    
-    engagement_score_filtered = engagement_score[engagement_score["brand"] == selected_brand].copy()
-    final_processed_filtered = final_processed[final_processed["brand"] == selected_brand].copy()
-    brand_counts_filtered = brand_counts[(brand_counts["brand"] == selected_brand) & 
-                                         (brand_counts["month"] == selected_month)].copy()
+    global_months = sorted(pd.to_datetime(raw_engagement["date"]).dt.to_period("M").astype(str).unique())
+    return all_brands, global_months
+
+@memoize()
+def report_heatmap_figure(raw_engagement: pd.DataFrame, selected_brand: str) -> go.Figure:
+    engagement_score_filtered = raw_engagement[raw_engagement["brand"] == selected_brand].copy()
+    engagement_score_filtered["date"] = pd.to_datetime(engagement_score_filtered["date"])
     
-    # ---------------------------
-    # Sentiment Heatmap
-    agg_data = engagement_score_filtered.groupby(["date", "brand"])["sentiment"].mean().reset_index()
+    agg_data = engagement_score_filtered.groupby(["date", "brand"], observed=True)["sentiment"].mean().reset_index()
     pivot_data = agg_data.pivot(index="brand", columns="date", values="sentiment")
     pivot_data = pivot_data.reindex(sorted(pivot_data.columns), axis=1)
     
-    def sentiment_label(score):
-        if pd.isna(score):
-            return ""
-        if score >= 0.1:
-            return "Positive"
-        elif score <= -0.1:
-            return "Negative"
-        else:
-            return "Neutral"
-    
-    def annotation_text(score):
-        if pd.isna(score):
-            return ""
-        label = sentiment_label(score)
-        return f"{label}<br>{score:.2f}"
-    
     text_labels = pivot_data.applymap(annotation_text).values
     
     fig_heatmap = go.Figure(data=go.Heatmap(
@@ -241,13 +201,20 @@ def generate_full_report(raw_engagement: pd.DataFrame, raw_trend: pd.DataFrame,
         xaxis=dict(rangeslider=dict(visible=True), tickangle=45)
     )
     fig_heatmap.update_yaxes(tickfont=dict(size=18, color="white", family="Arial Black"))
+    return fig_heatmap
+
+@memoize()
+def report_forecast_figure(raw_trend: pd.DataFrame, selected_brand: str):
+    """
+    Forecast figure of the brand; None if the forecast data lacks a required column.
+    """
+    final_processed_filtered = raw_trend[raw_trend["brand"] == selected_brand].copy()
+    final_processed_filtered.rename(columns={"ds": "date"}, inplace=True)
     
-    # ---------------------------
-    # Engagement Forecast
     required_final_cols = ["date", "brand", "yhat", "type"]
     if not all(col in final_processed_filtered.columns for col in required_final_cols):
-        st.error(f"Final processed DataFrame is missing one of the required columns: {required_final_cols}")
-        return
+        return None
+    final_processed_filtered["date"] = pd.to_datetime(final_processed_filtered["date"])
 
     fig_forecast = px.line(
         final_processed_filtered,
@@ -276,9 +243,16 @@ def generate_full_report(raw_engagement: pd.DataFrame, raw_trend: pd.DataFrame,
         hovermode="x unified",
         xaxis=dict(rangeslider=dict(visible=True))
     )
+    return fig_forecast
+
+@memoize()
+def report_mentions_figure(raw_mentions: pd.DataFrame, selected_brand: str, selected_month: str) -> go.Figure:
+    brand_counts = raw_mentions[raw_mentions["brand"] == selected_brand].copy()
+    if "date" in brand_counts.columns:
+        brand_counts["date"] = pd.to_datetime(brand_counts["date"])
+        brand_counts["month"] = brand_counts["date"].dt.to_period("M").astype(str)
+    brand_counts_filtered = brand_counts[brand_counts["month"] == selected_month]
     
-    # ---------------------------
-    # Brand Mentions
     fig_mentions = px.bar(
         brand_counts_filtered,
         x="brand",
@@ -288,9 +262,15 @@ def generate_full_report(raw_engagement: pd.DataFrame, raw_trend: pd.DataFrame,
         height=600
     )
     fig_mentions.update_layout(xaxis_title="Brand", yaxis_title="Mentions")
-    
-    # ---------------------------
-    # Decision Engine Recommendation
+    return fig_mentions
+
+@memoize()
+def report_recommendation(raw_engagement: pd.DataFrame, raw_trend: pd.DataFrame, raw_mentions: pd.DataFrame,
+                          selected_brand: str, selected_month: str) -> str:
+    """
+    Decision engine recommendation for the brand and month (also keeps the randomly
+    chosen wording stable across reruns).
+    """
     try:
         recommendations_df = generate_recommendations_for_months([selected_month],
                                                                  raw_engagement.copy(),
@@ -299,11 +279,52 @@ def generate_full_report(raw_engagement: pd.DataFrame, raw_trend: pd.DataFrame,
         recommendations_df = recommendations_df[recommendations_df["brand"] == selected_brand]
         if not recommendations_df.empty:
             rec = recommendations_df.iloc[0]["recommendations"]
-            rec_text = rec[0] if isinstance(rec, list) and rec else "No recommendation available."
-        else:
-            rec_text = "No recommendations available for the selected filters."
+            return rec[0] if isinstance(rec, list) and rec else "No recommendation available."
+        return "No recommendations available for the selected filters."
     except ValueError as ve:
-        rec_text = str(ve)
+        return str(ve)
+
+# ===============================
+# Full Report Generation Function
+# ===============================
+def generate_full_report(raw_engagement: pd.DataFrame, raw_trend: pd.DataFrame, raw_mentions: pd.DataFrame):
+    """
+    Generates a comprehensive full report that includes:
+      - Sentiment Heatmap
+      - Engagement Forecast
+      - Brand Mentions
+      - Decision Engine Recommendation
+      
+    Uses a single set of global filters for brand and month.
+    
+    This function accepts only three arguments and does not modify them: each section
+    is built by a memoized function of the raw data and the selected brand and month.
+    """
+    # Global Brand and Month Filters
+    all_brands, global_months = report_filters(raw_engagement, raw_trend, raw_mentions)
+    
+    st.sidebar.header("Global Filters")
+    selected_brand = st.sidebar.selectbox("Select Brand", all_brands, index=0)
+    selected_month = st.sidebar.selectbox("Select Month (YYYY-MM)", global_months, index=0)
+    
+    # ---------------------------
+    # Sentiment Heatmap
+    fig_heatmap = report_heatmap_figure(raw_engagement, selected_brand)
+    
+    # ---------------------------
+    # Engagement Forecast
+    fig_forecast = report_forecast_figure(raw_trend, selected_brand)
+    if fig_forecast is None:
+        st.error(f"Final processed DataFrame is missing one of the required columns: {['date', 'brand', 'yhat', 'type']}")
+        return
+    
+    # ---------------------------
+    # Brand Mentions
+    fig_mentions = report_mentions_figure(raw_mentions, selected_brand, selected_month)
+    
+    # ---------------------------
+    # Decision Engine Recommendation
+    rec_text = report_recommendation(raw_engagement, raw_trend, raw_mentions, selected_brand, selected_month)
     
     # ============================
     # Display the Full Report
@@ -321,4 +342,3 @@ def generate_full_report(raw_engagement: pd.DataFrame, raw_trend: pd.DataFrame,
     
     st.header("Decision Engine Recommendation")
     st.markdown(f"**Recommendation:** {rec_text}")
-
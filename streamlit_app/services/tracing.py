@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import secrets
+import threading
+import requests
+
+# Dashboard tracing is off unless DASHBOARD_TRACING=true: every interaction then starts a
+# trace, and the API traces the requests it makes
+DASHBOARD_TRACING = os.getenv("DASHBOARD_TRACING", "false").lower() == "true"
+# Spans written by the dashboard; by default the file the API writes its spans to, so that
+# trace_view sees both sides of a trace. Rotated to TRACE_FILE.1 at TRACE_FILE_MAX_MB, as the API does.
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(_REPO_ROOT, "trend_analysis", "logs", "traces.jsonl"))
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_MB", 100)) * 2**20
+
+# Streamlit runs each session's script on its own thread: one trace per script run
+_state = threading.local()
+_write_lock = threading.Lock()
+
+
+def start_trace(interaction: str) -> str:
+    """
+    Start a new trace for this script run (one click or input change), named after the page.
+    Every API call made through traced_request until the next start_trace belongs to it.
+    """
+    _state.trace_id = secrets.token_hex(16) if DASHBOARD_TRACING and TRACE_FILE else None
+    _state.interaction = interaction
+    return _state.trace_id
+
+
+def _export(record: dict) -> None:
+    line = json.dumps(record, default=str) + "\n"
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(TRACE_FILE), exist_ok=True)
+            if os.path.exists(TRACE_FILE) and os.path.getsize(TRACE_FILE) >= TRACE_FILE_MAX_BYTES:
+                os.replace(TRACE_FILE, TRACE_FILE + ".1")
+            with open(TRACE_FILE, "a") as f:
+                f.write(line)
+    except OSError:
+        pass  # tracing must never break the dashboard
+
+
+def traced_request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    requests.request(method, url, **kwargs) recorded as a client span of the current trace,
+    with a W3C traceparent header so the API continues the trace. For streamed responses the
+    span ends when the response headers arrive.
+    """
+    trace_id = getattr(_state, "trace_id", None)
+    if trace_id is None:
+        return requests.request(method, url, **kwargs)
+
+    span_id = secrets.token_hex(8)
+    kwargs["headers"] = {**(kwargs.get("headers") or {}), "traceparent": f"00-{trace_id}-{span_id}-01"}
+    started_at = time.time()
+    start = time.perf_counter()
+    attributes = {"interaction": _state.interaction}
+    status = "ok"
+    try:
+        response = requests.request(method, url, **kwargs)
+        attributes["status_code"] = response.status_code
+        return response
+    except requests.exceptions.RequestException as e:
+        status = "error"
+        attributes["error"] = repr(e)[:200]
+        raise
+    finally:
+        _export({
+            "trace_id": trace_id,
+            "span_id": span_id,
+            "parent_id": None,
+            "name": f"{method.upper()} {requests.utils.urlparse(url).path}",
+            "service": "dashboard",
+            "start": started_at,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            "status": status,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            "attributes": attributes,
+        })
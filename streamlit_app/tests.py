@@ -0,0 +1,122 @@
+"""
+Dashboard service tests; run from this directory with `python -m unittest tests`.
+"""
+import gc
+import unittest
+from unittest import mock
+import pandas as pd
+from services import api_client, memo
+from services.data_loader import FrameCache
+from services.memo import data_version, memoize, set_version
+
+
+def frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({"value": range(rows)}, dtype="int64")
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+class FrameCacheTests(unittest.TestCase):
+    def test_evicts_least_recently_used_over_budget(self):
+        a, b, c = frame(100), frame(100), frame(100)
+        cache = FrameCache(frame_bytes(a) * 2)
+        cache.put("a", 1, a)
+        cache.put("b", 1, b)
+        self.assertIs(cache.get("a")[1], a)  # "b" is now the least recently used
+
+        cache.put("c", 1, c)
+        self.assertIsNone(cache.get("b"))
+        self.assertIs(cache.get("a")[1], a)
+        self.assertIs(cache.get("c")[1], c)
+        self.assertEqual(cache.size, frame_bytes(a) + frame_bytes(c))
+
+    def test_replacing_a_key_frees_its_old_size(self):
+        small, large = frame(10), frame(100)
+        cache = FrameCache(frame_bytes(large) * 2)
+        cache.put("a", 1, small)
+        cache.put("a", 2, large)
+        version, cached = cache.get("a")
+        self.assertEqual(version, 2)
+        self.assertIs(cached, large)
+        self.assertEqual(cache.size, frame_bytes(large))
+
+    def test_frame_larger_than_budget_is_not_cached(self):
+        small = frame(10)
+        cache = FrameCache(frame_bytes(small))
+        cache.put("a", 1, small)
+        cache.put("a", 2, frame(1000))
+        cache.put("b", 1, frame(1000))
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.size, 0)
+
+
+class MemoizeTests(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        @memoize()
+        def total(df, brand):
+            self.calls.append(brand)
+            return int(df.loc[df["brand"] == brand, "value"].sum())
+
+        self.total = total
+        self.df = set_version(pd.DataFrame({"brand": ["a", "a", "b"], "value": [1, 2, 3]}), ("table", "v1"))
+
+    def test_hit_on_same_frame_and_arguments(self):
+        self.assertEqual(self.total(self.df, "a"), 3)
+        self.assertEqual(self.total(self.df, "a"), 3)
+        self.assertEqual(self.total(self.df, brand="a"), 3)
+        self.assertEqual(self.total(self.df, "b"), 3)
+        self.assertEqual(self.calls, ["a", "a", "b"])  # the keyword call is keyed separately
+
+    def test_miss_after_new_data_version(self):
+        self.total(self.df, "a")
+        new = set_version(pd.DataFrame({"brand": ["a"], "value": [10]}), ("table", "v2"))
+        self.assertEqual(self.total(new, "a"), 10)
+        self.assertEqual(self.calls, ["a", "a"])
+
+    def test_untagged_frame_is_not_cached(self):
+        untagged = self.df.copy()
+        self.total(untagged, "a")
+        self.total(untagged, "a")
+        self.assertEqual(self.calls, ["a", "a"])
+
+    def test_version_forgotten_when_frame_is_collected(self):
+        df = set_version(pd.DataFrame({"brand": ["a"], "value": [1]}), ("table", "v3"))
+        frame_id = id(df)
+        self.assertEqual(self.total(df, "a"), 1)
+        del df
+        gc.collect()
+        self.assertNotIn(frame_id, memo._versions)
+
+        # A later frame may get the same id; it must not be served the old result
+        reused = pd.DataFrame({"brand": ["a"], "value": [5]})
+        self.assertIsNone(data_version(reused))
+        self.assertEqual(self.total(reused, "a"), 5)
+        self.assertEqual(self.calls, ["a", "a"])
+
+    def test_least_recently_used_result_evicted(self):
+        @memoize(maxsize=2)
+        def brand_rows(df, brand):
+            self.calls.append(brand)
+            return int((df["brand"] == brand).sum())
+
+        for brand in ["a", "b", "a", "c", "a", "b"]:
+            brand_rows(self.df, brand)
+        self.assertEqual(self.calls, ["a", "b", "c", "b"])
+
+
+class FetchTableTests(unittest.TestCase):
+    def test_gives_up_when_table_keeps_changing(self):
+        conflict = mock.Mock(status_code=409)
+        with mock.patch.object(api_client, "traced_request", return_value=conflict) as request:
+            with self.assertRaises(ValueError):
+                api_client.fetch_table("forecast")
+        self.assertEqual(request.call_count, api_client.MAX_RESTARTS + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
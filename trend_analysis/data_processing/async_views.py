@@ -0,0 +1,113 @@
+"""
+Async versions of the pipeline endpoints, for serving the project under ASGI (asgi.py).
+
+Under ASGI, Django runs synchronous views one at a time on a single shared thread, so one
+long stage request holds up everything else, status polls included. These views run the
+stage on a worker thread and await it, leaving the event loop free; the CPU-bound work
+inside the stage runs in the bounded process pool (pipeline.process_pool). They share the
+result cache, single-flight and per-stage limits with the synchronous endpoints.
+"""
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from .pipeline import current_selection, run_process_stage, run_engagement_stage, run_forecast_stage, PipelineError
+from .concurrency import StageBusy
+from .jobs import job_events
+from .views import job_runner, event_stream_format, encode_job_event, event_stream_response
+
+
+def _json_body(request) -> dict:
+    try:
+        return json.loads(request.body or b"{}")
+    except ValueError:
+        return {}
+
+
+async def _run_stage(fn, *args, **kwargs):
+    """
+    Await a pipeline stage running on a worker thread. Returns (result, error response).
+    """
+    try:
+        return await sync_to_async(fn, thread_sensitive=False)(*args, **kwargs), None
+    except PipelineError as e:
+        return None, JsonResponse({"error": str(e)}, status=e.status)
+    except StageBusy as e:
+        response = JsonResponse({"error": str(e)}, status=503)
+        response["Retry-After"] = str(int(e.wait))
+        return None, response
+
+
+@csrf_exempt
+@require_POST
+async def process_data(request):
+    body = _json_body(request)
+    brands = body.get("brands", [])
+    if not brands:
+        return JsonResponse({"error": "'brands' is required."}, status=400)
+
+    processed, error = await _run_stage(run_process_stage, brands, bool(body.get("fuzzy", False)))
+    if error is not None:
+        return error
+    return JsonResponse({"message": "Data processing complete", "tweets": len(processed)})
+
+
+@require_GET
+async def engagement_scores(request):
+    active_brands, fuzzy = current_selection()
+    brands = [b.strip() for b in request.GET.get("brands", "").split(",") if b.strip()] or active_brands
+    retrain = request.GET.get("retrain") == "1"
+
+    scores, error = await _run_stage(run_engagement_stage, brands, fuzzy, retrain=retrain)
+    if error is not None:
+        return error
+    return JsonResponse({
+        "message": "Engagement scores calculated",
+        "rows": len(scores),
+        "brands": brands,
+        "data_url": "/api/data/engagement_scores/",
+    })
+
+
+@csrf_exempt
+@require_POST
+async def forecast_trends(request):
+    body = _json_body(request)
+    active_brands, fuzzy = current_selection()
+    brands = body.get("brands") or active_brands
+
+    brand_status, error = await _run_stage(run_forecast_stage, brands, fuzzy, engine=body.get("engine"))
+    if error is not None:
+        return error
+    return JsonResponse({"message": "Trend forecasting complete", "brands": brand_status})
+
+
+@require_GET
+async def pipeline_status(request, job_id):
+    job = job_runner.get(job_id)
+    if job is None:
+        return JsonResponse({"error": f"Unknown job '{job_id}'."}, status=404)
+    return JsonResponse(job.to_dict())
+
+
+@require_GET
+async def pipeline_events(request, job_id):
+    """
+    Async form of views.pipeline_events: the stream waits for job changes on a worker
+    thread, so an open stream does not tie up the event loop.
+    """
+    job = job_runner.get(job_id)
+    if job is None:
+        return JsonResponse({"error": f"Unknown job '{job_id}'."}, status=404)
+    fmt = event_stream_format(request)
+    snapshots = job_events(job, settings.PIPELINE_EVENTS_HEARTBEAT)
+    next_snapshot = sync_to_async(next, thread_sensitive=False)
+    finished = object()
+
+    async def events():
+        while (snapshot := await next_snapshot(snapshots, finished)) is not finished:
+            yield encode_job_event(snapshot, fmt)
+
+    return event_stream_response(events(), fmt)
@@ -0,0 +1,99 @@
+"""
+Code that runs inside backtest worker processes: fit one engine/config on the history
+up to a cutoff and compare its forecast with what actually happened afterwards.
+
+Like forecast_worker, this module stays free of Django and the services package at
+import time so that spawned workers start cheaply.
+"""
+import time
+import pandas as pd
+from data_processing.forecast_worker import time_limit
+
+
+def _timed(fn, *args, **kwargs):
+    """
+    Run fn and return (result, wall seconds, CPU seconds of this process).
+    """
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def _backtest_prophet(train: pd.DataFrame, horizon: int, config: dict):
+    from prophet import Prophet
+
+    forecasts, fit_wall, fit_cpu, predict_wall, predict_cpu, errors = [], 0.0, 0.0, 0.0, 0.0, {}
+    for brand, brand_train in train.groupby("brand", sort=False, observed=True):
+        try:
+            model = Prophet(**config)
+            _, wall, cpu = _timed(model.fit, brand_train[["ds", "y"]])
+            fit_wall, fit_cpu = fit_wall + wall, fit_cpu + cpu
+
+            future = model.make_future_dataframe(periods=horizon, include_history=False)
+            forecast, wall, cpu = _timed(model.predict, future)
+            predict_wall, predict_cpu = predict_wall + wall, predict_cpu + cpu
+        except Exception as e:
+            errors[brand] = str(e)
+            continue
+        forecasts.append(forecast[["ds", "yhat", "yhat_lower", "yhat_upper"]].assign(brand=brand))
+
+    forecast = pd.concat(forecasts, ignore_index=True) if forecasts else None
+    return forecast, fit_wall, fit_cpu, predict_wall, predict_cpu, errors
+
+
+def _backtest_ridge(train: pd.DataFrame, horizon: int, config: dict):
+    # Imported here: the services package loads spaCy, which the parent has already
+    # paid for under fork but spawned workers should only pay for when needed.
+    from data_processing.services.fast_forecast import fit_ridge_forecast, predict_ridge_forecast
+
+    fit, fit_wall, fit_cpu = _timed(fit_ridge_forecast, train, **config)
+    forecast, predict_wall, predict_cpu = _timed(predict_ridge_forecast, fit, train, horizon)
+    forecast = forecast[forecast["type"] == "forecasted"]
+    return forecast, fit_wall, fit_cpu, predict_wall, predict_cpu, {}
+
+
+BACKTEST_RUNNERS = {
+    "prophet": _backtest_prophet,
+    "ridge": _backtest_ridge,
+}
+
+
+def run_backtest_fold(engine: str, config_name: str, config: dict, brand_trends: pd.DataFrame,
+                      cutoff: pd.Timestamp, horizon: int, timeout: float = None):
+    """
+    Fit `engine` with `config` on the rows of brand_trends up to and including cutoff and
+    forecast `horizon` days after it.
+
+    Args:
+        brand_trends (pd.DataFrame): Long 'ds'/'y'/'brand' frame. Prophet folds get one
+                                     brand each; ridge folds get every brand at once.
+        timeout (float): Seconds allowed for the whole fold.
+
+    Returns:
+        tuple: (points DataFrame with brand, cutoff, h, y, yhat, yhat_lower, yhat_upper;
+                timing dict with engine, config, cutoff, brands, wall and CPU seconds, errors)
+    """
+    train = brand_trends[brand_trends["ds"] <= cutoff]
+    test = brand_trends[(brand_trends["ds"] > cutoff) & (brand_trends["ds"] <= cutoff + pd.Timedelta(days=horizon))]
+
+    timing = {"engine": engine, "config": config_name, "cutoff": cutoff, "brands": train["brand"].nunique()}
+    try:
+        with time_limit(timeout):
+            forecast, fit_wall, fit_cpu, predict_wall, predict_cpu, errors = BACKTEST_RUNNERS[engine](train, horizon, config)
+    except Exception as e:
+        errors = {brand: str(e) or type(e).__name__ for brand in train["brand"].unique()}
+        forecast, fit_wall, fit_cpu, predict_wall, predict_cpu = None, 0.0, 0.0, 0.0, 0.0
+
+    timing.update({"fit_seconds": fit_wall, "fit_cpu_seconds": fit_cpu,
+                   "predict_seconds": predict_wall, "predict_cpu_seconds": predict_cpu,
+                   "errors": errors})
+
+    if forecast is None or forecast.empty:
+        return pd.DataFrame(columns=["brand", "cutoff", "h", "y", "yhat", "yhat_lower", "yhat_upper"]), timing
+
+    points = test[["brand", "ds", "y"]].merge(
+        forecast[["brand", "ds", "yhat", "yhat_lower", "yhat_upper"]], on=["brand", "ds"], how="inner"
+    )
+    points["cutoff"] = cutoff
+    points["h"] = (points["ds"] - cutoff).dt.days
+    return points[["brand", "cutoff", "h", "y", "yhat", "yhat_lower", "yhat_upper"]], timing
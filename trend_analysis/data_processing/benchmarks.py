@@ -0,0 +1,47 @@
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+
+def make_synthetic_tweets(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Build a processed-tweets frame with realistic heavy-tailed engagement counts,
+    for benchmarking the scoring code without the NLP stages.
+    """
+    rng = np.random.default_rng(seed)
+    followers = np.round(rng.lognormal(6, 2, n_rows))
+    reach = np.log1p(followers)
+    views = rng.poisson(np.exp(reach * 0.8 + 1))
+    likes = rng.poisson(views * 0.02 + 0.5)
+    replies = rng.poisson(likes * 0.1 + 0.1)
+    retweets = rng.poisson(likes * 0.2 + 0.1)
+    sentiment = np.clip(0.05 * np.log1p(likes) - 0.08 * np.log1p(replies) + rng.normal(0, 0.25, n_rows), -1, 1)
+
+    return pd.DataFrame({
+        'date': pd.Timestamp('2024-01-01', tz='UTC') + pd.to_timedelta(rng.integers(0, 90 * 86400, n_rows), unit='s'),
+        'likeCount': likes,
+        'replyCount': replies,
+        'retweetCount': retweets,
+        'viewCount': views,
+        'followersCount': followers,
+        'tweets': ['new release look great love brand deal today'] * n_rows,
+        'brand': rng.choice(['nike', 'apple', 'samsung', 'google', 'amazon'], n_rows).astype(object),
+        'sentiment': sentiment,
+    })
+
+
+def measure(fn, *args, **kwargs):
+    """
+    Run fn once and return (result, wall seconds, peak traced memory in bytes).
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
@@ -0,0 +1,163 @@
+"""
+Coordination primitives for pipeline requests served by a threaded server.
+
+- SingleFlight coalesces identical in-flight computations: the first caller runs it,
+  concurrent callers with the same key wait and receive the same result (or exception).
+  If the caller running it gives up (Abandoned), the waiting callers run it again instead.
+- Per-stage semaphores cap how many copies of a heavy stage run at once; callers that
+  cannot get a slot within the wait limit get StageBusy instead of piling up. Background
+  jobs have no client to answer with a 503, so inside wait_for_slots() they queue instead.
+- KeyedLocks serialise writers of a shared resource such as an output file.
+"""
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Concurrent runs allowed per pipeline stage; stages not listed are unlimited.
+DEFAULT_STAGE_CONCURRENCY = {
+    "cleaned": 1,
+    "processed": 1,
+    "engagement_scores": 2,
+    "brand_trends": 4,
+    "forecast": 1,
+}
+
+
+# Set inside wait_for_slots(): stage slots are waited for without a time limit
+_wait_for_slots = contextvars.ContextVar("wait_for_slots", default=False)
+
+
+@contextmanager
+def wait_for_slots():
+    """
+    Within the block, StageLimiter.slot() waits for a free slot as long as it takes instead
+    of raising StageBusy.
+    """
+    token = _wait_for_slots.set(True)
+    try:
+        yield
+    finally:
+        _wait_for_slots.reset(token)
+
+
+class StageBusy(Exception):
+    """Raised when a pipeline stage has no free slot within the wait limit."""
+
+    def __init__(self, stage: str, wait: float):
+        super().__init__(f"Stage '{stage}' is at its concurrency limit; no slot freed up within {wait:g}s.")
+        self.stage = stage
+        self.wait = wait
+
+
+class Abandoned(Exception):
+    """
+    Raised by a computation whose caller gave up on it, e.g. because the caller's job was
+    cancelled. Says nothing about the computation itself, so SingleFlight does not share it.
+    """
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run fn at most once at a time per key; concurrent callers share its outcome, except
+    Abandoned: then one of the waiting callers runs fn again for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], object]):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+            if leader:
+                break
+
+            logger.info(f"Joining in-flight computation {key}")
+            call.done.wait()
+            if isinstance(call.error, Abandoned):
+                logger.info(f"In-flight computation {key} was abandoned; running it again")
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class StageLimiter:
+    """
+    One bounded semaphore per pipeline stage.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, wait: float = 30.0):
+        self.limits = dict(DEFAULT_STAGE_CONCURRENCY if limits is None else limits)
+        self.wait = wait
+        self._semaphores = {stage: threading.BoundedSemaphore(limit) for stage, limit in self.limits.items()}
+
+    @contextmanager
+    def slot(self, stage: str, wait: Optional[float] = None):
+        """
+        Hold a slot of `stage` for the duration of the block.
+
+        Raises:
+            StageBusy: If no slot becomes free within `wait` seconds (outside wait_for_slots()).
+        """
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            yield
+            return
+
+        wait = self.wait if wait is None else wait
+        if _wait_for_slots.get():
+            semaphore.acquire()
+        elif not semaphore.acquire(timeout=wait):
+            raise StageBusy(stage, wait)
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+class KeyedLocks:
+    """
+    A lock per key, created on first use.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, key: Hashable):
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            yield
@@ -0,0 +1,204 @@
+"""
+Read access to the pipeline's data lake outputs for the data endpoints.
+
+Tables are read with pyarrow, projecting only the requested columns and pushing brand and
+date filters down to the parquet reader, then served one page at a time. Pages are encoded
+as Arrow IPC streams or parquet (no per-value JSON encoding), with JSON as a fallback; the
+format follows the Accept header or ?format=arrow|parquet|json.
+"""
+import io
+import json
+import base64
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from collections import namedtuple
+from typing import List, Optional
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+from .pipeline import COUNT_PATH, ENGAGEMENT_SCORE_PATH, FORECAST_PATH
+from .result_cache import ResultCache, make_key, file_version
+
+DataTable = namedtuple("DataTable", ["path", "date_column", "date_format"])
+
+# Tables served under /api/data/<name>/. date_format is set for dates stored as strings.
+DATA_TABLES = {
+    "engagement_scores": DataTable(ENGAGEMENT_SCORE_PATH, "date", None),
+    "mention_counts": DataTable(COUNT_PATH, "date", "%Y-%m"),
+    "forecast": DataTable(FORECAST_PATH, "ds", None),
+}
+
+# Filtered tables being paged through, apart from the pipeline's result cache so that
+# dashboard queries never evict stage outputs
+query_cache = ResultCache(settings.DATA_QUERY_CACHE_MAX_ENTRIES, settings.DATA_QUERY_CACHE_MAX_BYTES)
+
+DEFAULT_PAGE_SIZE = 100_000
+MAX_PAGE_SIZE = 1_000_000
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+JSON_MEDIA_TYPE = "application/json"
+FORMATS = {"arrow": ARROW_MEDIA_TYPE, "parquet": PARQUET_MEDIA_TYPE, "json": JSON_MEDIA_TYPE}
+
+
+class DataQueryError(Exception):
+    """Invalid data query; `status` is the matching HTTP status."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def table_version(name: str) -> str:
+    """
+    Version of a table's file, changed by every pipeline write. Cheap: no data is read.
+    """
+    if name not in DATA_TABLES:
+        raise DataQueryError(f"Unknown table '{name}'. Available: {', '.join(DATA_TABLES)}", status=404)
+    try:
+        return file_version(DATA_TABLES[name].path)
+    except FileNotFoundError:
+        raise DataQueryError(f"No {name} data yet. Run the pipeline first.", status=404)
+
+
+def make_etag(version: str, *parts) -> str:
+    """
+    Strong ETag for a response built from table `version`; `parts` are everything else the
+    response body depends on (query parameters, format). Returned quoted, ready for the header.
+    """
+    digest = hashlib.sha1(json.dumps([version, *parts], default=str).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _open_table(name: str):
+    version = table_version(name)
+    table = DATA_TABLES[name]
+    # Partitioned datasets (the forecast) carry 'brand' in their directory names
+    return table, version, ds.dataset(table.path, format="parquet", partitioning="hive")
+
+
+def _date_bound(value: str, field_type: pa.DataType, date_format: Optional[str], end: bool):
+    """
+    Filter bound for a date column. A date without a time as end bound covers that whole day.
+    """
+    try:
+        bound = pd.Timestamp(value)
+    except ValueError:
+        raise DataQueryError(f"Invalid date '{value}'.")
+    if date_format is not None:
+        return bound.strftime(date_format)
+    if end and len(value) <= 10:
+        bound += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    if pa.types.is_timestamp(field_type) and field_type.tz is not None:
+        bound = bound.tz_localize(field_type.tz) if bound.tzinfo is None else bound.tz_convert(field_type.tz)
+    elif bound.tzinfo is not None:
+        bound = bound.tz_convert(None)
+    return pa.scalar(bound, type=field_type)
+
+
+def read_table(name: str, columns: Optional[List[str]] = None, brands: Optional[List[str]] = None,
+               start_date: Optional[str] = None, end_date: Optional[str] = None):
+    """
+    Read a data lake table with column projection and brand/date filters.
+
+    The filtered table is kept in query_cache under the file's version, so paging
+    through it reads the file once.
+
+    Returns:
+        tuple: (pyarrow.Table, table version)
+    """
+    table, version, dataset = _open_table(name)
+    schema = dataset.schema
+    if columns:
+        unknown = [column for column in columns if column not in schema.names]
+        if unknown:
+            raise DataQueryError(f"Unknown columns for {name}: {', '.join(unknown)}")
+
+    def read():
+        expression = None
+        if brands:
+            expression = ds.field("brand").isin(brands)
+        for value, end in ((start_date, False), (end_date, True)):
+            if value:
+                bound = _date_bound(value, schema.field(table.date_column).type, table.date_format, end)
+                condition = ds.field(table.date_column) <= bound if end else ds.field(table.date_column) >= bound
+                expression = condition if expression is None else expression & condition
+        return dataset.to_table(columns=columns or None, filter=expression)
+
+    key = make_key(version, f"data:{name}", brands, {"columns": columns, "start": start_date, "end": end_date})
+    return query_cache.get_or_compute(key, read), version
+
+
+def list_brands(name: str) -> List[str]:
+    _, version, dataset = _open_table(name)
+    key = make_key(version, f"data:{name}:brands")
+    brands = query_cache.get_or_compute(key, lambda: dataset.to_table(columns=["brand"]).column("brand").unique())
+    return sorted(str(brand) for brand in brands.to_pylist() if brand is not None)
+
+
+def encode_cursor(version: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"v": version, "o": offset}).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str], version: str) -> int:
+    """
+    Offset encoded in a cursor. Cursors are tied to a table version, so a page never mixes
+    rows from before and after the pipeline rewrote the table.
+    """
+    if not cursor:
+        return 0
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        offset = int(state["o"])
+    except (ValueError, KeyError, TypeError):
+        raise DataQueryError("Invalid cursor.")
+    if state.get("v") != version:
+        raise DataQueryError("The data changed since this cursor was issued; start again without a cursor.", status=409)
+    return offset
+
+
+def page(table: pa.Table, version: str, cursor: Optional[str], limit: int):
+    """
+    Returns:
+        tuple: (page as pyarrow.Table, next cursor or None)
+    """
+    offset = decode_cursor(cursor, version)
+    chunk = table.slice(offset, limit)
+    next_offset = offset + chunk.num_rows
+    return chunk, encode_cursor(version, next_offset) if next_offset < table.num_rows else None
+
+
+class _PassthroughRenderer(BaseRenderer):
+    """
+    Lets DRF content negotiation select a binary format; the view encodes the body itself.
+    """
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class ArrowRenderer(_PassthroughRenderer):
+    media_type = ARROW_MEDIA_TYPE
+    format = "arrow"
+
+
+class ParquetRenderer(_PassthroughRenderer):
+    media_type = PARQUET_MEDIA_TYPE
+    format = "parquet"
+
+
+def encode_page(chunk: pa.Table, fmt: str) -> bytes:
+    if fmt == "arrow":
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, chunk.schema) as writer:
+            writer.write_table(chunk)
+        return sink.getvalue()
+    if fmt == "parquet":
+        sink = io.BytesIO()
+        pq.write_table(chunk, sink)
+        return sink.getvalue()
+    return chunk.to_pandas().to_json(orient="records", date_format="iso").encode()
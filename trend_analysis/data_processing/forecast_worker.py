@@ -0,0 +1,162 @@
+"""
+Code that runs inside forecast worker processes.
+
+Kept outside data_processing.services on purpose: importing the services package
+loads spaCy models, and worker processes started with the "spawn" method (the
+macOS default) would otherwise pay for that in every worker.
+"""
+import os
+import time
+import signal
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+
+PROPHET_CONFIG = {
+    "yearly_seasonality": True,
+    "weekly_seasonality": True,
+    "daily_seasonality": False,
+    "changepoint_prior_scale": 0.05,
+    "seasonality_prior_scale": 10,
+}
+
+
+class BrandFitTimeout(Exception):
+    """Raised inside a worker when a brand's fit exceeds its time limit."""
+
+
+def warm_worker():
+    """
+    Pool initializer: import Prophet and its Stan backend once per worker so the
+    first brand fit does not pay the startup cost.
+
+    The worker leads a process group of its own, which then holds the cmdstan processes
+    of its fits too, so they can be stopped along with a fit that timed out.
+
+    Must never raise: a failing initializer makes the pool respawn workers forever.
+    Any real problem resurfaces as a per-brand error when the fit runs.
+    """
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    try:
+        from prophet import Prophet
+        Prophet(**PROPHET_CONFIG)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Forecast worker warm-up failed: {e}")
+
+
+def _raise_timeout(signum, frame):
+    raise BrandFitTimeout()
+
+
+def stop_fit_processes():
+    """
+    Terminate the cmdstan processes an interrupted fit left running: the rest of this
+    worker's process group. Does nothing outside a pool worker, so the server's own process
+    group is never signalled.
+    """
+    if not hasattr(os, "killpg") or os.getpgrp() != os.getpid():
+        return
+    previous = signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    try:
+        os.killpg(0, signal.SIGTERM)
+    except OSError:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+
+@contextmanager
+def time_limit(seconds):
+    """
+    Interrupt the block after `seconds` using SIGALRM. Only possible in a process's
+    main thread on Unix (which is where pool workers run tasks); elsewhere it is a no-op.
+    """
+    if not seconds or not hasattr(signal, "SIGALRM") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    except BrandFitTimeout:
+        stop_fit_processes()
+        raise
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def warm_start_params(model) -> dict:
+    """
+    Fitted parameters of a Prophet model in the form accepted by Prophet.fit(init=...).
+    """
+    params = {}
+    for name in ["k", "m", "sigma_obs"]:
+        params[name] = model.params[name][0][0] if model.mcmc_samples == 0 else np.mean(model.params[name])
+    for name in ["delta", "beta"]:
+        params[name] = model.params[name][0] if model.mcmc_samples == 0 else np.mean(model.params[name], axis=0)
+    return params
+
+
+def fit_prophet_forecast(brand_data: pd.DataFrame, forecast_periods: int, model_config: dict,
+                         init_model_json: str = None):
+    from prophet import Prophet
+    from prophet.serialize import model_from_json
+
+    # Initialize and configure the Prophet model
+    model = Prophet(**model_config)
+
+    # Fit the model to the brand's data, starting from a previous fit's parameters if given
+    if init_model_json is not None:
+        try:
+            model.fit(brand_data, init=warm_start_params(model_from_json(init_model_json)))
+        except BrandFitTimeout:
+            raise
+        except Exception as e:
+            # E.g. the longer series has a different number of changepoints than the earlier
+            # fit, so its 'delta' does not fit, or Stan rejects the initial values
+            logging.getLogger(__name__).info(f"Warm-started fit failed ({e}); fitting from scratch")
+            model = Prophet(**model_config)
+            model.fit(brand_data)
+    else:
+        model.fit(brand_data)
+
+    # Generate future dates and forecast
+    future_dates = model.make_future_dataframe(periods=forecast_periods)
+    return model.predict(future_dates), model
+
+
+def fit_brand_forecast(brand: str, brand_data: pd.DataFrame, forecast_periods: int,
+                       model_config: dict, timeout: float = None, init_model_json: str = None):
+    """
+    Fit one brand's Prophet model and forecast forecast_periods days ahead.
+
+    Args:
+        init_model_json (str): Serialized earlier model of the same brand and config;
+                               its parameters warm-start the optimizer.
+
+    Returns:
+        tuple: (forecast DataFrame with 'brand' and 'type' columns, fit seconds, model JSON)
+
+    Raises:
+        BrandFitTimeout: If the fit takes longer than timeout seconds.
+    """
+    from prophet.serialize import model_to_json
+
+    start = time.perf_counter()
+    with time_limit(timeout):
+        forecast, model = fit_prophet_forecast(brand_data, forecast_periods, model_config, init_model_json)
+
+    # Add the brand name to the forecast
+    forecast["brand"] = brand
+
+    # 'Type' column to differentiate actual vs. forecasted
+    forecast["type"] = "forecasted"
+    forecast.loc[forecast["ds"].isin(brand_data["ds"]), "type"] = "actual"
+
+    return forecast, time.perf_counter() - start, model_to_json(model)
@@ -0,0 +1,241 @@
+"""
+In-process background jobs for the pipeline.
+
+A job is an ordered list of stages, each depending on the one before it, run by a local
+thread pool; there is no external broker. Its status, per-stage progress and timings can
+be polled by id. Cancellation is cooperative: it takes effect at the next stage boundary
+or at the next progress report of the running stage. Stages wait for a free slot of a
+busy pipeline stage (concurrency.StageLimiter) instead of failing with StageBusy.
+
+Every change to a job bumps its `revision`, and wait_for_change() lets a status stream
+block until the next one instead of polling.
+"""
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+from . import tracing
+from .concurrency import Abandoned, wait_for_slots
+
+logger = logging.getLogger(__name__)
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED, SKIPPED = "pending", "running", "done", "failed", "cancelled", "skipped"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Abandoned):
+    """
+    Raised inside a stage when its job has been cancelled. A computation shared with other
+    requests (ResultCache.get_or_compute) is then run again by one of them, not failed.
+    """
+
+
+class Job:
+    """
+    One pipeline run. Stage functions receive the job and may call job.report_progress().
+    """
+
+    def __init__(self, name: str, stages: List[Tuple[str, Callable[["Job"], object]]], params: Optional[dict] = None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.params = params or {}
+        self.status = PENDING
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._functions = [fn for _, fn in stages]
+        self.stages = [
+            {"name": stage_name, "status": PENDING, "progress": 0.0, "message": None, "eta_seconds": None,
+             "started_at": None, "finished_at": None, "seconds": None, "result": None, "error": None}
+            for stage_name, _ in stages
+        ]
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.revision = 0
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        with self._lock:
+            self._touch()
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def report_progress(self, fraction: float, message: Optional[str] = None) -> None:
+        """
+        Record progress (0..1) of the running stage and estimate its remaining time.
+        Raises JobCancelled if the job was cancelled.
+        """
+        fraction = max(0.0, min(1.0, float(fraction)))
+        with self._lock:
+            for stage in self.stages:
+                if stage["status"] == RUNNING:
+                    stage["progress"] = fraction
+                    if message is not None:
+                        stage["message"] = message
+                    if fraction > 0:
+                        elapsed = time.time() - stage["started_at"]
+                        stage["eta_seconds"] = round(elapsed * (1 - fraction) / fraction, 1)
+            self._touch()
+        self.check_cancelled()
+
+    def _touch(self) -> None:
+        # Callers hold self._lock
+        self.revision += 1
+        self._changed.notify_all()
+
+    def wait_for_change(self, revision: int, timeout: float) -> int:
+        """
+        Block until the job's revision differs from `revision` or `timeout` seconds pass.
+        Returns the current revision.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.revision != revision, timeout=timeout)
+            return self.revision
+
+    @property
+    def progress(self) -> float:
+        with self._lock:
+            return sum(stage["progress"] for stage in self.stages) / max(len(self.stages), 1)
+
+    def to_dict(self) -> dict:
+        progress = self.progress
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "revision": self.revision,
+                "name": self.name,
+                "params": self.params,
+                "status": self.status,
+                "cancel_requested": self.cancel_requested,
+                "error": self.error,
+                "progress": round(progress, 4),
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "seconds": round(self.finished_at - self.started_at, 3) if self.finished_at and self.started_at else None,
+                "stages": [dict(stage) for stage in self.stages],
+            }
+
+    def run(self) -> None:
+        # Part of the trace of the request that submitted the job, if any
+        with tracing.span(f"job:{self.name}", job_id=self.id) as attributes, wait_for_slots():
+            self._run_stages()
+            attributes["status"] = self.status
+
+    def _run_stages(self) -> None:
+        self._set(status=RUNNING, started_at=time.time())
+        status, error = DONE, None
+        for index, fn in enumerate(self._functions):
+            stage = self.stages[index]
+            if self.cancel_requested:
+                self._finish_remaining(index, CANCELLED)
+                status = CANCELLED
+                break
+
+            with self._lock:
+                stage.update(status=RUNNING, started_at=time.time())
+                self._touch()
+            start = time.perf_counter()
+            try:
+                with tracing.span(f"stage:{stage['name']}", job_id=self.id):
+                    result = fn(self)
+            except JobCancelled:
+                self._end_stage(stage, CANCELLED, start)
+                self._finish_remaining(index + 1, CANCELLED)
+                status = CANCELLED
+                break
+            except Exception as e:
+                logger.exception(f"Job {self.id} stage {stage['name']} failed")
+                self._end_stage(stage, FAILED, start, error=str(e))
+                self._finish_remaining(index + 1, SKIPPED)
+                status, error = FAILED, f"{stage['name']}: {e}"
+                break
+            self._end_stage(stage, DONE, start, result=result, progress=1.0, eta_seconds=0.0)
+        # Status and finish time change together, so a finished job always has both
+        self._set(status=status, error=error, finished_at=time.time())
+        logger.info(f"Job {self.id} ({self.name}) finished: {self.status}")
+
+    def _set(self, **fields) -> None:
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self._touch()
+
+    def _end_stage(self, stage: dict, status: str, start: float, **fields) -> None:
+        with self._lock:
+            stage.update(status=status, finished_at=time.time(), seconds=round(time.perf_counter() - start, 3), **fields)
+            self._touch()
+
+    def _finish_remaining(self, first: int, status: str) -> None:
+        with self._lock:
+            for stage in self.stages[first:]:
+                stage["status"] = status
+            self._touch()
+
+
+def job_events(job: Job, heartbeat: float = 15.0):
+    """
+    Yield the job's state (Job.to_dict()) each time it changes, ending with its final state.
+    Yields None after `heartbeat` seconds without a change, so a stream can keep its
+    connection alive.
+    """
+    revision = None
+    while True:
+        if revision is not None and job.wait_for_change(revision, heartbeat) == revision:
+            yield None
+            continue
+        snapshot = job.to_dict()
+        revision = snapshot["revision"]
+        yield snapshot
+        if snapshot["status"] in FINISHED_STATES:
+            return
+
+
+class JobRunner:
+    """
+    Runs jobs on a thread pool and keeps the most recent `history` jobs for status queries.
+    """
+
+    def __init__(self, max_workers: int = 2, history: int = 100):
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, job: Job) -> Job:
+        with self._lock:
+            self._jobs[job.id] = job
+            # Forget the oldest finished jobs beyond the history limit
+            for job_id in [job_id for job_id, old in self._jobs.items() if old.status in FINISHED_STATES]:
+                if len(self._jobs) <= self.history:
+                    break
+                del self._jobs[job_id]
+        # Run in a copy of the submitter's context, so the job continues its trace
+        self._executor.submit(contextvars.copy_context().run, job.run)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is not None and job.status not in FINISHED_STATES:
+            job.cancel()
+        return job
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
@@ -0,0 +1,65 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from data_processing.benchmarks import make_synthetic_tweets
+from data_processing.services.data_lake_loader import load_raw_data
+from data_processing.services.engagement_model import fit_engagement_model, apply_engagement_model
+from data_processing.services.engagement_score import get_brand_trends
+from data_processing.services.backtest import DEFAULT_BACKTEST_CONFIGS, backtest_forecast_engines
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../"))
+
+class Command(BaseCommand):
+	help = "Rolling-origin backtest of the forecast engines: MAPE, sMAPE, interval coverage and fit/predict cost"
+
+	def add_arguments(self, parser):
+		parser.add_argument("--input", default=os.path.join(PROJECT_DIR, "data_lake/engagement_score", "engagement_score.parquet"),
+							help="Parquet file of scored tweets ('date', 'brand', 'engagement_score')")
+		parser.add_argument("--synthetic", type=int, default=None, metavar="ROWS",
+							help="Backtest on this many synthetic tweets instead of --input")
+		parser.add_argument("--brands", nargs="+", default=None, help="Brands to include (default: all in the data)")
+		parser.add_argument("--engines", nargs="+", default=list(DEFAULT_BACKTEST_CONFIGS),
+							choices=list(DEFAULT_BACKTEST_CONFIGS), help="Engines to backtest")
+		parser.add_argument("--horizons", nargs="+", type=int, default=[7, 14, 30], help="Horizons in days")
+		parser.add_argument("--folds", type=int, default=3, help="Number of rolling origins")
+		parser.add_argument("--step", type=int, default=7, help="Days between origins")
+		parser.add_argument("--min-train-days", type=int, default=14, help="Minimum history before the first origin")
+		parser.add_argument("--workers", type=int, default=None,
+							help="Worker processes (defaults to settings.FORECAST_WORKERS)")
+		parser.add_argument("--output", default=None, help="Also write the per-point errors to this parquet file")
+
+	def handle(self, *args, **options):
+		if options["synthetic"]:
+			tweets = make_synthetic_tweets(options["synthetic"])
+			scored = apply_engagement_model(tweets, fit_engagement_model(tweets, target=None))
+		elif os.path.exists(options["input"]):
+			scored = load_raw_data(options["input"])
+		else:
+			raise CommandError(f"{options['input']} not found. Run the pipeline first or pass --synthetic ROWS.")
+
+		brands = options["brands"] or sorted(scored["brand"].dropna().unique())
+		brand_trends = get_brand_trends(scored, brands)
+		configs = {engine: DEFAULT_BACKTEST_CONFIGS[engine] for engine in options["engines"]}
+		self.stdout.write(f"Backtesting {', '.join(configs)} on {len(brands)} brands, {brand_trends['ds'].nunique()} days")
+
+		try:
+			summary, points = backtest_forecast_engines(
+				brand_trends, options["horizons"], configs, folds=options["folds"], step=options["step"],
+				min_train_days=options["min_train_days"], workers=options["workers"]
+			)
+		except ValueError as e:
+			raise CommandError(str(e))
+
+		header = (f"{'engine':<8} {'config':<12} {'h':>3} {'points':>7} {'mape':>8} {'smape':>8} {'coverage':>9} "
+				  f"{'fit_s':>8} {'predict_s':>9} {'cpu_s':>8} {'errors':>6}")
+		self.stdout.write(header)
+		self.stdout.write("-" * len(header))
+		for row in summary.itertuples():
+			self.stdout.write(
+				f"{row.engine:<8} {row.config:<12} {row.horizon:>3} {row.points:>7} {row.mape:>8.2f} {row.smape:>8.2f} "
+				f"{row.coverage:>9.3f} {row.fit_seconds:>8.3f} {row.predict_seconds:>9.3f} {row.cpu_seconds:>8.3f} {row.errors:>6}"
+			)
+		self.stdout.write("mape/smape in %, coverage of the forecast interval; times are totals over all folds")
+
+		if options["output"]:
+			points.to_parquet(options["output"], index=False)
+			self.stdout.write(f"Per-point errors saved to {options['output']}")
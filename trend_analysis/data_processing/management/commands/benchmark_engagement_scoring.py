@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from data_processing.benchmarks import make_synthetic_tweets, measure
+from data_processing.services.engagement_model import fit_engagement_model, apply_engagement_model
+
+
+def _pandas_series_scoring(df: pd.DataFrame, model: dict) -> pd.DataFrame:
+	"""
+	The previous scoring path: full frame copy and one pandas operation per feature.
+	Kept here as the baseline for the benchmark.
+	"""
+	df = df.copy()
+	followers = model['followers_scaler']
+	df['followersCount'] = (df['followersCount'] - followers['center']) / followers['scale']
+	for feature, stats in model['engagement_scaler'].items():
+		df[feature] = (df[feature] - stats['mean']) / stats['scale']
+	df['sentiment_impact'] = np.tanh(df['sentiment'] * 2)
+
+	w = model['weights']
+	df['engagement_score'] = (
+		df['likeCount'] * w['likeCount'] +
+		df['replyCount'] * w['replyCount'] +
+		df['retweetCount'] * w['retweetCount'] +
+		df['viewCount'] * w['viewCount'] +
+		df['sentiment_impact'] * w['sentiment_impact'] +
+		df['followersCount'] * w['followersCount']
+	)
+	return df[['date', 'likeCount', 'replyCount', 'retweetCount', 'viewCount',
+			   'followersCount', 'tweets', 'brand', 'sentiment', 'engagement_score']]
+
+
+class Command(BaseCommand):
+	help = "Compare time and peak memory of the float32 matrix scoring path against the pandas Series path"
+
+	def add_arguments(self, parser):
+		parser.add_argument("--sizes", nargs="+", type=int, default=[100_000, 1_000_000],
+							help="Dataset sizes (rows) to benchmark")
+		parser.add_argument("--repeats", type=int, default=3, help="Runs per implementation; median time is reported")
+
+	def handle(self, *args, **options):
+		header = f"{'rows':>9} {'implementation':<16} {'time_s':>8} {'peak_mb':>9} {'max_abs_diff':>13}"
+		self.stdout.write(header)
+		self.stdout.write("-" * len(header))
+
+		for n_rows in options["sizes"]:
+			df = make_synthetic_tweets(n_rows)
+			model = fit_engagement_model(df, target=None)
+
+			baseline = None
+			for name, scorer in (("pandas_series", _pandas_series_scoring), ("float32_matrix", apply_engagement_model)):
+				runs = [measure(scorer, df, model) for _ in range(options["repeats"])]
+				result = runs[0][0]
+				if baseline is None:
+					baseline = result["engagement_score"].to_numpy(dtype=np.float64)
+				diff = np.nanmax(np.abs(result["engagement_score"].to_numpy(dtype=np.float64) - baseline))
+				self.stdout.write(
+					f"{n_rows:>9} {name:<16} {np.median([r[1] for r in runs]):>8.3f} "
+					f"{max(r[2] for r in runs) / 2**20:>9.1f} {diff:>13.2e}"
+				)
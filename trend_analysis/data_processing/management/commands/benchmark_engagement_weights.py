@@ -0,0 +1,50 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from data_processing.benchmarks import make_synthetic_tweets, measure
+from data_processing.services.engagement_model import WEIGHT_BACKENDS, SCORE_FEATURES, fit_engagement_model
+
+LARGE_SIZES = [100_000, 1_000_000]
+
+class Command(BaseCommand):
+	help = "Compare engagement weight-learning backends on training cost and weight stability"
+
+	def add_arguments(self, parser):
+		parser.add_argument("--sizes", nargs="+", type=int, default=[10_000],
+							help="Dataset sizes (rows) to benchmark")
+		parser.add_argument("--large", action="store_true",
+							help="Also benchmark 100,000 and 1,000,000 rows; the full random forest takes minutes there")
+		parser.add_argument("--backends", nargs="+", default=list(WEIGHT_BACKENDS),
+							choices=list(WEIGHT_BACKENDS), help="Backends to benchmark")
+		parser.add_argument("--repeats", type=int, default=3,
+							help="Runs per backend and size, each on a fresh synthetic sample")
+
+	def handle(self, *args, **options):
+		header = f"{'rows':>9} {'backend':<26} {'time_s':>8} {'peak_mb':>9} {'stability':>10}  weights"
+		self.stdout.write(header)
+		self.stdout.write("-" * len(header))
+
+		sizes = list(options["sizes"])
+		if options["large"]:
+			sizes += [n for n in LARGE_SIZES if n not in sizes]
+
+		for n_rows in sizes:
+			samples = [make_synthetic_tweets(n_rows, seed=seed) for seed in range(options["repeats"])]
+			for backend in options["backends"]:
+				times, peaks, weights = [], [], []
+				for sample in samples:
+					model, elapsed, peak = measure(fit_engagement_model, sample, "sentiment", weight_backend=backend)
+					times.append(elapsed)
+					peaks.append(peak)
+					weights.append([model["weights"][f] for f in SCORE_FEATURES])
+
+				# Stability: mean L1 distance of each run's weights from the runs' average.
+				weights = np.array(weights)
+				stability = np.abs(weights - weights.mean(axis=0)).sum(axis=1).mean()
+				mean_weights = " ".join(f"{w:.3f}" for w in weights.mean(axis=0))
+				self.stdout.write(
+					f"{n_rows:>9} {backend:<26} {np.median(times):>8.2f} {max(peaks) / 2**20:>9.1f} "
+					f"{stability:>10.4f}  {mean_weights}"
+				)
+
+		self.stdout.write(f"weights order: {' '.join(SCORE_FEATURES)}")
+		self.stdout.write("stability: mean L1 distance from the average weights across repeats (lower is more stable)")
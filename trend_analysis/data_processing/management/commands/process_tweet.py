@@ -4,7 +4,10 @@ from data_processing.services.tweet_processor import process_tweets, count_brand
 from data_processing.services.tweets_cleaner import process_tweets_column
 from data_processing.services.engagement_score import calculate_engagement_score, get_brand_trends
 from data_processing.services.forecast import forecast_trends
+from data_processing.services.forecast_store import save_forecast
 from data_processing.services.search_engine import  search_multiple_brands
+from data_processing.profiling import PROFILE_MODES, profile_session
+from contextlib import nullcontext
 
 
 import pandas as pd
@@ -14,7 +17,22 @@ brands = ["nike", "samsung", "google", "microsoft", "amazon"]
 class Command(BaseCommand):
 	help = "Process raw tweet and calculate engagement scores"
 
+	def add_arguments(self, parser):
+		parser.add_argument("--profile", nargs="?", const="default", choices=PROFILE_MODES + ("default",),
+							help="Profile the run (cprofile, sampling or both; default PROFILE_MODE) and write the profile under logs/profiles")
+
 	def handle(self, *args, **options):
+		mode = options["profile"]
+		if mode is None:
+			session = nullcontext([])
+		else:
+			session = profile_session("process_tweet", None if mode == "default" else mode)
+		with session as profile_files:
+			self.run()
+		for path in profile_files:
+			self.stdout.write(f"Profile written to {path}")
+
+	def run(self):
 		try:
 			#step 1: load raw tweet data from the data lake
 			raw_data_path = "/Users/nelson/py/ml_App/trend-analysis/temp/test_data_set.parquet"
@@ -40,6 +58,6 @@ class Command(BaseCommand):
 			F_data = get_brand_trends(data_with_score, brands)
 			self.stdout.write("forcasting trends")
 			df = forecast_trends(F_data, 30)
-			df.to_parquet("mini_final_with_trends.parquet", index=False)
+			save_forecast(df, "mini_final_with_trends.parquet")
 		except Exception as e:
 			self.stderr.write(f"An error occured: {e}")
\ No newline at end of file
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from data_processing.services.data_lake_loader import load_raw_data, save_to_data_lake
+from data_processing.services.online_scaling import score_engagement_batch
+
+class Command(BaseCommand):
+	help = "Score a micro-batch of processed tweets with the running (incremental) engagement statistics"
+
+	def add_arguments(self, parser):
+		parser.add_argument("input", help="Parquet file of processed tweets (with 'brand' and 'sentiment')")
+		parser.add_argument("--state", default=None,
+							help="Path of the running statistics (defaults to settings.ENGAGEMENT_ONLINE_STATE_PATH)")
+
+	def handle(self, *args, **options):
+		batch = load_raw_data(options["input"])
+		self.stdout.write(f"Scoring {len(batch)} tweets incrementally")
+		scored = score_engagement_batch(batch, state_path=options["state"])
+		path = save_to_data_lake(scored, "engagement_score_batch", folder="engagement_score")
+		self.stdout.write(f"Scored batch saved to {path}")
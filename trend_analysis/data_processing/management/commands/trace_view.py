@@ -0,0 +1,114 @@
+import os
+import json
+from collections import defaultdict
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def load_spans(paths):
+	spans = []
+	for path in paths:
+		if not os.path.exists(path):
+			raise CommandError(f"{path} not found. Trace a request first (DASHBOARD_TRACING=true, a traceparent header or TRACE_ALL_REQUESTS=true).")
+		with open(path) as f:
+			for line in f:
+				try:
+					span = json.loads(line)
+				except ValueError:
+					continue  # partly written line
+				span["end"] = span["start"] + span["duration_ms"] / 1000
+				spans.append(span)
+	return spans
+
+
+def critical_path(span, children):
+	"""
+	Spans on the critical path below `span`: starting from the child that finished last (which
+	may outlive its parent, like a background job submitted by a request), walk back through
+	the children, each time to the one that finished last before the current one started.
+	Returns (span, self_ms) pairs, self_ms being the time not spent in a critical child.
+	"""
+	path = []
+	critical_ms = 0.0
+	cursor = float("inf")
+	for child in sorted(children[span["span_id"]], key=lambda s: s["end"], reverse=True):
+		if child["end"] <= cursor + 1e-6:
+			path.append(child)
+			critical_ms += child["duration_ms"]
+			cursor = child["start"]
+
+	result = [(span, max(span["duration_ms"] - critical_ms, 0.0))]
+	for child in reversed(path):
+		result.extend(critical_path(child, children))
+	return result
+
+
+class Command(BaseCommand):
+	help = "Print a trace recorded in the trace file as a span tree, with the critical path of the interaction"
+
+	def add_arguments(self, parser):
+		parser.add_argument("trace_id", nargs="?", default=None, help="Trace to print (default: the latest one)")
+		parser.add_argument("--file", action="append", default=None,
+							help="Trace file(s) to read (default: settings.TRACE_FILE and its rotated "
+								"TRACE_FILE.1); repeat to merge files")
+		parser.add_argument("--list", type=int, default=None, metavar="N", help="List the N latest traces instead")
+
+	def handle(self, *args, **options):
+		files = options["file"]
+		if not files:
+			# Traces that were being recorded when the file was rotated continue in the new one
+			rotated = settings.TRACE_FILE + ".1"
+			files = ([rotated] if os.path.exists(rotated) else []) + [settings.TRACE_FILE]
+		spans = load_spans(files)
+		traces = defaultdict(list)
+		for span in spans:
+			traces[span["trace_id"]].append(span)
+		if not traces:
+			raise CommandError("No spans recorded yet.")
+		by_start = sorted(traces, key=lambda trace_id: min(s["start"] for s in traces[trace_id]))
+
+		if options["list"] is not None:
+			for trace_id in by_start[-options["list"]:]:
+				trace = traces[trace_id]
+				start, end = min(s["start"] for s in trace), max(s["end"] for s in trace)
+				ids = {s["span_id"] for s in trace}
+				roots = sorted({s["name"] for s in trace if s["parent_id"] not in ids})
+				self.stdout.write(f"{trace_id}  {datetime.fromtimestamp(start):%Y-%m-%d %H:%M:%S}  "
+								  f"{(end - start) * 1000:>9.1f}ms  {len(trace):>4} spans  {', '.join(roots)}")
+			return
+
+		trace_id = options["trace_id"] or by_start[-1]
+		if trace_id not in traces:
+			raise CommandError(f"Trace '{trace_id}' not found.")
+		trace = traces[trace_id]
+
+		# Spans whose parent was not recorded (dashboard calls, untraced callers) hang off a
+		# virtual root spanning the whole trace
+		ids = {s["span_id"] for s in trace}
+		start, end = min(s["start"] for s in trace), max(s["end"] for s in trace)
+		root = {"span_id": None, "name": "(trace)", "service": "", "start": start, "end": end,
+				"duration_ms": (end - start) * 1000, "attributes": {}}
+		children = defaultdict(list)
+		for span in trace:
+			parent_id = span["parent_id"] if span["parent_id"] in ids else None
+			children[parent_id].append(span)
+
+		self.stdout.write(f"Trace {trace_id}: {len(trace)} spans, {root['duration_ms']:.1f}ms")
+		self.stdout.write(f"{'start_ms':>9} {'ms':>9}  span")
+
+		def write_tree(span, depth):
+			for child in sorted(children[span["span_id"]], key=lambda s: s["start"]):
+				attributes = {k: v for k, v in child.get("attributes", {}).items() if v is not None}
+				details = " ".join(f"{k}={v}" for k, v in attributes.items())
+				status = "" if child.get("status", "ok") == "ok" else f" [{child['status']}]"
+				self.stdout.write(f"{(child['start'] - start) * 1000:>9.1f} {child['duration_ms']:>9.1f}  "
+								  f"{'  ' * depth}{child['service']}: {child['name']}{status}  {details}".rstrip())
+				write_tree(child, depth + 1)
+		write_tree(root, 0)
+
+		self.stdout.write("")
+		self.stdout.write("Critical path (self time: time not spent in the next span on the path)")
+		self.stdout.write(f"{'ms':>9} {'self_ms':>9}  span")
+		for span, self_ms in critical_path(root, children)[1:]:
+			self.stdout.write(f"{span['duration_ms']:>9.1f} {self_ms:>9.1f}  {span['service']}: {span['name']}")
@@ -0,0 +1,34 @@
+import os
+from django.core.management.base import BaseCommand
+from data_processing.services.data_lake_loader import load_raw_data
+from data_processing.services.tweet_processor import process_tweets
+from data_processing.services.tweets_cleaner import process_tweets_column
+from data_processing.services.engagement_model import WEIGHT_BACKENDS, fit_engagement_model, save_engagement_model
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../"))
+
+class Command(BaseCommand):
+	help = "Train the engagement model and save it as a new versioned artifact"
+
+	def add_arguments(self, parser):
+		parser.add_argument("--input", default=os.path.join(PROJECT_DIR, "temp", "test_data_set.parquet"),
+							help="Raw tweet parquet file to train on")
+		parser.add_argument("--brands", nargs="+", default=["apple", "coca-cola", "nike", "samsung", "google", "microsoft", "amazon"],
+							help="Brands to track")
+		parser.add_argument("--target", default="sentiment", help="Column used to learn feature weights")
+		parser.add_argument("--backend", choices=list(WEIGHT_BACKENDS), default=None,
+							help="Weight-learning backend (defaults to settings.ENGAGEMENT_WEIGHT_BACKEND)")
+
+	def handle(self, *args, **options):
+		self.stdout.write(f"Loading raw data from: {options['input']}")
+		data = load_raw_data(options["input"])
+		self.stdout.write("Cleaning tweets and extracting brand mentions")
+		data = process_tweets_column(data, "tweets")
+		data = process_tweets(data, options["brands"])
+
+		self.stdout.write(f"Training engagement model on {len(data)} tweets")
+		model = fit_engagement_model(data, options["target"], weight_backend=options["backend"])
+		path = save_engagement_model(model)
+		self.stdout.write(f"Saved engagement model v{model['version']} to {path}")
+		for feature, weight in model["weights"].items():
+			self.stdout.write(f"  {feature}: {weight:.4f}")
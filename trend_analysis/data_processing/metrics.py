@@ -0,0 +1,254 @@
+"""
+In-process metrics in the Prometheus text exposition format, served on /metrics.
+
+Service functions are wrapped with @instrument_stage, which records per call the wall time,
+rows in and out, throughput and how much the call raised the process's peak RSS. The request
+middleware records per-view latency. Metrics live in the memory of one process: behind a
+multi-process server each process exposes its own.
+
+Stage functions that run in the stage process pool record into a capture() buffer instead,
+and the pool merges those samples into the parent's metrics when each task returns.
+"""
+import sys
+import math
+import time
+import resource
+import threading
+import functools
+import pandas as pd
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+from . import tracing
+
+# Seconds; requests are mostly fast, stages run from milliseconds to minutes
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # Per-bucket counts, then the count of all observations (the +Inf bucket)
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, counts):
+                    labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+stage_seconds = Histogram("trend_stage_duration_seconds", "Wall time of pipeline service calls.",
+                          ["stage"], buckets=STAGE_BUCKETS)
+stage_calls = Counter("trend_stage_calls_total", "Pipeline service calls.", ["stage", "outcome"])
+stage_rows_in = Counter("trend_stage_rows_in_total", "Rows passed to pipeline services.", ["stage"])
+stage_rows_out = Counter("trend_stage_rows_out_total", "Rows returned by pipeline services.", ["stage"])
+stage_rows_per_second = Gauge("trend_stage_rows_per_second", "Throughput of the last call of each pipeline service.",
+                              ["stage"])
+stage_rss_growth = Gauge("trend_stage_peak_rss_growth_bytes",
+                         "How much the last call of each pipeline service raised the peak resident memory of the "
+                         "process that ran it; 0 if it stayed below the earlier peak.", ["stage"])
+brand_fit_seconds = Gauge("trend_forecast_brand_fit_seconds", "Fit time of the last forecast of each brand.",
+                          ["brand", "engine"])
+request_seconds = Histogram("trend_http_request_duration_seconds", "Latency of API requests by view.",
+                            ["view", "method", "status"])
+
+StageSample = namedtuple("StageSample", ["stage", "seconds", "rows_in", "rows_out", "rss_growth", "ok"])
+
+_capture = threading.local()
+
+
+def peak_rss_bytes() -> int:
+    """
+    Highest resident memory of this process since it started (getrusage's ru_maxrss); it
+    never goes down, so a stage is measured by how much it raises it.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def _rows(value):
+    return len(value) if isinstance(value, pd.DataFrame) else None
+
+
+def record_stage(sample: StageSample) -> None:
+    """
+    Add one call's sample to the metrics, or to the active capture() buffer.
+    """
+    buffer = getattr(_capture, "samples", None)
+    if buffer is not None:
+        buffer.append(sample)
+        return
+
+    stage_calls.inc(stage=sample.stage, outcome="ok" if sample.ok else "error")
+    stage_seconds.observe(sample.seconds, stage=sample.stage)
+    if sample.rows_in is not None:
+        stage_rows_in.inc(sample.rows_in, stage=sample.stage)
+    if sample.rows_out is not None:
+        stage_rows_out.inc(sample.rows_out, stage=sample.stage)
+    rows = sample.rows_in if sample.rows_in is not None else sample.rows_out
+    if rows is not None and sample.seconds > 0:
+        stage_rows_per_second.set(rows / sample.seconds, stage=sample.stage)
+    stage_rss_growth.set(sample.rss_growth, stage=sample.stage)
+
+
+def merge_samples(samples: List[StageSample], seconds: float) -> List[StageSample]:
+    """
+    One sample per stage from the samples of a call that ran in chunks (see
+    StageProcessPool.map_frame), so it counts as one call: rows are summed, `seconds` is the
+    wall time of the whole call, the RSS growth is the largest of any chunk, and the call
+    is ok if every chunk was.
+    """
+    merged = {}
+    for sample in samples:
+        previous = merged.get(sample.stage)
+        if previous is None:
+            merged[sample.stage] = sample._replace(seconds=seconds)
+            continue
+        merged[sample.stage] = previous._replace(
+            rows_in=_add(previous.rows_in, sample.rows_in),
+            rows_out=_add(previous.rows_out, sample.rows_out),
+            rss_growth=max(previous.rss_growth, sample.rss_growth),
+            ok=previous.ok and sample.ok,
+        )
+    return list(merged.values())
+
+
+def _add(a, b):
+    return b if a is None else a if b is None else a + b
+
+
+@contextmanager
+def capture():
+    """
+    Collect the stage samples recorded in this thread instead of recording them; used in
+    worker processes, whose samples are sent back to the parent with the task's result.
+    """
+    previous = getattr(_capture, "samples", None)
+    _capture.samples = []
+    try:
+        yield _capture.samples
+    finally:
+        _capture.samples = previous
+
+
+def instrument_stage(stage: str):
+    """
+    Decorator recording a pipeline service's calls under `stage`, and tracing each call as
+    a span when it runs inside a trace. Rows in and out are the lengths of the first
+    DataFrame argument and of a DataFrame result.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            rows_in = next((_rows(arg) for arg in args if isinstance(arg, pd.DataFrame)), None)
+            start, peak_before = time.perf_counter(), peak_rss_bytes()
+            ok, result = False, None
+            with tracing.span(stage) as attributes:
+                try:
+                    result = fn(*args, **kwargs)
+                    ok = True
+                    return result
+                finally:
+                    attributes.update(rows_in=rows_in, rows_out=_rows(result))
+                    record_stage(StageSample(stage, time.perf_counter() - start, rows_in,
+                                             _rows(result), peak_rss_bytes() - peak_before, ok))
+        return wrapper
+    return decorator
+
+
+def record_brand_status(brand_status: Dict[str, dict]) -> None:
+    """
+    Per-brand fit times from forecast_trends' brand_status, to tell which brands are slow.
+    """
+    for brand, status in brand_status.items():
+        if "fit_seconds" in status:
+            brand_fit_seconds.set(status["fit_seconds"], brand=brand, engine=status.get("engine", ""))
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,103 @@
+"""
+Request middleware for the API.
+"""
+import time
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+from . import metrics, tracing
+from .permissions import HasAdminToken
+from .profiling import profile_session, requested_mode
+
+
+def _view_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return (match.url_name or match.view_name) if match is not None else "unmatched"
+
+
+def _observe(request, response, start: float) -> None:
+    metrics.request_seconds.observe(time.perf_counter() - start, view=_view_name(request), method=request.method,
+                                    status=response.status_code)
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    """
+    Record each request's latency by view name, method and status. For streaming responses
+    this is the time until the stream starts.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            start = time.perf_counter()
+            response = await get_response(request)
+            _observe(request, response, start)
+            return response
+    else:
+        def middleware(request):
+            start = time.perf_counter()
+            response = get_response(request)
+            _observe(request, response, start)
+            return response
+    return middleware
+
+
+@sync_and_async_middleware
+def profile_request_middleware(get_response):
+    """
+    Profile requests carrying ?profile=1 (or ?profile=cprofile|sampling|both) and list the
+    profile files in the X-Profile response header. Needs the admin token unless DEBUG is
+    on. Only synchronous views are profiled: async views run their work on other threads.
+    """
+    if iscoroutinefunction(get_response):
+        return get_response
+
+    def middleware(request):
+        mode = requested_mode(request.GET.get("profile"))
+        if mode is None or not HasAdminToken().has_permission(request, None):
+            return get_response(request)
+        with profile_session(f"{request.method}-{request.path.strip('/').replace('/', '.')}", mode) as files:
+            response = get_response(request)
+        response["X-Profile"] = ", ".join(files)
+        return response
+    return middleware
+
+
+def _trace_parent(request):
+    parent = tracing.parse_traceparent(request.headers.get("traceparent"))
+    if parent is None and settings.TRACE_ALL_REQUESTS:
+        parent = tracing.new_trace()
+    return parent
+
+
+def _end_request_span(request, response, attributes: dict) -> None:
+    attributes.update(view=_view_name(request), status_code=response.status_code)
+    response["X-Trace-Id"] = tracing.current().trace_id
+
+
+@sync_and_async_middleware
+def tracing_middleware(get_response):
+    """
+    Continue the trace of requests carrying a W3C traceparent header (or start one for every
+    request with settings.TRACE_ALL_REQUESTS) in a span for the request, and return the trace
+    id in the X-Trace-Id response header. Service calls made by the view, and background jobs
+    it submits, become descendants of this span.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            parent = _trace_parent(request)
+            if parent is None:
+                return await get_response(request)
+            with tracing.span(f"{request.method} {request.path}", parent=parent) as attributes:
+                response = await get_response(request)
+                _end_request_span(request, response, attributes)
+            return response
+    else:
+        def middleware(request):
+            parent = _trace_parent(request)
+            if parent is None:
+                return get_response(request)
+            with tracing.span(f"{request.method} {request.path}", parent=parent) as attributes:
+                response = get_response(request)
+                _end_request_span(request, response, attributes)
+            return response
+    return middleware
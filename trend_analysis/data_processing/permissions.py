@@ -0,0 +1,17 @@
+import hmac
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class HasAdminToken(BasePermission):
+    """
+    Allow requests carrying settings.ADMIN_API_TOKEN in the X-Admin-Token header.
+    Without a configured token, admin endpoints are only open when DEBUG is on.
+    """
+    message = "Admin token required."
+
+    def has_permission(self, request, view):
+        token = getattr(settings, "ADMIN_API_TOKEN", None)
+        if not token:
+            return settings.DEBUG
+        return hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token)
@@ -0,0 +1,204 @@
+"""
+The pipeline stages behind the API: process tweets, score engagement, forecast trends.
+
+Both the per-stage endpoints in views.py and background pipeline jobs (jobs.py) run the
+stages through these functions, so they share one dataset, one result cache and the same
+concurrency limits.
+"""
+import os
+import atexit
+import threading
+from django.conf import settings
+from .services import process_tweets, count_brand_mentions, process_tweets_column, calculate_engagement_score, get_brand_trends, forecast_trends, update_search_index, get_or_train_engagement_model
+from .services.forecast import FORECAST_ENGINES
+from .services.forecast_store import save_forecast
+from .services.engagement_model import load_engagement_model
+from .result_cache import ResultCache, make_key
+from .raw_dataset import RawDataset
+from .concurrency import SingleFlight, StageLimiter, KeyedLocks
+from .process_pool import StageProcessPool
+from .metrics import record_brand_status
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+COUNT_PATH = os.path.join(PROJECT_DIR, "data_lake/count", "count.parquet")
+ENGAGEMENT_SCORE_PATH = os.path.join(PROJECT_DIR, "data_lake/engagement_score", "engagement_score.parquet")
+FORECAST_PATH = os.path.join(PROJECT_DIR, "data_lake/processed", "mini_final_with_trends.parquet")
+
+# Raw tweets, read on first use and swapped for the new version when the file changes
+raw_dataset = RawDataset(settings.RAW_DATA_PATH, check_interval=settings.RAW_DATA_CHECK_INTERVAL)
+
+# Caps on concurrent runs of each heavy pipeline stage
+stage_limiter = StageLimiter(settings.PIPELINE_STAGE_CONCURRENCY, settings.PIPELINE_STAGE_WAIT)
+# Results of each pipeline stage, keyed by dataset version, brand selection, stage and config.
+# Concurrent requests for the same missing result share one computation.
+result_cache = ResultCache(settings.RESULT_CACHE_MAX_ENTRIES, settings.RESULT_CACHE_MAX_BYTES, limiter=stage_limiter)
+forecast_flight = SingleFlight()
+# Results computed from an older dataset can never be requested again
+raw_dataset.on_swap(lambda old_version, new_version: result_cache.invalidate(dataset_version=old_version))
+# One writer at a time per data lake output file
+output_locks = KeyedLocks()
+# Worker processes for tweet cleaning and brand extraction, off the request threads
+process_pool = StageProcessPool(settings.PIPELINE_PROCESS_WORKERS, settings.PIPELINE_PROCESS_START_METHOD)
+atexit.register(process_pool.shutdown)
+
+# Brand selection of the last processing run, used by the later stages when a request names none
+active_selection = {"brands": None, "fuzzy": False}
+_selection_lock = threading.Lock()
+
+
+class PipelineError(Exception):
+    """A stage cannot run with the given input; `status` is the matching HTTP status."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def current_selection():
+    with _selection_lock:
+        return active_selection["brands"], active_selection["fuzzy"]
+
+
+def _scaled_progress(progress, start: float, end: float, unit: str):
+    """
+    Adapt a stage's progress(fraction, message) callback to a service's progress(done, total),
+    mapping the service's work onto the [start, end] part of the stage.
+    """
+    if progress is None:
+        return None
+
+    def report(done, total):
+        progress(start + (end - start) * done / max(total, 1), f"{done:,}/{total:,} {unit}")
+    return report
+
+
+def _processed_key(dataset_version, brands, fuzzy):
+    return make_key(dataset_version, "processed", brands, {"fuzzy": fuzzy})
+
+
+def _scores_key(dataset_version, brands, fuzzy, model_version):
+    return make_key(dataset_version, "engagement_scores", brands, {"fuzzy": fuzzy, "model": model_version})
+
+
+def _processed_tweets(dataset, brands: list, fuzzy: bool, progress=None):
+    """
+    Processed tweets of `brands` from the result cache, computed on a miss (e.g. after the
+    entry was evicted, or the dataset changed since /process_data ran).
+    """
+    def clean():
+        cleaned = process_pool.map_frame(process_tweets_column, dataset.data, "tweets",
+                                         chunk_rows=settings.PIPELINE_CHUNK_ROWS,
+                                         progress=_scaled_progress(progress, 0.0, 0.5, "tweets cleaned"))
+        # The whole cleaned corpus is searchable, whichever brands get processed
+        update_search_index(cleaned, "tweets", dataset_version=dataset.version)
+        return cleaned
+
+    def process():
+        # Cleaning does not depend on the brands, so every brand selection reuses it.
+        # Both run in row chunks on the process pool, which never modifies the shared frames.
+        cleaned = result_cache.get_or_compute(make_key(dataset.version, "cleaned", config={"column": "tweets"}), clean)
+        return process_pool.map_frame(process_tweets, cleaned, brands, fuzzy=fuzzy,
+                                      chunk_rows=settings.PIPELINE_CHUNK_ROWS,
+                                      progress=_scaled_progress(progress, 0.5, 1.0, "tweets matched"))
+
+    return result_cache.get_or_compute(_processed_key(dataset.version, brands, fuzzy), process)
+
+
+def _engagement_scores(dataset, brands: list, fuzzy: bool, model: dict):
+    """
+    Engagement scores of `brands` under `model` from the result cache, computed on a miss.
+    """
+    return result_cache.get_or_compute(
+        _scores_key(dataset.version, brands, fuzzy, model.get("version")),
+        lambda: calculate_engagement_score(_processed_tweets(dataset, brands, fuzzy), model=model),
+    )
+
+
+def run_process_stage(brands: list, fuzzy: bool = False, progress=None):
+    """
+    Clean the raw tweets and extract brand mentions and sentiment for `brands`, then write
+    the monthly mention counts. Makes `brands` the active selection.
+
+    progress(fraction, message) is called as tweets are cleaned (first half) and matched.
+
+    Returns:
+        pd.DataFrame: Processed tweets (shared with the result cache; do not modify).
+    """
+    dataset = raw_dataset.get()
+    processed_data = _processed_tweets(dataset, brands, fuzzy, progress=progress)
+
+    with _selection_lock:
+        active_selection.update(brands=brands, fuzzy=fuzzy)
+
+    count = count_brand_mentions(processed_data[["date", "brand"]].copy())
+    with output_locks.hold(COUNT_PATH):
+        count.to_parquet(COUNT_PATH, index=False)
+    return processed_data
+
+
+def run_engagement_stage(brands: list, fuzzy: bool = False, retrain: bool = False):
+    """
+    Score the processed tweets of `brands` with the current engagement model (training one
+    if needed) and write them to the data lake. Processed tweets that are no longer cached
+    are computed again.
+
+    Raises:
+        PipelineError: If no brands are given and none were processed yet.
+    """
+    if not brands:
+        raise PipelineError("Data not processed yet. Call /process_data first.")
+    dataset = raw_dataset.get()
+
+    model, _ = get_or_train_engagement_model(_processed_tweets(dataset, brands, fuzzy), retrain=retrain)
+    scores = _engagement_scores(dataset, brands, fuzzy, model)
+
+    # Written on every call: the dashboard reads this file, and it must match the current brands
+    with output_locks.hold(ENGAGEMENT_SCORE_PATH):
+        scores.to_parquet(ENGAGEMENT_SCORE_PATH, index=False)
+    return scores
+
+
+def run_forecast_stage(brands: list, fuzzy: bool = False, engine: str = None, progress=None) -> dict:
+    """
+    Forecast the engagement trends of `brands` and write the forecast to the data lake.
+    progress(fraction, message) is called as brands are forecast. Processed tweets and
+    scores that are no longer cached are computed again.
+
+    Returns:
+        dict: Per-brand forecast status (see forecast_trends).
+
+    Raises:
+        PipelineError: If no brands are given and none were processed yet, no engagement
+            model was trained yet, or engine is unknown.
+    """
+    if engine is not None and engine not in FORECAST_ENGINES:
+        raise PipelineError(f"Unknown forecast engine '{engine}'.")
+    if not brands:
+        raise PipelineError("Data not processed yet. Call /process_data first.")
+
+    dataset = raw_dataset.get()
+    dataset_version = dataset.version
+    # Scores are only valid for the current engagement model
+    model = load_engagement_model()
+    if model is None:
+        raise PipelineError("Engagement scores not calculated. Call /engagement_scores first.")
+    model_version = model.get("version")
+    scores = _engagement_scores(dataset, brands, fuzzy, model)
+
+    trends_key = make_key(dataset_version, "brand_trends", brands, {"fuzzy": fuzzy, "model": model_version})
+
+    def run_forecast():
+        brand_trends = result_cache.get_or_compute(trends_key, lambda: get_brand_trends(scores, brands))
+        with stage_limiter.slot("forecast"):
+            forecasted_data = forecast_trends(brand_trends, 30, engine=engine, brands=brands,
+                                              progress=_scaled_progress(progress, 0.0, 1.0, "brands forecast"))
+        if not forecasted_data.empty:
+            with output_locks.hold(FORECAST_PATH):
+                save_forecast(forecasted_data, FORECAST_PATH)
+        brand_status = forecasted_data.attrs.get("brand_status", {})
+        record_brand_status(brand_status)
+        return brand_status
+
+    # Identical forecast requests arriving together share one run
+    forecast_key = make_key(dataset_version, "forecast", brands, {"fuzzy": fuzzy, "model": model_version, "engine": engine})
+    return forecast_flight.do(forecast_key, run_forecast)
@@ -0,0 +1,122 @@
+"""
+Bounded pool of worker processes for the CPU-bound parts of the pipeline stages.
+
+Tweet cleaning and spaCy brand extraction hold the GIL for their whole run, so running
+them on a request thread stalls every other request served by the same process. Here
+they run in separate processes instead and the calling thread only waits.
+Inputs and results are pickled across the process boundary.
+"""
+import time
+import logging
+import threading
+import multiprocessing
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from . import metrics, profiling, tracing
+
+logger = logging.getLogger(__name__)
+
+
+def warm_stage_worker():
+    """
+    Pool initializer: load the spaCy model once per worker instead of on its first task.
+
+    Must never raise, or the pool breaks; a real problem resurfaces when a task runs.
+    """
+    try:
+        from .services import tweet_processor  # noqa: F401 (loads the spaCy model)
+    except Exception as e:
+        logger.warning(f"Stage worker warm-up failed: {e}")
+
+
+def run_captured(fn, trace_parent, *args, **kwargs):
+    """
+    Task wrapper run in the workers: returns fn's result with the metrics samples and trace
+    spans its instrumented calls recorded, for the parent to merge into its own.
+    """
+    with metrics.capture() as samples, tracing.capture(trace_parent) as spans:
+        result = fn(*args, **kwargs)
+    return result, samples, spans
+
+
+class StageProcessPool:
+    """
+    Process pool created on first use. With `workers` = 0 tasks run inline in the caller.
+
+    Args:
+        workers (int): Number of worker processes, i.e. CPU-bound tasks running at once.
+        start_method (str): multiprocessing start method; None for the platform default.
+    """
+
+    def __init__(self, workers: int, start_method: str = None):
+        self.workers = workers
+        self.start_method = start_method
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                     initializer=warm_stage_worker)
+            return self._executor
+
+    def map_frame(self, fn, df: pd.DataFrame, *args, chunk_rows: int = 20_000, progress=None, **kwargs) -> pd.DataFrame:
+        """
+        Run fn(chunk, *args, **kwargs) over row chunks of `df` in parallel and concatenate the
+        results in order. Only for functions that treat rows independently.
+
+        progress(rows_done, total_rows) is called in the caller's thread as chunks finish; if
+        it raises (e.g. the job was cancelled), chunks not yet started are dropped. Inline
+        (workers = 0, or while this thread is being profiled, so the profile sees the work),
+        fn gets the whole frame and the `progress` callback itself.
+        `df` is never modified: workers get pickled chunks and inline runs a copy.
+        """
+        if self.workers <= 0 or profiling.is_active():
+            return fn(df.copy(), *args, progress=progress, **kwargs)
+
+        total = len(df)
+        start_time = time.perf_counter()
+        starts = range(0, total, chunk_rows) or [0]
+        executor = self._get_executor()
+        trace_parent = tracing.current()
+        futures = [executor.submit(run_captured, fn, trace_parent, df.iloc[start:start + chunk_rows], *args, **kwargs)
+                   for start in starts]
+        rows = {future: min(chunk_rows, total - start) for future, start in zip(futures, starts)}
+        rows_done = 0
+        samples = []
+        try:
+            for future in as_completed(futures):
+                _, chunk_samples, spans = future.result()
+                samples.extend(chunk_samples)
+                tracing.export_all(spans)
+                rows_done += rows[future]
+                if progress is not None:
+                    progress(rows_done, total)
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            # The chunks are one call of each stage they ran
+            for sample in metrics.merge_samples(samples, time.perf_counter() - start_time):
+                metrics.record_stage(sample)
+        return pd.concat([future.result()[0] for future in futures], ignore_index=True)
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        logger.warning("Stage worker process died; restarting the pool")
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
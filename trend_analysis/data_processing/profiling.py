@@ -0,0 +1,167 @@
+"""
+Opt-in profiling of pipeline stages and API requests.
+
+A profile session records the calling thread with cProfile (written as a .pstats file)
+and/or a sampling profiler (written as collapsed stacks, the input of flamegraph.pl and
+speedscope), into timestamped files under settings.PROFILE_DIR.
+
+Sessions are started by:
+  - settings.PROFILE_STAGES (env PROFILE_STAGES=true): every call of a service decorated
+    with @profile_stage is profiled on its own;
+  - ?profile=1 on an API request (see profile_request_middleware), or on a pipeline job
+    submission, which profiles the job's stages;
+  - the --profile flag of the process_tweet command.
+
+When profiling is off, @profile_stage returns the service unchanged and nothing else runs.
+"""
+import os
+import sys
+import time
+import pstats
+import logging
+import cProfile
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sampling", "both")
+
+_active = threading.local()
+
+
+def is_active() -> bool:
+    """
+    Whether a profile session is running in this thread.
+    """
+    return getattr(_active, "session", False)
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a background thread
+    and counts identical stacks (collapsed stack format: "frame;frame;frame count").
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _profile_path(name: str, extension: str) -> str:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    return os.path.join(settings.PROFILE_DIR, f"{timestamp}-{safe_name}.{extension}")
+
+
+@contextmanager
+def profile_session(name: str, mode: Optional[str] = None):
+    """
+    Profile the calling thread for the duration of the block. Yields the list of files the
+    profile is written to (filled in when the block exits). A session started while another
+    one is running in the same thread does nothing: the outer session already covers it.
+
+    Args:
+        name (str): Used in the file names, e.g. the stage or view name.
+        mode (str): 'cprofile', 'sampling' or 'both'. Defaults to settings.PROFILE_MODE.
+    """
+    files: List[str] = []
+    if is_active():
+        yield files
+        return
+
+    mode = mode or settings.PROFILE_MODE
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}', expected one of {PROFILE_MODES}")
+
+    profiler = cProfile.Profile() if mode in ("cprofile", "both") else None
+    sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL) if mode in ("sampling", "both") else None
+    _active.session = True
+    start = time.perf_counter()
+    if sampler is not None:
+        sampler.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield files
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if sampler is not None:
+            sampler.stop()
+        _active.session = False
+        seconds = time.perf_counter() - start
+
+        try:
+            if profiler is not None:
+                path = _profile_path(name, "pstats")
+                pstats.Stats(profiler).dump_stats(path)
+                files.append(path)
+            if sampler is not None:
+                path = _profile_path(name, "collapsed")
+                sampler.write(path)
+                files.append(path)
+            logger.info(f"Profiled {name} ({seconds:.2f}s): {', '.join(files)}")
+        except OSError as e:
+            logger.warning(f"Could not write the profile of {name}: {e}")
+
+
+def profile_stage(stage: str):
+    """
+    Decorator profiling every call of a service when settings.PROFILE_STAGES is on.
+    Decided at import time: with profiling off the service itself is returned.
+    """
+    def decorator(fn):
+        if not getattr(settings, "PROFILE_STAGES", False):
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with profile_session(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def requested_mode(value: Optional[str]) -> Optional[str]:
+    """
+    Profile mode asked for by a ?profile= query value: '1'/'true' for the default mode or
+    a mode name; None when profiling was not asked for.
+    """
+    if not value or value.lower() in ("0", "false"):
+        return None
+    if value.lower() in ("1", "true"):
+        return settings.PROFILE_MODE
+    return value if value in PROFILE_MODES else None
@@ -0,0 +1,104 @@
+"""
+The raw tweet dataset the API works on, loaded on first use instead of at import time.
+
+The dataset is versioned by its file's modification time and size. When the file changes
+(checked at most every `check_interval` seconds) the request that notices it loads the new
+data while other requests keep using the previous snapshot, and the new one is then swapped
+in atomically. A request works on one snapshot from start to finish.
+"""
+import time
+import logging
+import threading
+import pandas as pd
+from collections import namedtuple
+from typing import Callable, List, Optional
+from .result_cache import file_version
+from .services.data_lake_loader import load_raw_data
+
+logger = logging.getLogger(__name__)
+
+DatasetSnapshot = namedtuple("DatasetSnapshot", ["data", "version", "path", "loaded_at"])
+
+
+class RawDataset:
+    """
+    Lazily loaded, hot-reloadable dataset.
+
+    Args:
+        path (str): Parquet file with the raw tweets.
+        check_interval (float): Minimum seconds between checks of the file's version.
+        loader (callable): Reads the file into a DataFrame.
+    """
+
+    def __init__(self, path: str, check_interval: float = 5.0,
+                 loader: Callable[[str], pd.DataFrame] = load_raw_data):
+        self.path = path
+        self.check_interval = check_interval
+        self.loader = loader
+        self._snapshot: Optional[DatasetSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Optional[str], str], None]] = []
+
+    def on_swap(self, listener: Callable[[Optional[str], str], None]) -> None:
+        """
+        Call listener(old_version, new_version) after a new version has been swapped in.
+        """
+        self._listeners.append(listener)
+
+    @property
+    def snapshot(self) -> Optional[DatasetSnapshot]:
+        """
+        The snapshot currently in use, without loading or checking anything; None before first use.
+        """
+        return self._snapshot
+
+    def get(self) -> DatasetSnapshot:
+        """
+        Current snapshot, loading the file on first use or when it has changed.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+        return self._refresh(force=False)
+
+    def reload(self) -> DatasetSnapshot:
+        """
+        Re-read the file now, even if its version looks unchanged.
+        """
+        return self._refresh(force=True)
+
+    def _refresh(self, force: bool) -> DatasetSnapshot:
+        # Only the first load and reload() wait for a load in progress; other requests keep
+        # using the current snapshot until the new one is swapped in
+        if not self._lock.acquire(blocking=force or self._snapshot is None):
+            return self._snapshot
+        try:
+            snapshot = self._snapshot
+            self._checked_at = time.monotonic()
+            version = file_version(self.path)
+            # Another request may have swapped in this version while we waited for the lock
+            if snapshot is not None and not force and version == snapshot.version:
+                return snapshot
+
+            start = time.perf_counter()
+            data = self.loader(self.path)
+            # If the file was replaced again while it was read, keeping the version seen
+            # before the read makes the next check pick up the newer file
+            if file_version(self.path) != version:
+                logger.info(f"{self.path} changed while loading; it will be reloaded on the next check")
+            new_snapshot = DatasetSnapshot(data, version, self.path, time.time())
+            self._snapshot = new_snapshot
+        finally:
+            self._lock.release()
+
+        logger.info(f"Loaded raw dataset {self.path} version {version} ({len(data)} rows) "
+                    f"in {time.perf_counter() - start:.2f}s")
+        old_version = snapshot.version if snapshot is not None else None
+        if old_version != version:
+            for listener in self._listeners:
+                try:
+                    listener(old_version, version)
+                except Exception as e:
+                    logger.warning(f"Dataset swap listener failed: {e}")
+        return new_snapshot
@@ -0,0 +1,154 @@
+"""
+Bounded in-memory cache for pipeline stage results shared by the API views.
+
+Entries are keyed by (dataset version, brand selection, stage, config), so a different
+brand list, a new dataset or a new engagement model can never be served an older result,
+and the least recently used entries are evicted once the entry or byte budget is exceeded.
+Concurrent misses on the same key are coalesced into one computation.
+"""
+import os
+import sys
+import json
+import hashlib
+import logging
+import threading
+import pandas as pd
+from collections import OrderedDict, namedtuple
+from contextlib import nullcontext
+from typing import Callable, Iterable, Optional
+from .concurrency import SingleFlight, StageLimiter
+
+logger = logging.getLogger(__name__)
+
+CacheKey = namedtuple("CacheKey", ["dataset_version", "brands", "stage", "config"])
+
+
+def file_version(path: str) -> str:
+    """
+    Version string of a data file that changes whenever the file is rewritten.
+    """
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def make_key(dataset_version: str, stage: str, brands: Optional[Iterable[str]] = None,
+             config: Optional[dict] = None) -> CacheKey:
+    """
+    Build a cache key. Brands keep their order (the first listed brand wins when a tweet
+    mentions several) but duplicates are dropped; config is reduced to a stable hash.
+    """
+    brands = tuple(dict.fromkeys(brands)) if brands is not None else None
+    config_digest = hashlib.sha1(json.dumps(config or {}, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return CacheKey(dataset_version, brands, stage, config_digest)
+
+
+def estimate_size(value) -> int:
+    """
+    Approximate memory footprint of a cached value in bytes.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if hasattr(value, "nbytes"):
+        # numpy and pyarrow arrays and tables
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache bounded by entry count and by estimated bytes.
+
+    Values are shared between requests and must be treated as read-only; copy a
+    cached DataFrame before passing it to code that modifies its input.
+    """
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 1 << 30, limiter: Optional[StageLimiter] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.limiter = limiter
+        self._flight = SingleFlight()
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CacheKey, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: CacheKey, value) -> None:
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                logger.info(f"Not caching {key.stage}: {size} bytes exceeds the cache budget")
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                evicted_key, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                logger.info(f"Evicted {evicted_key.stage} for brands {evicted_key.brands} from the result cache")
+
+    def get_or_compute(self, key: CacheKey, compute: Callable[[], object]):
+        """
+        Return the cached value for key, computing and storing it on a miss.
+
+        Concurrent callers missing the same key share a single computation, which runs
+        inside a slot of the key's stage when the cache has a StageLimiter.
+
+        Raises:
+            StageBusy: If the stage has no free slot within the limiter's wait limit.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        def compute_once():
+            # The previous flight for this key may have stored it just now
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            with self.limiter.slot(key.stage) if self.limiter is not None else nullcontext():
+                value = compute()
+            self.put(key, value)
+            return value
+
+        return self._flight.do(key, compute_once)
+
+    def invalidate(self, stage: Optional[str] = None, dataset_version: Optional[str] = None) -> int:
+        """
+        Drop entries of a stage and/or dataset version (everything when both are None).
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            doomed = [
+                key for key in self._entries
+                if (stage is None or key.stage == stage)
+                and (dataset_version is None or key.dataset_version == dataset_version)
+            ]
+            for key in doomed:
+                self._bytes -= self._entries.pop(key)[1]
+            return len(doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -2,8 +2,12 @@ from .data_lake_loader import load_raw_data
 from .tweet_processor import process_tweets, count_brand_mentions
 from .tweets_cleaner import process_tweets_column
 from .engagement_score import calculate_engagement_score, get_brand_trends
+from .engagement_model import get_or_train_engagement_model, load_engagement_model, save_engagement_model
+from .online_scaling import score_engagement_batch
 from .forecast import forecast_trends
+from .fast_forecast import ridge_forecast
 from .search_engine import search_multiple_brands
+from .search_index import update_search_index, search_tweets
 
 __all__ = ['load_raw_data',
 		   'process_tweets',
@@ -11,6 +15,13 @@ __all__ = ['load_raw_data',
 		   'process_tweets_column',
 		   'calculate_engagement_score',
 		   'get_brand_trends',
+		   'get_or_train_engagement_model',
+		   'load_engagement_model',
+		   'save_engagement_model',
+		   'score_engagement_batch',
 		   'forecast_trends',
-		   'search_multiple_brands'
+		   'ridge_forecast',
+		   'search_multiple_brands',
+		   'update_search_index',
+		   'search_tweets'
 		   ]
\ No newline at end of file
@@ -0,0 +1,145 @@
+import logging
+import multiprocessing
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from typing import Dict, Optional, Sequence
+from ..forecast_worker import PROPHET_CONFIG
+from ..backtest_worker import run_backtest_fold
+from .fast_forecast import RIDGE_ALPHA
+
+logger = logging.getLogger(__name__)
+
+# engine -> {config name -> config}; a config is passed to the engine as keyword arguments
+DEFAULT_BACKTEST_CONFIGS = {
+    "prophet": {"default": PROPHET_CONFIG},
+    "ridge": {f"alpha={RIDGE_ALPHA:g}": {"alpha": RIDGE_ALPHA}, "alpha=10": {"alpha": 10.0}},
+}
+
+
+def rolling_origins(dates: pd.Series, horizon: int, folds: int = 3, step: int = 7,
+                    min_train_days: int = 14) -> list:
+    """
+    Cutoff dates for rolling-origin evaluation.
+
+    The last cutoff leaves `horizon` days of actuals after it; each earlier one moves back
+    by `step` days, as long as at least `min_train_days` of history remain before it.
+    """
+    first, last = dates.min(), dates.max()
+    cutoffs = []
+    for fold in range(folds):
+        cutoff = last - pd.Timedelta(days=horizon + fold * step)
+        if (cutoff - first).days < min_train_days:
+            break
+        cutoffs.append(cutoff)
+    return sorted(cutoffs)
+
+
+def summarize_backtest(points: pd.DataFrame, timings: pd.DataFrame, horizons: Sequence[int]) -> pd.DataFrame:
+    """
+    Accuracy and cost per engine, config and horizon.
+
+    For horizon h the errors cover every forecast 1..h days after a cutoff. MAPE skips
+    days whose actual value is 0; sMAPE counts a day where forecast and actual are both 0
+    as a perfect forecast. Coverage is the share of actuals inside [yhat_lower, yhat_upper].
+    Costs are totals over all folds, so engines can be compared on accuracy per CPU-second.
+    """
+    rows = []
+    for (engine, config), timing in timings.groupby(["engine", "config"], sort=False):
+        engine_points = points[(points["engine"] == engine) & (points["config"] == config)]
+        fit_cpu = timing["fit_cpu_seconds"].sum()
+        predict_cpu = timing["predict_cpu_seconds"].sum()
+        n_errors = int(timing["errors"].map(len).sum())
+
+        for horizon in horizons:
+            window = engine_points[engine_points["h"] <= horizon]
+            y, yhat = window["y"].to_numpy(dtype=float), window["yhat"].to_numpy(dtype=float)
+            error = np.abs(y - yhat)
+            nonzero = y != 0
+            denominator = np.abs(y) + np.abs(yhat)
+            smape = np.divide(2 * error, denominator, out=np.zeros_like(error), where=denominator > 0)
+
+            rows.append({
+                "engine": engine,
+                "config": config,
+                "horizon": horizon,
+                "points": len(window),
+                "mape": 100 * np.mean(error[nonzero] / np.abs(y[nonzero])) if nonzero.any() else np.nan,
+                "smape": 100 * smape.mean() if len(window) else np.nan,
+                "coverage": ((y >= window["yhat_lower"]) & (y <= window["yhat_upper"])).mean() if len(window) else np.nan,
+                "fit_seconds": timing["fit_seconds"].sum(),
+                "predict_seconds": timing["predict_seconds"].sum(),
+                "cpu_seconds": fit_cpu + predict_cpu,
+                "errors": n_errors,
+            })
+    return pd.DataFrame(rows)
+
+
+def backtest_forecast_engines(brand_trends: pd.DataFrame, horizons: Sequence[int] = (7, 14, 30),
+                              configs: Optional[Dict[str, dict]] = None, folds: int = 3, step: int = 7,
+                              min_train_days: int = 14, workers: Optional[int] = None,
+                              timeout: Optional[float] = None):
+    """
+    Rolling-origin backtest of forecast engines over the output of get_brand_trends.
+
+    Every (engine, config, cutoff) is a task in a process pool; Prophet tasks are further
+    split per brand, while the ridge engine fits all brands of a cutoff in one task, just
+    as forecast_trends runs them.
+
+    Args:
+        brand_trends (pd.DataFrame): Long 'ds'/'y'/'brand' frame from get_brand_trends.
+        horizons (list): Forecast horizons in days to report; folds forecast the longest one.
+        configs (dict): engine -> {config name -> config}. Defaults to DEFAULT_BACKTEST_CONFIGS.
+        folds (int): Number of rolling origins.
+        step (int): Days between consecutive origins.
+        min_train_days (int): Minimum history before the earliest origin.
+        workers (int): Worker processes. Defaults to settings.FORECAST_WORKERS; 1 runs in-process.
+        timeout (float): Seconds allowed per task. Defaults to settings.FORECAST_BRAND_TIMEOUT.
+
+    Returns:
+        tuple: (summary DataFrame per engine/config/horizon, per-point errors DataFrame)
+    """
+    if configs is None:
+        configs = DEFAULT_BACKTEST_CONFIGS
+    if workers is None:
+        workers = getattr(settings, "FORECAST_WORKERS", 1)
+    if timeout is None:
+        timeout = getattr(settings, "FORECAST_BRAND_TIMEOUT", 300)
+
+    data = brand_trends.dropna(subset=["y"]).assign(
+        ds=lambda d: pd.to_datetime(d["ds"]).dt.tz_localize(None).dt.floor("D"),
+        brand=lambda d: d["brand"].astype(str),
+    )
+    horizon = max(horizons)
+    cutoffs = rolling_origins(data["ds"], horizon, folds, step, min_train_days)
+    if not cutoffs:
+        raise ValueError(f"Not enough history for a {horizon}-day backtest after {min_train_days} training days.")
+
+    brand_frames = {brand: group for brand, group in data.groupby("brand", sort=False)}
+    tasks = []
+    for engine, engine_configs in configs.items():
+        for config_name, config in engine_configs.items():
+            for cutoff in cutoffs:
+                frames = brand_frames.values() if engine == "prophet" else [data]
+                tasks.extend((engine, config_name, config, frame, cutoff, horizon, timeout) for frame in frames)
+    logger.info(f"Backtesting {len(tasks)} tasks over {len(cutoffs)} origins with {workers} workers")
+
+    if workers <= 1:
+        results = [run_backtest_fold(*task) for task in tasks]
+    else:
+        context = multiprocessing.get_context(getattr(settings, "FORECAST_START_METHOD", None))
+        with context.Pool(processes=workers) as pool:
+            results = pool.starmap(run_backtest_fold, tasks, chunksize=1)
+
+    fold_points = [
+        points.assign(engine=task[0], config=task[1]) for task, (points, _) in zip(tasks, results) if not points.empty
+    ]
+    points = pd.concat(fold_points, ignore_index=True) if fold_points else pd.DataFrame(
+        columns=["brand", "cutoff", "h", "y", "yhat", "yhat_lower", "yhat_upper", "engine", "config"]
+    )
+    timings = pd.DataFrame([timing for _, timing in results])
+    for timing in timings.itertuples():
+        for brand, error in timing.errors.items():
+            logger.warning(f"Backtest {timing.engine}/{timing.config} failed for brand {brand} at {timing.cutoff:%Y-%m-%d}: {error}")
+
+    return summarize_backtest(points, timings, sorted(horizons)), points
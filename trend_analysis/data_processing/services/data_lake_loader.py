@@ -4,9 +4,13 @@ import pandas as pd
 from datetime import datetime
 from django.conf import settings
 from typing import Optional
+from ..metrics import instrument_stage
+from ..profiling import profile_stage
 
 logger = logging.getLogger(__name__)
 
+@instrument_stage("load_raw_data")
+@profile_stage("load_raw_data")
 def load_raw_data(file_path: str, file_format: str = "parquet", **kwargs) -> pd.DataFrame:
     """
     Load raw data from a file in the data lake.
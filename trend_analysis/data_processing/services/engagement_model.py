@@ -0,0 +1,340 @@
+import os
+import re
+import json
+import logging
+import threading
+import numpy as np
+import pandas as pd
+import sklearn
+from datetime import datetime, timezone
+from django.conf import settings
+from sklearn.preprocessing import RobustScaler, StandardScaler
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ENGAGEMENT_FEATURES = ['likeCount', 'replyCount', 'retweetCount', 'viewCount']
+SCORE_FEATURES = ENGAGEMENT_FEATURES + ['sentiment_impact', 'followersCount']
+DRIFT_FEATURES = ENGAGEMENT_FEATURES + ['followersCount', 'sentiment']
+
+# Serialises the check-then-train in get_or_train_engagement_model, so concurrent
+# requests cannot both train and save a new version
+_model_lock = threading.Lock()
+
+DEFAULT_WEIGHTS = {
+    'likeCount': 0.3,
+    'replyCount': 0.2,
+    'retweetCount': 0.2,
+    'viewCount': 0.1,
+    'sentiment_impact': 0.1,
+    'followersCount': 0.1
+}
+
+# Rows used for permutation importance and the subsampled forest; importances over
+# six features stabilise long before the full dataset is seen.
+IMPORTANCE_SAMPLE_SIZE = 20_000
+FOREST_MAX_SAMPLES = 50_000
+
+_model_file_pattern = re.compile(r'^engagement_model_v(\d+)\.json$')
+
+
+def get_model_dir(model_dir: Optional[str] = None) -> str:
+    if model_dir is not None:
+        return model_dir
+    data_lake_base_path = getattr(settings, "DATA_LAKE_PATH", "data_lake")
+    return getattr(settings, "ENGAGEMENT_MODEL_DIR", os.path.join(data_lake_base_path, "models", "engagement"))
+
+
+def _feature_stats(df: pd.DataFrame) -> dict:
+    """
+    Summary of the training features used for drift detection. Counts are heavy
+    tailed, so they are compared on a log1p scale.
+    """
+    stats = {}
+    for feature in DRIFT_FEATURES:
+        if feature not in df.columns:
+            continue
+        values = pd.to_numeric(df[feature], errors='coerce').astype(float)
+        if feature != 'sentiment':
+            values = np.log1p(values.clip(lower=0))
+        stats[feature] = {'mean': float(values.mean()), 'std': float(values.std(ddof=0))}
+    return stats
+
+
+def _random_forest_weights(X: np.ndarray, y: np.ndarray, random_state: int) -> np.ndarray:
+    model = RandomForestRegressor(n_estimators=100, random_state=random_state, n_jobs=-1)
+    model.fit(X, y)
+    return model.feature_importances_
+
+
+def _subsampled_forest_weights(X: np.ndarray, y: np.ndarray, random_state: int) -> np.ndarray:
+    # Each tree sees at most FOREST_MAX_SAMPLES rows, so cost stops growing with the dataset.
+    max_samples = min(1.0, FOREST_MAX_SAMPLES / max(len(X), 1))
+    model = RandomForestRegressor(n_estimators=50, max_samples=max_samples, min_samples_leaf=5,
+                                  random_state=random_state, n_jobs=-1)
+    model.fit(X, y)
+    return model.feature_importances_
+
+
+def _hist_gradient_boosting_weights(X: np.ndarray, y: np.ndarray, random_state: int) -> np.ndarray:
+    model = HistGradientBoostingRegressor(max_iter=100, random_state=random_state)
+    model.fit(X, y)
+
+    rng = np.random.default_rng(random_state)
+    sample = rng.choice(len(X), size=min(len(X), IMPORTANCE_SAMPLE_SIZE), replace=False)
+    result = permutation_importance(model, X[sample], y[sample], n_repeats=5,
+                                    random_state=random_state, n_jobs=1)
+    return np.clip(result.importances_mean, 0, None)
+
+
+def _linear_weights(X: np.ndarray, y: np.ndarray, random_state: int) -> np.ndarray:
+    # Closed-form least squares; importance is |coef| times the feature's spread.
+    design = np.column_stack([np.ones(len(X)), X])
+    coef, *_ = np.linalg.lstsq(design, y, rcond=None)
+    return np.abs(coef[1:]) * X.std(axis=0)
+
+
+WEIGHT_BACKENDS = {
+    'random_forest': _random_forest_weights,
+    'random_forest_subsampled': _subsampled_forest_weights,
+    'hist_gradient_boosting': _hist_gradient_boosting_weights,
+    'linear': _linear_weights,
+}
+
+
+def learn_feature_weights(X: pd.DataFrame, y: pd.Series, backend: str = "random_forest",
+                          random_state: int = 42) -> dict:
+    """
+    Learn normalized weights for the score features with the chosen backend.
+
+    Args:
+        X (pd.DataFrame): Scaled score features, in SCORE_FEATURES order.
+        y (pd.Series): Target values.
+        backend (str): One of WEIGHT_BACKENDS.
+        random_state (int): Seed for the stochastic backends.
+
+    Returns:
+        dict: Feature name to weight, summing to 1.
+    """
+    if backend not in WEIGHT_BACKENDS:
+        raise ValueError(f"Unknown weight backend: {backend}. Choose from {sorted(WEIGHT_BACKENDS)}")
+
+    weights = WEIGHT_BACKENDS[backend](
+        np.asarray(X[SCORE_FEATURES], dtype=np.float64),
+        np.asarray(y, dtype=np.float64),
+        random_state
+    )
+    total = weights.sum()
+    if not np.isfinite(total) or total <= 0:
+        logger.warning(f"Weight backend '{backend}' produced no usable importances; using default weights")
+        return dict(DEFAULT_WEIGHTS)
+    return {feature: float(w) for feature, w in zip(SCORE_FEATURES, weights / total)}
+
+
+def fit_engagement_model(df: pd.DataFrame, target: str = "sentiment", weight_backend: Optional[str] = None) -> dict:
+    """
+    Fit the engagement scalers and feature weights and return them as a model artifact.
+
+    Args:
+        df (pd.DataFrame): Processed tweets with engagement metrics and 'sentiment'.
+        target (str): Column used to learn feature weights. If None or missing,
+                      the default weights are used.
+        weight_backend (str): How weights are learned, one of WEIGHT_BACKENDS.
+                              Defaults to settings.ENGAGEMENT_WEIGHT_BACKEND.
+
+    Returns:
+        dict: JSON-serializable model artifact with scaler statistics, weights and training metadata.
+    """
+    if weight_backend is None:
+        weight_backend = getattr(settings, "ENGAGEMENT_WEIGHT_BACKEND", "random_forest")
+
+    robust_scaler = RobustScaler()
+    standard_scaler = StandardScaler()
+
+    followers = robust_scaler.fit_transform(df[['followersCount']])
+    engagement = standard_scaler.fit_transform(df[ENGAGEMENT_FEATURES])
+
+    if target is not None and target in df.columns:
+        X = pd.DataFrame(engagement, columns=ENGAGEMENT_FEATURES, index=df.index)
+        X['sentiment_impact'] = np.tanh(df['sentiment'] * 2)
+        X['followersCount'] = followers[:, 0]
+
+        weight_dict = learn_feature_weights(X, df[target], backend=weight_backend)
+        weight_source = weight_backend
+    else:
+        weight_dict = dict(DEFAULT_WEIGHTS)
+        weight_source = 'default'
+
+    return {
+        'version': None,
+        'trained_at': datetime.now(timezone.utc).isoformat(),
+        'target': target,
+        'weight_source': weight_source,
+        'n_rows': int(len(df)),
+        'sklearn_version': sklearn.__version__,
+        'weights': weight_dict,
+        'followers_scaler': {
+            'center': float(robust_scaler.center_[0]),
+            'scale': float(robust_scaler.scale_[0]),
+            'params': robust_scaler.get_params(),
+        },
+        'engagement_scaler': {
+            feature: {
+                'mean': float(standard_scaler.mean_[i]),
+                'scale': float(standard_scaler.scale_[i])
+            }
+            for i, feature in enumerate(ENGAGEMENT_FEATURES)
+        },
+        'feature_stats': _feature_stats(df),
+    }
+
+
+def apply_engagement_model(df: pd.DataFrame, model: dict, dtype=np.float32) -> pd.DataFrame:
+    """
+    Score tweets with a fitted engagement model, without any refitting.
+
+    Only the six score features are pulled into one contiguous matrix, scaled in place
+    and multiplied by the weight vector in a single call. The input frame is not copied;
+    unchanged columns such as 'tweets' are attached to the result by reference.
+
+    Args:
+        df (pd.DataFrame): Processed tweets with engagement metrics, 'sentiment' and 'brand'.
+        model (dict): Fitted engagement model artifact.
+        dtype: Floating point type of the scaled features and the score.
+
+    Returns:
+        pd.DataFrame: Scaled engagement metrics with the 'engagement_score' column.
+    """
+    followers = model['followers_scaler']
+    engagement = model['engagement_scaler']
+    n_engagement = len(ENGAGEMENT_FEATURES)
+
+    X = np.empty((len(df), len(SCORE_FEATURES)), dtype=dtype)
+    for j, feature in enumerate(ENGAGEMENT_FEATURES):
+        X[:, j] = df[feature].to_numpy()
+    X[:, :n_engagement] -= np.array([engagement[f]['mean'] for f in ENGAGEMENT_FEATURES], dtype=dtype)
+    X[:, :n_engagement] /= np.array([engagement[f]['scale'] for f in ENGAGEMENT_FEATURES], dtype=dtype)
+
+    X[:, n_engagement] = df['sentiment'].to_numpy()
+    np.tanh(X[:, n_engagement] * 2, out=X[:, n_engagement])
+
+    X[:, n_engagement + 1] = df['followersCount'].to_numpy()
+    X[:, n_engagement + 1] -= followers['center']
+    X[:, n_engagement + 1] /= followers['scale']
+
+    weight_dict = model['weights']
+    weights = np.array([weight_dict[f] for f in SCORE_FEATURES], dtype=dtype)
+    scores = X @ weights
+
+    columns = {'date': df['date']}
+    for j, feature in enumerate(ENGAGEMENT_FEATURES):
+        columns[feature] = X[:, j]
+    columns['followersCount'] = X[:, n_engagement + 1]
+    columns['tweets'] = df['tweets']
+    columns['brand'] = df['brand']
+    columns['sentiment'] = df['sentiment']
+    columns['engagement_score'] = scores
+    result = pd.DataFrame(columns, index=df.index, copy=False)
+
+    result.attrs['weights_used'] = weight_dict
+    result.attrs['model_version'] = model.get('version')
+    result.attrs['scaling_stats'] = {
+        'followers': followers.get('params', {}),
+        'engagement_metrics': engagement
+    }
+
+    return result
+
+
+def feature_drift(model: dict, df: pd.DataFrame) -> dict:
+    """
+    Shift of each feature's mean since training, in units of the training standard deviation.
+    """
+    current = _feature_stats(df)
+    drift = {}
+    for feature, trained in model.get('feature_stats', {}).items():
+        if feature not in current:
+            continue
+        std = trained['std'] if trained['std'] > 0 else 1.0
+        drift[feature] = abs(current[feature]['mean'] - trained['mean']) / std
+    return drift
+
+
+def _model_versions(model_dir: str) -> list:
+    if not os.path.isdir(model_dir):
+        return []
+    versions = []
+    for name in os.listdir(model_dir):
+        match = _model_file_pattern.match(name)
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+
+def save_engagement_model(model: dict, model_dir: Optional[str] = None) -> str:
+    """
+    Save a model artifact as the next version in the model directory.
+
+    Returns:
+        str: Path of the saved artifact.
+    """
+    model_dir = get_model_dir(model_dir)
+    os.makedirs(model_dir, exist_ok=True)
+
+    versions = _model_versions(model_dir)
+    model['version'] = versions[-1] + 1 if versions else 1
+    file_path = os.path.join(model_dir, f"engagement_model_v{model['version']:04d}.json")
+
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(model, f, indent=2, default=str)
+    os.replace(tmp_path, file_path)
+
+    logger.info(f"Engagement model v{model['version']} saved: {file_path}")
+    return file_path
+
+
+def load_engagement_model(model_dir: Optional[str] = None, version: Optional[int] = None) -> Optional[dict]:
+    """
+    Load a saved model artifact. Defaults to the latest version; returns None if none exists.
+    """
+    model_dir = get_model_dir(model_dir)
+    versions = _model_versions(model_dir)
+    if not versions:
+        return None
+    if version is None:
+        version = versions[-1]
+    elif version not in versions:
+        raise FileNotFoundError(f"Engagement model v{version} not found in {model_dir}")
+
+    with open(os.path.join(model_dir, f"engagement_model_v{version:04d}.json")) as f:
+        return json.load(f)
+
+
+def get_or_train_engagement_model(df: pd.DataFrame, target: str = "sentiment", retrain: bool = False,
+                                  drift_threshold: Optional[float] = None,
+                                  model_dir: Optional[str] = None) -> Tuple[dict, bool]:
+    """
+    Return the latest saved model, training and saving a new version only when asked to,
+    when no model exists yet, or when feature drift exceeds drift_threshold.
+
+    Returns:
+        tuple: (model artifact, whether a new model was trained)
+    """
+    if drift_threshold is None:
+        drift_threshold = getattr(settings, "ENGAGEMENT_DRIFT_THRESHOLD", 0.5)
+
+    with _model_lock:
+        model = None if retrain else load_engagement_model(model_dir)
+        if model is not None:
+            drift = feature_drift(model, df)
+            max_drift = max(drift.values(), default=0.0)
+            if max_drift <= drift_threshold:
+                return model, False
+            logger.info(f"Feature drift {max_drift:.3f} exceeds {drift_threshold}; retraining engagement model")
+
+        model = fit_engagement_model(df, target)
+        save_engagement_model(model, model_dir)
+        return model, True
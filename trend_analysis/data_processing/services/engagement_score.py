@@ -1,82 +1,59 @@
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import RobustScaler, StandardScaler
-from sklearn.ensemble import RandomForestRegressor
-
-
-def calculate_engagement_score(df: pd.DataFrame, target: str = "sentiment") -> pd.DataFrame:
-    df = df.copy()
-
-    # Initialize scalers
-    robust_scaler = RobustScaler()
-    standard_scaler = StandardScaler()
-
-    # Apply robust scaling to followersCount
-    df[['followersCount']] = robust_scaler.fit_transform(df[['followersCount']])
-
-    # Define and scale engagement features in one operation
-    engagement_features = ['likeCount', 'replyCount', 'retweetCount', 'viewCount']
-    df[engagement_features] = standard_scaler.fit_transform(df[engagement_features])
-
-    # Vectorized sentiment transformation
-    df['sentiment_impact'] = np.tanh(df['sentiment'] * 2)  
-
-    if target is not None and target in df.columns:
-        features = engagement_features + ['sentiment_impact', 'followersCount']
-        X = df[features]
-        y = df[target]
-
-        model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
-        model.fit(X, y)
-
-        weights = model.feature_importances_
-        weights /= weights.sum()
-        weight_dict = dict(zip(features, weights))
-        df.attrs['weights_used'] = weight_dict
-    else:
-        weight_dict = {
-            'likeCount': 0.3,
-            'replyCount': 0.2,
-            'retweetCount': 0.2,
-            'viewCount': 0.1,
-            'sentiment_impact': 0.1,  # <--- Updated key
-            'followersCount': 0.1
-        }
-
-    # Calculate engagement score using vectorized operations
-    df['engagement_score'] = (
-        df['likeCount'] * weight_dict['likeCount'] +
-        df['replyCount'] * weight_dict['replyCount'] +
-        df['retweetCount'] * weight_dict['retweetCount'] +
-        df['viewCount'] * weight_dict['viewCount'] +
-        df['sentiment_impact'] * weight_dict['sentiment_impact'] +  # <--- Use precomputed values
-        df['followersCount'] * weight_dict['followersCount']
-    )
+from typing import Optional
+from .engagement_model import fit_engagement_model, apply_engagement_model
+from .online_scaling import score_engagement_batch
+from ..metrics import instrument_stage
+from ..profiling import profile_stage
+
 
-    # Store scaling statistics
-    df.attrs['scaling_stats'] = {
-        'followers': robust_scaler.get_params(),
-        'engagement_metrics': {
-            feature: {
-                'mean': standard_scaler.mean_[i],
-                'scale': standard_scaler.scale_[i]
-            }
-            for i, feature in enumerate(engagement_features)
-        }
-    }
+@instrument_stage("calculate_engagement_score")
+@profile_stage("calculate_engagement_score")
+def calculate_engagement_score(df: pd.DataFrame, target: str = "sentiment", model: Optional[dict] = None,
+                               incremental: bool = False) -> pd.DataFrame:
+    """
+    Calculate the engagement score for each tweet.
 
-    return df[['date', 'likeCount', 'replyCount', 'retweetCount', 'viewCount',
-              'followersCount', 'tweets', 'brand', 'sentiment', 'engagement_score']]
+    Args:
+        df (pd.DataFrame): Processed tweets with engagement metrics, 'sentiment' and 'brand'.
+        target (str): Column used to learn feature weights when no model is given.
+        model (dict): A fitted engagement model (see engagement_model). When given, the stored
+                      scalers and weights are applied as-is and nothing is refitted.
+        incremental (bool): Treat df as a new micro-batch: update the running scaler statistics
+                            with it and score it in O(batch), leaving earlier scores unchanged.
+
+    Returns:
+        pd.DataFrame: Scaled engagement metrics with the 'engagement_score' column.
+    """
+    if incremental:
+        return score_engagement_batch(df)
 
+    if model is None:
+        model = fit_engagement_model(df, target)
 
+    return apply_engagement_model(df, model)
 
-def get_brand_trends(df: pd.DataFrame, predefined_brands: list) -> pd.DataFrame:
+
+
+@instrument_stage("get_brand_trends")
+@profile_stage("get_brand_trends")
+def get_brand_trends(df: pd.DataFrame, predefined_brands: list, agg: str = "sum",
+                     value_column: str = "engagement_score", calendar: Optional[str] = "brand") -> pd.DataFrame:
     """
     Extract brand trends from the DataFrame based on engagement scores.
+
+    All brands are aggregated in one grouped pass over a categorical 'brand' column
+    instead of scanning the frame once per brand.
     
     Args:
         df (pd.DataFrame): DataFrame containing tweet data.
         predefined_brands (list): List of brand names to filter for trends.
+        agg (str): Daily aggregate of value_column: 'sum', 'mean' or 'count'.
+        value_column (str): Column to aggregate.
+        calendar (str): Daily calendar to fill in. 'brand' covers each brand's first to last
+                        day, 'global' covers the full date range for every brand, None keeps
+                        only days with tweets. Missing days get 0 for 'sum' and 'count' and
+                        stay NaN for 'mean', since there is nothing to average.
     
     Returns:
         pd.DataFram: A single DataFrame containing trends for all brands..
@@ -88,52 +65,67 @@ def get_brand_trends(df: pd.DataFrame, predefined_brands: list) -> pd.DataFrame:
     # Ensure 'brand' and 'date' are in proper format
     if "brand" not in df.columns or "date" not in df.columns:
         raise ValueError("DataFrame must contain 'brand' and 'date' columns.")
+
+    if agg not in ("sum", "mean", "count"):
+        raise ValueError(f"Unsupported aggregate: {agg}. Use 'sum', 'mean' or 'count'.")
+
+    if calendar not in ("brand", "global", None):
+        raise ValueError(f"Unsupported calendar: {calendar}. Use 'brand', 'global' or None.")
     
     # Check if 'date' is in datetime format, if not convert it
-    if not pd.api.types.is_datetime64_any_dtype(df['date']):
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    dates = df["date"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors='coerce')
     
     # Check if the 'brand' column contains valid values (e.g., no NaNs or unexpected types)
     if df["brand"].isnull().any():
         raise ValueError("The 'brand' column contains NaN values. Please clean the data.")
-    
-    brand_trends = [] # To store DataFrames for each brand
-    
-    for brand in predefined_brands:
-        # Filter tweets mentioning the brand
-        brand_df = df[df["brand"] == brand]
-
-        # Check that brand_df is a DataFrame
-        if not isinstance(brand_df, pd.DataFrame):
-            print(f"Warning: Brand '{brand}' returned a non-DataFrame type.")
-            continue
-        
-        # If brand_df is empty, skip the brand
-        if brand_df.empty:
+
+    # Brands outside predefined_brands become NaN and are dropped by the groupby.
+    brands = list(dict.fromkeys(predefined_brands))
+    brand_keys = pd.Categorical(df["brand"], categories=brands)
+    # Bucket by calendar day (in the data's own timezone), then drop timezone info
+    days = dates.dt.floor("D").dt.tz_localize(None)
+
+    daily = (
+        df[value_column]
+        .groupby([brand_keys, days.to_numpy()], observed=True)
+        .agg(agg)
+    )
+    daily.index.names = ["brand", "ds"]
+    daily = daily.rename("y")
+
+    found = set(daily.index.get_level_values("brand"))
+    for brand in brands:
+        if brand not in found:
             print(f"No tweets found for brand: {brand}")
-            continue
-        
-        # Aggregate daily engagement metrics
-        daily_engagement = brand_df.groupby(pd.Grouper(key="date", freq="D")).agg({
-            "engagement_score": "sum"
-        }).reset_index()
-        
-        # Prepare data for trend analysis
-        prophet_df = daily_engagement[["date", "engagement_score"]].copy()
-        prophet_df.columns = ["ds", "y"]  # Prophet requires 'ds' and 'y' as column names
-        prophet_df["brand"] = brand  
-        
-        # Remove timezone info if present
-        prophet_df["ds"] = prophet_df["ds"].dt.tz_localize(None)
-        
-        brand_trends.append(prophet_df)
-
-        # Concatenate all brand trends into a single DataFrame
-    if brand_trends:
-            result_df = pd.concat(brand_trends, ignore_index=True)
-            return result_df
-    else:
-            print("No data available for the specified brands.")
-            return pd.DataFrame(columns=["ds", "y", "brand"]) # Return empty DataFrame with expected columns
 
-    
+    if daily.empty:
+        print("No data available for the specified brands.")
+        return pd.DataFrame(columns=["ds", "y", "brand"]) # Return empty DataFrame with expected columns
+
+    if calendar is not None:
+        daily = daily.reindex(_daily_calendar(daily, calendar), fill_value=0 if agg != "mean" else np.nan)
+
+    result = daily.reset_index()
+    result["brand"] = result["brand"].astype(str)
+    return result[["ds", "y", "brand"]]
+
+
+def _daily_calendar(daily: pd.Series, calendar: str) -> pd.MultiIndex:
+    """
+    Build the (brand, day) index of a gap-free daily calendar for every brand in daily.
+    """
+    ds = daily.index.get_level_values("ds")
+    spans = pd.DataFrame({"brand": daily.index.get_level_values("brand"), "ds": ds}) \
+        .groupby("brand", observed=True)["ds"].agg(["min", "max"])
+    if calendar == "global":
+        spans["min"], spans["max"] = ds.min(), ds.max()
+
+    lengths = ((spans["max"] - spans["min"]).dt.days + 1).to_numpy()
+    starts = np.repeat(spans["min"].to_numpy(), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return pd.MultiIndex.from_arrays(
+        [np.repeat(spans.index, lengths), starts + offsets.astype("timedelta64[D]")],
+        names=["brand", "ds"]
+    )
@@ -1,63 +1,276 @@
-from prophet import Prophet
+import os
+import time
+import atexit
+import signal
+import logging
+import threading
+import multiprocessing
 import pandas as pd
+from contextlib import contextmanager
+from django.conf import settings
+from typing import Callable, List, Optional
+from ..forecast_worker import PROPHET_CONFIG, BrandFitTimeout, warm_worker, fit_brand_forecast
+from .forecast_cache import load_cached_forecast, save_cached_forecast, match_cached_forecast
+from .fast_forecast import ridge_forecast
+from .forecast_store import compact_forecast
+from ..metrics import instrument_stage
+from ..profiling import profile_stage
 
-def forecast_trends(all_brand_trends: pd.DataFrame, forecast_periods: int = 30) -> pd.DataFrame:
+logger = logging.getLogger(__name__)
+
+# Extra time the parent waits beyond the per-brand limits before it declares a worker
+# stuck; covers pool start-up and warm-up on the first call.
+POOL_STARTUP_GRACE = 60
+
+FORECAST_ENGINES = ("auto", "prophet", "ridge")
+
+_pools = {}  # worker count -> _SharedPool
+_pool_lock = threading.Lock()
+
+
+class _SharedPool:
+    """
+    A pool of warm forecast workers and the number of forecast_trends calls using it.
+    """
+
+    def __init__(self, workers: int):
+        context = multiprocessing.get_context(getattr(settings, "FORECAST_START_METHOD", None))
+        self.workers = workers
+        self.pool = context.Pool(processes=workers, initializer=warm_worker)
+        self.users = 0
+        self.retired = False
+
+    def terminate(self):
+        # Workers lead their own process group (see warm_worker). Once they are gone, kill
+        # what is left of the groups: cmdstan processes of fits that were still running.
+        # Not before: a worker killed while it holds the task queue's lock hangs terminate().
+        groups = [process.pid for process in getattr(self.pool, "_pool", [])]
+        self.pool.terminate()
+        for group in groups:
+            try:
+                os.killpg(group, signal.SIGKILL)
+            except OSError:
+                pass
+
+
+@contextmanager
+def forecast_pool(workers: int):
+    """
+    Use the persistent pool of `workers` warm forecast workers for the block, creating it on
+    first use. Workers stay alive between calls, so Prophet and Stan are only loaded once per
+    worker. Calls asking for another worker count get a pool of that size next to it.
+    """
+    with _pool_lock:
+        shared = _pools.get(workers)
+        if shared is None:
+            shared = _pools[workers] = _SharedPool(workers)
+        shared.users += 1
+    try:
+        yield shared
+    finally:
+        with _pool_lock:
+            shared.users -= 1
+            if shared.retired and shared.users == 0:
+                shared.terminate()
+
+
+def retire_forecast_pool(shared: _SharedPool):
+    """
+    Stop using a pool with a stuck worker (a running Stan fit cannot be interrupted). Later
+    calls get a fresh pool; this one is terminated once no call is using it any more, so
+    the fits of other calls that share it finish first.
+    """
+    with _pool_lock:
+        if _pools.get(shared.workers) is shared:
+            del _pools[shared.workers]
+        shared.retired = True
+
+
+def shutdown_forecast_pool():
+    """
+    Terminate all worker pools, at interpreter exit.
     """
-    Generate trend forecasts for each brand using Facebook Prophet.
+    with _pool_lock:
+        for shared in _pools.values():
+            shared.terminate()
+        _pools.clear()
+
+
+atexit.register(shutdown_forecast_pool)
+
+
+@instrument_stage("forecast_trends")
+@profile_stage("forecast_trends")
+def forecast_trends(all_brand_trends: pd.DataFrame, forecast_periods: int = 30,
+                    workers: Optional[int] = None, timeout: Optional[float] = None,
+                    use_cache: Optional[bool] = None, engine: Optional[str] = None,
+                    progress: Optional[Callable[[int, int], None]] = None,
+                    brands: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Generate trend forecasts for each brand using Facebook Prophet or the vectorized ridge engine.
+
+    With engine 'auto', brands whose history spans fewer than settings.FORECAST_MIN_PROPHET_DAYS
+    days are forecast together by the ridge engine (trend + weekly seasonality, one batched
+    solve for all of them); Prophet is kept for brands with enough history to use it.
+
+    Brands are fitted in parallel in a pool of warm worker processes. The outcome for each
+    brand ('ok', 'cached', 'error', 'timeout' or 'no_data') is stored in
+    result.attrs['brand_status'] with the engine used, an error message and the fit time.
+
+    The result uses the compact forecast schema (see forecast_store.compact_forecast): only the
+    columns the dashboard and report read, float32 values and a categorical 'brand'.
+
+    Fitted models are cached per brand, keyed by a hash of the brand's ds/y series and the
+    model config. Unchanged brands are served from the cache. Brands whose series only
+    gained new days are refitted warm-started from the cached model's parameters.
 
     Args:
         all_brand_trends (pd.DataFrame): DataFrame containing brand trend data with columns "brand", "ds" (dates), and "y" (values to forecast).
         forecast_periods (int): Number of future periods to forecast.
+        workers (int): Worker processes. Defaults to settings.FORECAST_WORKERS; 1 fits in-process.
+        timeout (float): Seconds allowed per brand fit. Defaults to settings.FORECAST_BRAND_TIMEOUT.
+        use_cache (bool): Read and update the forecast cache. Defaults to settings.FORECAST_CACHE_ENABLED.
+        engine (str): 'auto', 'prophet' or 'ridge'. Defaults to settings.FORECAST_ENGINE.
+        progress (callable): Called as progress(brands_done, total_brands) as brands are fitted.
+        brands (list): Brands that were asked for. Those without rows in all_brand_trends are
+            reported as 'no_data'. Defaults to the brands in all_brand_trends.
 
     Returns:
-        pd.DataFrame: Combined DataFrame with forecasts for all brands, including the "brand" column.
+        pd.DataFrame: Combined DataFrame with forecasts for all brands: "ds", "brand", "type", "yhat",
+                      "yhat_lower", "yhat_upper" and "trend".
     """
+    if workers is None:
+        workers = getattr(settings, "FORECAST_WORKERS", 1)
+    if timeout is None:
+        timeout = getattr(settings, "FORECAST_BRAND_TIMEOUT", 300)
+    if use_cache is None:
+        use_cache = getattr(settings, "FORECAST_CACHE_ENABLED", True)
+    if engine is None:
+        engine = getattr(settings, "FORECAST_ENGINE", "auto")
+    if engine not in FORECAST_ENGINES:
+        raise ValueError(f"Unknown forecast engine '{engine}', expected one of {FORECAST_ENGINES}")
+
     all_forecasts = []
-    
-    # Loop through each unique brand
-    for brand in all_brand_trends["brand"].unique():
-        # Filter data for the current brand
-        brand_data = all_brand_trends[all_brand_trends["brand"] == brand][["ds", "y"]].copy()
-        
+    brand_status = {}
+
+    def report():
+        if progress is not None:
+            progress(len(brand_status), total_brands)
+
+    # Split once instead of filtering the frame per brand
+    brand_series = {
+        brand: group[["ds", "y"]].reset_index(drop=True)
+        for brand, group in all_brand_trends.groupby("brand", sort=False, observed=True)
+    }
+    for brand in brands or []:
+        if brand not in brand_series:
+            brand_status[brand] = {"status": "no_data"}
+    total_brands = len(brand_series) + len(brand_status)
+    for brand, brand_data in list(brand_series.items()):
         # Skip if no data for brand
-        if len(brand_data) == 0:
-            continue
-            
+        if len(brand_data) == 0 or brand_data["y"].notna().sum() < 2:
+            brand_status[brand] = {"status": "no_data"}
+            del brand_series[brand]
+
+    # Short histories give Prophet too little to work with; fit them all at once instead
+    if engine == "prophet":
+        ridge_brands = []
+    elif engine == "ridge":
+        ridge_brands = list(brand_series)
+    else:
+        min_days = getattr(settings, "FORECAST_MIN_PROPHET_DAYS", 90)
+        ridge_brands = [
+            brand for brand, brand_data in brand_series.items()
+            if (pd.to_datetime(brand_data["ds"]).max() - pd.to_datetime(brand_data["ds"]).min()).days < min_days
+        ]
+    if ridge_brands:
+        start = time.perf_counter()
+        ridge_input = pd.concat(
+            [brand_series.pop(brand).assign(brand=brand) for brand in ridge_brands], ignore_index=True
+        )
         try:
-            # Initialize and configure the Prophet model
-            model = Prophet(
-                yearly_seasonality=True,
-                weekly_seasonality=True,
-                daily_seasonality=False,
-                changepoint_prior_scale=0.05,
-                seasonality_prior_scale=10,
-            )
-            
-            # Fit the model to the brand's data
-            model.fit(brand_data)
-            
-            # Generate future dates and forecast
-            future_dates = model.make_future_dataframe(periods=forecast_periods)
-            forecast = model.predict(future_dates)
-            
-            # Add the brand name to the forecast
-            forecast["brand"] = brand
-            
-            # 'Type' column to differentiate actual vs. forecasted
-            forecast["type"] = "forecasted"
-            forecast.loc[forecast["ds"].isin(brand_data["ds"]), "type"] = "actual"
-            
-            all_forecasts.append(forecast)
-            
+            all_forecasts.append(ridge_forecast(ridge_input, forecast_periods))
+            seconds = round(time.perf_counter() - start, 3)
+            for brand in ridge_brands:
+                brand_status[brand] = {"status": "ok", "engine": "ridge", "fit_seconds": seconds}
         except Exception as e:
-            print(f"Error forecasting for brand {brand}: {str(e)}")
-            continue
-    
+            logger.error(f"Error forecasting {len(ridge_brands)} brands with the ridge engine: {e}")
+            for brand in ridge_brands:
+                brand_status[brand] = {"status": "error", "engine": "ridge", "error": str(e)}
+        report()
+
+    # Serve unchanged brands from the cache; remember warm-start models for extended ones
+    warm_starts = {}
+    if use_cache:
+        for brand, brand_data in list(brand_series.items()):
+            entry = load_cached_forecast(brand)
+            match = match_cached_forecast(entry, brand_data, PROPHET_CONFIG, forecast_periods)
+            if match == "hit":
+                all_forecasts.append(entry["forecast"])
+                brand_status[brand] = {"status": "cached", "engine": "prophet"}
+                del brand_series[brand]
+            elif match == "extended":
+                warm_starts[brand] = entry["model_json"]
+        report()
+
+    def record(brand, outcome):
+        forecast, seconds, model_json = outcome
+        forecast = compact_forecast(forecast)
+        all_forecasts.append(forecast)
+        brand_status[brand] = {"status": "ok", "engine": "prophet", "fit_seconds": round(seconds, 3),
+                               "warm_start": brand in warm_starts}
+        if use_cache:
+            try:
+                save_cached_forecast(brand, brand_series[brand], PROPHET_CONFIG, forecast_periods, model_json, forecast)
+            except Exception as e:
+                logger.warning(f"Could not cache forecast for brand {brand}: {e}")
+        report()
+
+    def record_error(brand, status, error):
+        if isinstance(error, BrandFitTimeout):
+            status, error = "timeout", f"Fit did not finish within {timeout}s"
+        logger.error(f"Error forecasting for brand {brand}: {error}")
+        brand_status[brand] = {"status": status, "engine": "prophet", "error": str(error)}
+        report()
+
+    if workers <= 1 or len(brand_series) <= 1:
+        for brand, brand_data in brand_series.items():
+            try:
+                record(brand, fit_brand_forecast(brand, brand_data, forecast_periods, PROPHET_CONFIG,
+                                                 timeout, warm_starts.get(brand)))
+            except Exception as e:
+                record_error(brand, "error", e)
+    else:
+        with forecast_pool(workers) as shared:
+            start = time.monotonic()
+            pending = [
+                (brand, shared.pool.apply_async(fit_brand_forecast, (brand, brand_data, forecast_periods,
+                                                                     PROPHET_CONFIG, timeout, warm_starts.get(brand))))
+                for brand, brand_data in brand_series.items()
+            ]
+            timed_out = False
+            for position, (brand, result) in enumerate(pending):
+                # Workers enforce the per-brand limit themselves. This deadline only catches a
+                # worker that is stuck for good; queued brands wait for earlier waves first.
+                deadline = start + timeout * (position // workers + 1) + POOL_STARTUP_GRACE
+                try:
+                    record(brand, result.get(timeout=max(0.0, deadline - time.monotonic())))
+                except multiprocessing.TimeoutError:
+                    timed_out = True
+                    record_error(brand, "timeout", f"Worker did not respond within {timeout}s")
+                except Exception as e:
+                    record_error(brand, "error", e)
+
+            if timed_out:
+                # Stuck Stan fits would keep occupying workers; start afresh next time.
+                retire_forecast_pool(shared)
+
     # Return empty DataFrame if no forecasts were generated
     if not all_forecasts:
-        return pd.DataFrame()
-        
-    # Combine all forecasts into a single DataFrame
-    combined_forecasts = pd.concat(all_forecasts, ignore_index=True)
-    
-    return combined_forecasts
\ No newline at end of file
+        combined_forecasts = pd.DataFrame()
+    else:
+        # Combine all forecasts into a single DataFrame; brand categories are rebuilt afterwards
+        combined_forecasts = compact_forecast(pd.concat(all_forecasts, ignore_index=True))
+
+    combined_forecasts.attrs["brand_status"] = brand_status
+    return combined_forecasts
@@ -0,0 +1,101 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_cache_lock = threading.Lock()
+
+
+def get_cache_dir(cache_dir: Optional[str] = None) -> str:
+    if cache_dir is not None:
+        return cache_dir
+    data_lake_base_path = getattr(settings, "DATA_LAKE_PATH", "data_lake")
+    return getattr(settings, "FORECAST_CACHE_DIR", os.path.join(data_lake_base_path, "forecast_cache"))
+
+
+def series_hash(brand_data: pd.DataFrame) -> str:
+    """
+    Hash of a brand's ds/y series; identical series always hash the same.
+    """
+    digest = hashlib.sha256()
+    digest.update(pd.to_datetime(brand_data["ds"]).to_numpy(dtype="datetime64[ns]").view(np.int64).tobytes())
+    digest.update(brand_data["y"].to_numpy(dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def config_hash(model_config: dict) -> str:
+    payload = json.dumps(model_config, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _entry_paths(brand: str, cache_dir: str):
+    # Brand names are free text; keep file names safe but recognisable.
+    safe = re.sub(r"[^a-zA-Z0-9_-]", "_", brand)[:40]
+    stem = os.path.join(cache_dir, f"{safe}_{hashlib.sha1(brand.encode()).hexdigest()[:8]}")
+    return stem + ".json", stem + ".forecast.parquet"
+
+
+def load_cached_forecast(brand: str, cache_dir: Optional[str] = None) -> Optional[dict]:
+    """
+    Load a brand's cache entry: its metadata, model JSON and forecast. Returns None if absent.
+    """
+    meta_path, forecast_path = _entry_paths(brand, get_cache_dir(cache_dir))
+    if not os.path.exists(meta_path) or not os.path.exists(forecast_path):
+        return None
+    try:
+        with open(meta_path) as f:
+            entry = json.load(f)
+        entry["forecast"] = pd.read_parquet(forecast_path)
+        return entry
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable forecast cache entry for {brand}: {e}")
+        return None
+
+
+def save_cached_forecast(brand: str, brand_data: pd.DataFrame, model_config: dict, forecast_periods: int,
+                         model_json: str, forecast: pd.DataFrame, cache_dir: Optional[str] = None) -> None:
+    cache_dir = get_cache_dir(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path, forecast_path = _entry_paths(brand, cache_dir)
+    entry = {
+        "brand": brand,
+        "config_hash": config_hash(model_config),
+        "forecast_periods": forecast_periods,
+        "series_hash": series_hash(brand_data),
+        "n_rows": len(brand_data),
+        "model_json": model_json,
+    }
+    with _cache_lock:
+        forecast.to_parquet(forecast_path + ".tmp", index=False)
+        os.replace(forecast_path + ".tmp", forecast_path)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(entry, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+
+def match_cached_forecast(entry: Optional[dict], brand_data: pd.DataFrame, model_config: dict,
+                          forecast_periods: int) -> str:
+    """
+    Compare a cache entry with the brand's current series.
+
+    Returns:
+        str: 'hit' if the cached forecast can be served as-is, 'extended' if the cached model
+             is a valid warm start (the series only gained rows at the end, or only the
+             forecast horizon changed), otherwise 'miss'.
+    """
+    if entry is None or entry["config_hash"] != config_hash(model_config):
+        return "miss"
+    n_rows = entry["n_rows"]
+    if len(brand_data) == n_rows and series_hash(brand_data) == entry["series_hash"]:
+        return "hit" if entry["forecast_periods"] == forecast_periods else "extended"
+    if len(brand_data) > n_rows and series_hash(brand_data.iloc[:n_rows]) == entry["series_hash"]:
+        return "extended"
+    return "miss"
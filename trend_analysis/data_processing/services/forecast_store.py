@@ -0,0 +1,74 @@
+import os
+import shutil
+import logging
+import numpy as np
+import pandas as pd
+from typing import Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# The columns the dashboard and the report read. Prophet's additive, multiplicative and
+# seasonal terms (and their bounds) are not used anywhere downstream.
+FORECAST_OUTPUT_COLUMNS = ["ds", "brand", "type", "yhat", "yhat_lower", "yhat_upper", "trend"]
+FORECAST_FLOAT_COLUMNS = ["yhat", "yhat_lower", "yhat_upper", "trend"]
+
+
+def compact_forecast(forecast: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduce a forecast to FORECAST_OUTPUT_COLUMNS with float32 values and categorical
+    'brand' and 'type', roughly a fifth of the size of Prophet's full output.
+    """
+    if forecast.empty:
+        return forecast
+
+    columns = [column for column in FORECAST_OUTPUT_COLUMNS if column in forecast.columns]
+    compact = forecast[columns].copy()
+    for column in FORECAST_FLOAT_COLUMNS:
+        if column in compact.columns:
+            compact[column] = compact[column].astype(np.float32)
+    compact["brand"] = compact["brand"].astype("category")
+    if "type" in compact.columns:
+        compact["type"] = compact["type"].astype("category")
+    return compact
+
+
+def save_forecast(forecast: pd.DataFrame, path: str) -> str:
+    """
+    Write a forecast as a parquet dataset partitioned by brand (path/brand=<name>/...),
+    so readers can load one brand's forecast without touching the others.
+
+    The dataset is written next to `path` and swapped in afterwards, replacing any earlier
+    dataset (or single parquet file) at that path.
+    """
+    forecast = compact_forecast(forecast)
+    if forecast.empty:
+        raise ValueError("Cannot save empty forecast")
+
+    tmp_path, old_path = path + ".tmp", path + ".old"
+    for stale in (tmp_path, old_path):
+        _remove_path(stale)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    forecast.to_parquet(tmp_path, partition_cols=["brand"], index=False)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    _remove_path(old_path)
+
+    logger.info(f"Saved forecast for {forecast['brand'].nunique()} brands to {path}")
+    return path
+
+
+def load_forecast(path: str, brands: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Load a saved forecast, reading only the partitions of `brands` when given.
+    """
+    filters = [("brand", "in", list(brands))] if brands is not None else None
+    return pd.read_parquet(path, engine="pyarrow", filters=filters)
+
+
+def _remove_path(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,153 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Real English words that sit within one edit of a tracked brand ("like" -> "nike",
+# "apply" -> "apple"). They are far more common than the misspellings we want to catch.
+DEFAULT_IGNORED_TOKENS = frozenset({
+    'nice', 'nile', 'apply', 'ample', 'amazin', 'goggle', 'googly', 'samson',
+})
+
+_token_pattern = re.compile(r'[a-z0-9]+')
+
+
+def normalize_brand(brand: str) -> str:
+    """
+    Reduce a brand name to lowercase alphanumerics so that "Coca-Cola",
+    "coca cola" and "cocacola" share one key.
+    """
+    return re.sub(r'[^a-z0-9]', '', brand.lower())
+
+
+def allowed_distance(term: str, max_edit_distance: int = 2) -> int:
+    """
+    Edit distance tolerated for a brand key: one typo per four characters,
+    capped at max_edit_distance. Keeps "nike" strict while "microsoft" may lose two letters.
+    """
+    return min(max_edit_distance, len(term) // 4)
+
+
+def _deletes(term: str, distance: int) -> Set[str]:
+    """
+    Generate every string reachable from term by deleting up to `distance` characters.
+    """
+    results = {term}
+    frontier = {term}
+    for _ in range(distance):
+        next_frontier = set()
+        for word in frontier:
+            if len(word) <= 1:
+                continue
+            for i in range(len(word)):
+                next_frontier.add(word[:i] + word[i + 1:])
+        next_frontier -= results
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment (Damerau-Levenshtein with adjacent transpositions) distance.
+    Returns max_distance + 1 as soon as the distance is known to exceed max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class BrandDeletionIndex:
+    """
+    SymSpell-style deletion index over a brand catalog.
+
+    Every brand key is expanded once into its deletion variants. A tweet token is then
+    expanded the same way and looked up, so candidate brands are found with a handful of
+    dictionary hits per token instead of comparing each token with each brand.
+    """
+
+    def __init__(self, brands: Iterable[str], max_edit_distance: int = 2,
+                 min_token_length: int = 4, ignored_tokens: Iterable[str] = DEFAULT_IGNORED_TOKENS):
+        self.max_edit_distance = max_edit_distance
+        self.min_token_length = min_token_length
+        self.ignored_tokens = frozenset(ignored_tokens)
+        self.brands: Dict[str, str] = {}
+        self.deletes: Dict[str, Set[str]] = defaultdict(set)
+
+        for brand in brands:
+            key = normalize_brand(brand)
+            if not key or key in self.brands:
+                continue
+            self.brands[key] = brand
+            for variant in _deletes(key, allowed_distance(key, max_edit_distance)):
+                self.deletes[variant].add(key)
+
+        self.deletes = dict(self.deletes)
+        self._lengths = {len(key) for key in self.brands}
+
+    def lookup(self, token: str) -> Optional[Tuple[str, int]]:
+        """
+        Find the closest brand for a single normalized token.
+
+        Returns:
+            tuple: (brand, distance) for the best candidate, or None.
+        """
+        if token in self.brands:
+            return self.brands[token], 0
+        if len(token) < self.min_token_length or token in self.ignored_tokens:
+            return None
+        if not any(abs(len(token) - length) <= self.max_edit_distance for length in self._lengths):
+            return None
+
+        best = None
+        seen = set()
+        for variant in _deletes(token, self.max_edit_distance):
+            for key in self.deletes.get(variant, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                # Misspellings almost never change the first letter; anchoring on it
+                # removes most false positives from common words.
+                if key[0] != token[0]:
+                    continue
+                limit = allowed_distance(key, self.max_edit_distance)
+                distance = edit_distance(token, key, limit)
+                if distance <= limit and (best is None or distance < best[1]):
+                    best = (self.brands[key], distance)
+        return best
+
+    def find_mentions(self, text: str) -> List[str]:
+        """
+        Scan a tweet once and return the brands it mentions, allowing typos.
+
+        Adjacent token pairs are also tried joined together so split spellings such as
+        "micro soft" or "coca cola" resolve to their brand.
+        """
+        tokens = _token_pattern.findall(str(text).lower())
+        found = []
+        i = 0
+        while i < len(tokens):
+            match = None
+            if i + 1 < len(tokens):
+                match = self.lookup(tokens[i] + tokens[i + 1])
+                if match is not None:
+                    i += 2
+            if match is None:
+                match = self.lookup(tokens[i])
+                i += 1
+            if match is not None and match[0] not in found:
+                found.append(match[0])
+        return found
@@ -0,0 +1,235 @@
+import os
+import math
+import json
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from sklearn.preprocessing import StandardScaler
+from typing import Optional
+from .engagement_model import ENGAGEMENT_FEATURES, DEFAULT_WEIGHTS, apply_engagement_model, get_model_dir, load_engagement_model
+
+logger = logging.getLogger(__name__)
+
+_state_lock = threading.Lock()
+
+
+class QuantileSketch:
+    """
+    Streaming quantile sketch with relative-error guarantees (DDSketch-style).
+
+    Values are counted in logarithmic buckets, so any quantile is returned within
+    `relative_accuracy` of the true value while memory stays at a few thousand
+    counters regardless of how many values were seen. Updates are vectorized per batch.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _add(self, store: dict, values: np.ndarray) -> None:
+        if len(values) == 0:
+            return
+        keys, counts = np.unique(np.ceil(np.log(values) / self._log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def update(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        self._add(self.positive, values[values > 0])
+        self._add(self.negative, -values[values < 0])
+        self.zero_count += int((values == 0).sum())
+        self.count += len(values)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """
+        Add the values counted by `other`, e.g. a sketch of another partition. The result
+        is the sketch that one pass over both partitions would have built.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with a different relative accuracy.")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def _bucket_value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return float("nan")
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self.positive))
+
+    def to_dict(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": {str(k): v for k, v in self.positive.items()},
+            "negative": {str(k): v for k, v in self.negative.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls(data["relative_accuracy"])
+        sketch.positive = {int(k): v for k, v in data["positive"].items()}
+        sketch.negative = {int(k): v for k, v in data["negative"].items()}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        return sketch
+
+
+class OnlineEngagementScorer:
+    """
+    Engagement scorer whose scaling statistics are updated batch by batch.
+
+    Engagement metrics use StandardScaler.partial_fit; followers use the median and
+    interquartile range from a QuantileSketch, matching RobustScaler. Scoring a batch
+    costs O(batch), and rows scored earlier are never rescored, so their scores stay put.
+    """
+
+    def __init__(self, weights: Optional[dict] = None, relative_accuracy: float = 0.01):
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.standard_scaler = StandardScaler()
+        self.followers_sketch = QuantileSketch(relative_accuracy)
+
+    @property
+    def n_samples_seen(self) -> int:
+        return int(getattr(self.standard_scaler, "n_samples_seen_", 0))
+
+    def partial_fit(self, df: pd.DataFrame) -> "OnlineEngagementScorer":
+        self.standard_scaler.partial_fit(df[ENGAGEMENT_FEATURES].to_numpy(dtype=np.float64))
+        self.followers_sketch.update(df["followersCount"].to_numpy())
+        return self
+
+    def as_model(self) -> dict:
+        """
+        Current statistics in the engagement model artifact format.
+        """
+        if self.n_samples_seen == 0:
+            raise ValueError("OnlineEngagementScorer has not seen any data yet.")
+
+        center = self.followers_sketch.quantile(0.5)
+        iqr = self.followers_sketch.quantile(0.75) - self.followers_sketch.quantile(0.25)
+        return {
+            "version": None,
+            "weight_source": "online",
+            "n_rows": self.n_samples_seen,
+            "weights": self.weights,
+            "followers_scaler": {"center": center, "scale": iqr if iqr > 0 else 1.0, "params": {"quantile_range": (25.0, 75.0)}},
+            "engagement_scaler": {
+                feature: {
+                    "mean": float(self.standard_scaler.mean_[i]),
+                    "scale": float(self.standard_scaler.scale_[i])
+                }
+                for i, feature in enumerate(ENGAGEMENT_FEATURES)
+            },
+        }
+
+    def score(self, df: pd.DataFrame) -> pd.DataFrame:
+        return apply_engagement_model(df, self.as_model())
+
+    def to_dict(self) -> dict:
+        scaler = self.standard_scaler
+        return {
+            "weights": self.weights,
+            "standard_scaler": {
+                "mean": scaler.mean_.tolist(),
+                "var": scaler.var_.tolist(),
+                "n_samples_seen": int(scaler.n_samples_seen_),
+            } if self.n_samples_seen else None,
+            "followers_sketch": self.followers_sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "OnlineEngagementScorer":
+        scorer = cls(weights=data["weights"])
+        scorer.followers_sketch = QuantileSketch.from_dict(data["followers_sketch"])
+        stats = data.get("standard_scaler")
+        if stats:
+            # Restore the running moments so the next partial_fit continues from them.
+            scaler = scorer.standard_scaler
+            scaler.mean_ = np.array(stats["mean"])
+            scaler.var_ = np.array(stats["var"])
+            scaler.scale_ = np.sqrt(np.where(scaler.var_ > 0, scaler.var_, 1.0))
+            scaler.n_samples_seen_ = stats["n_samples_seen"]
+            scaler.n_features_in_ = len(ENGAGEMENT_FEATURES)
+        return scorer
+
+
+def get_online_state_path(state_path: Optional[str] = None) -> str:
+    if state_path is not None:
+        return state_path
+    return getattr(settings, "ENGAGEMENT_ONLINE_STATE_PATH", os.path.join(get_model_dir(), "online_state.json"))
+
+
+def load_online_scorer(state_path: Optional[str] = None) -> OnlineEngagementScorer:
+    """
+    Load the persisted online scorer, or start a new one that uses the latest
+    saved engagement model's weights (default weights if no model exists).
+    """
+    state_path = get_online_state_path(state_path)
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            return OnlineEngagementScorer.from_dict(json.load(f))
+
+    model = load_engagement_model()
+    return OnlineEngagementScorer(weights=model["weights"] if model else None)
+
+
+def save_online_scorer(scorer: OnlineEngagementScorer, state_path: Optional[str] = None) -> str:
+    state_path = get_online_state_path(state_path)
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(scorer.to_dict(), f)
+    os.replace(tmp_path, state_path)
+    return state_path
+
+
+def score_engagement_batch(df: pd.DataFrame, state_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Score a new micro-batch of processed tweets incrementally.
+
+    The batch is folded into the running scaler statistics and then scored with them;
+    no earlier data is touched, so the cost is O(batch).
+
+    Args:
+        df (pd.DataFrame): New processed tweets with engagement metrics, 'sentiment' and 'brand'.
+        state_path (str): Where the running statistics are persisted.
+                          Defaults to settings.ENGAGEMENT_ONLINE_STATE_PATH.
+
+    Returns:
+        pd.DataFrame: Scored batch, in the same format as calculate_engagement_score.
+    """
+    with _state_lock:
+        scorer = load_online_scorer(state_path)
+        scorer.partial_fit(df)
+        scored = scorer.score(df)
+        save_online_scorer(scorer, state_path)
+
+    logger.info(f"Scored batch of {len(df)} tweets incrementally ({scorer.n_samples_seen} seen in total)")
+    return scored
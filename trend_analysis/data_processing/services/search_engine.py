@@ -3,6 +3,9 @@ import re
 import difflib
 import spacy
 from collections import defaultdict
+from .fuzzy_matcher import BrandDeletionIndex
+from ..metrics import instrument_stage
+from ..profiling import profile_stage
 
 # Curated list of genuine brands.
 genuine_brands = ['apple', 'coca-cola', 'nike', 'samsung', 'google', 'microsoft', 'amazon']
@@ -18,12 +21,15 @@ def validate_brand(brand, genuine_list=genuine_brands, cutoff=0.6):
     close_matches = difflib.get_close_matches(brand_lower, genuine_list, n=1, cutoff=cutoff)
     return close_matches[0] if close_matches else None
 
-def build_inverted_index(df, genuine_list, nlp):
+def build_inverted_index(df, genuine_list, nlp, fuzzy=False, max_edit_distance=2):
     """
     Build an inverted index mapping each genuine brand to a list of tweet indices
     where that brand is mentioned. Uses vectorized regex matching and spaCy's NER.
+    With fuzzy=True, misspelled mentions ("nikee", "micro soft") are also picked up
+    through a SymSpell-style deletion index built once over genuine_list.
     """
-    inverted_index = defaultdict(list)
+    # Sets, since the regex, NER and fuzzy passes can each find the same tweet
+    inverted_index = defaultdict(set)
     
     # Precompile regex patterns for each genuine brand.
     regex_patterns = {
@@ -38,7 +44,7 @@ def build_inverted_index(df, genuine_list, nlp):
         matches = lower_tweets.str.contains(pattern)
         indices = df.index[matches].tolist()
         if indices:
-            inverted_index[brand].extend(indices)
+            inverted_index[brand].update(indices)
     
     # Batch process tweets with spaCy for NER.
     docs = list(nlp.pipe(df['tweets'], batch_size=50))
@@ -47,11 +53,20 @@ def build_inverted_index(df, genuine_list, nlp):
             if ent.label_ == "ORG":
                 entity = ent.text.lower()
                 if entity in genuine_list:
-                    inverted_index[entity].append(df.index[idx])
-                    
-    return dict(inverted_index)
+                    inverted_index[entity].add(df.index[idx])
 
-def search_multiple_brands(df, brands, genuine_list=genuine_brands, cutoff=0.6, nlp=None):
+    # Approximate matching: one pass per tweet against the deletion index.
+    if fuzzy:
+        deletion_index = BrandDeletionIndex(genuine_list, max_edit_distance=max_edit_distance)
+        for idx, tweet in zip(df.index, df['tweets']):
+            for brand in deletion_index.find_mentions(tweet):
+                inverted_index[brand].add(idx)
+
+    return {brand: sorted(indices) for brand, indices in inverted_index.items()}
+
+@instrument_stage("search_multiple_brands")
+@profile_stage("search_multiple_brands")
+def search_multiple_brands(df, brands, genuine_list=genuine_brands, cutoff=0.6, nlp=None, fuzzy=False):
     """
     For each brand in the input list, validate it using fuzzy matching and then check
     if the validated brand appears in any tweet (using the precomputed inverted index).
@@ -63,7 +78,7 @@ def search_multiple_brands(df, brands, genuine_list=genuine_brands, cutoff=0.6,
     if nlp is None:
         nlp = spacy.load("en_core_web_sm")
     
-    inverted_index = build_inverted_index(df, genuine_list, nlp)
+    inverted_index = build_inverted_index(df, genuine_list, nlp, fuzzy=fuzzy)
     available_list = []
     not_available_list = []
     
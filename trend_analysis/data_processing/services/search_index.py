@@ -0,0 +1,345 @@
+import os
+import json
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_SEGMENTS = 8
+
+_index_lock = threading.Lock()
+_loaded_index = None  # ((index dir, manifest mtime), SearchIndex)
+
+
+def get_index_dir(index_dir: Optional[str] = None) -> str:
+    if index_dir is not None:
+        return index_dir
+    data_lake_base_path = getattr(settings, "DATA_LAKE_PATH", "data_lake")
+    return getattr(settings, "SEARCH_INDEX_PATH", os.path.join(data_lake_base_path, "search_index"))
+
+
+def _read_manifest(index_dir: str) -> dict:
+    manifest_path = os.path.join(index_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {"segments": [], "doc_count": 0, "total_length": 0}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def _write_manifest(index_dir: str, manifest: dict) -> None:
+    # Write then rename so readers never see a half-written manifest.
+    tmp_path = os.path.join(index_dir, MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(index_dir, MANIFEST_NAME))
+
+
+def _next_segment_name(manifest: dict) -> str:
+    if not manifest["segments"]:
+        return "seg_000000"
+    return f"seg_{int(manifest['segments'][-1].split('_')[1]) + 1:06d}"
+
+
+def _doc_keys(df: pd.DataFrame, text_column: str) -> np.ndarray:
+    """
+    Stable 64-bit key per tweet (date, brand and text), used to skip tweets that are
+    already indexed.
+    """
+    columns = ["date", "brand", text_column] if "brand" in df.columns else ["date", text_column]
+    return pd.util.hash_pandas_object(df[columns].astype(str), index=False).to_numpy()
+
+
+def _write_segment(index_dir: str, name: str, docs: pd.DataFrame,
+                   terms: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray) -> None:
+    """
+    Persist one immutable segment: a docs table and term-sorted postings (CSR layout).
+    """
+    order = np.lexsort((doc_ids, terms))
+    terms, doc_ids, tfs = terms[order], doc_ids[order], tfs[order]
+    unique_terms, starts = np.unique(terms, return_index=True)
+    offsets = np.append(starts, len(terms)).astype(np.int64)
+
+    docs.to_parquet(os.path.join(index_dir, f"{name}.docs.parquet"), index=False)
+    np.savez(os.path.join(index_dir, f"{name}.postings.npz"),
+             terms=unique_terms.astype(str), offsets=offsets,
+             doc_ids=doc_ids.astype(np.int64), tfs=tfs.astype(np.int32))
+
+
+def _build_postings(texts: pd.Series, doc_ids: np.ndarray):
+    """
+    Turn whitespace-tokenized texts into (term, doc_id, term frequency) triples.
+    """
+    tokens = pd.Series(texts.to_numpy(), index=doc_ids).str.split().explode().dropna()
+    tokens = tokens[tokens != ""]
+    counts = tokens.groupby([tokens.index, tokens.to_numpy()]).size()
+    return (counts.index.get_level_values(1).to_numpy().astype(str),
+            counts.index.get_level_values(0).to_numpy(),
+            counts.to_numpy())
+
+
+def update_search_index(df: pd.DataFrame, text_column: str = "tweets", index_dir: Optional[str] = None,
+                        dataset_version: Optional[str] = None) -> int:
+    """
+    Add the tweets of df that are not indexed yet as a new index segment.
+
+    The text column is expected to be cleaned by process_tweets_column (lowercase,
+    lemmatized, whitespace separated), so tokenization is a plain split.
+
+    With `dataset_version`, df is the whole corpus of that dataset version: it is indexed
+    once, and a new version replaces the index instead of being added to it.
+
+    Args:
+        df (pd.DataFrame): Tweets with 'date', the text column and optionally 'brand'.
+        text_column (str): Column holding the cleaned tweet text.
+        index_dir (str): Directory of the index. Defaults to settings.SEARCH_INDEX_PATH.
+        dataset_version (str): Version of the dataset df holds in full.
+
+    Returns:
+        int: Number of newly indexed tweets.
+    """
+    if text_column not in df.columns or "date" not in df.columns:
+        raise ValueError(f"DataFrame must contain 'date' and '{text_column}' columns.")
+
+    index_dir = get_index_dir(index_dir)
+    os.makedirs(index_dir, exist_ok=True)
+
+    with _index_lock:
+        manifest = _read_manifest(index_dir)
+        name = _next_segment_name(manifest)
+        replaced_segments = []
+        if dataset_version is not None:
+            if manifest.get("dataset_version") == dataset_version:
+                return 0
+            # Start over. Segment names keep counting, so files of the old index are never
+            # overwritten while a reader may still be loading them.
+            replaced_segments = manifest["segments"]
+            manifest = {"segments": [], "doc_count": 0, "total_length": 0, "dataset_version": dataset_version}
+
+        keys = _doc_keys(df, text_column)
+        if manifest["segments"]:
+            known = np.concatenate([
+                pd.read_parquet(os.path.join(index_dir, f"{name}.docs.parquet"), columns=["doc_key"])["doc_key"].to_numpy()
+                for name in manifest["segments"]
+            ])
+            is_new = ~np.isin(keys, known)
+        else:
+            is_new = np.ones(len(keys), dtype=bool)
+        # Also drop duplicates inside the batch itself.
+        is_new &= ~pd.Series(keys).duplicated().to_numpy()
+
+        new_rows = df.loc[is_new]
+        if new_rows.empty:
+            return 0
+
+        first_id = manifest["doc_count"]
+        doc_ids = np.arange(first_id, first_id + len(new_rows), dtype=np.int64)
+        texts = new_rows[text_column].fillna("").astype(str)
+        docs = pd.DataFrame({
+            "doc_id": doc_ids,
+            "doc_key": keys[is_new],
+            "date": pd.to_datetime(new_rows["date"], errors="coerce", utc=True).dt.tz_convert(None).to_numpy(),
+            "brand": new_rows["brand"].astype(str).to_numpy() if "brand" in new_rows.columns else "",
+            "tweet": texts.to_numpy(),
+            "length": texts.str.split().str.len().to_numpy(dtype=np.int32),
+        })
+        terms, posting_docs, tfs = _build_postings(texts, doc_ids)
+
+        _write_segment(index_dir, name, docs, terms, posting_docs, tfs)
+
+        manifest["segments"].append(name)
+        manifest["doc_count"] = first_id + len(new_rows)
+        manifest["total_length"] += int(docs["length"].sum())
+        _write_manifest(index_dir, manifest)
+        _remove_segments(index_dir, replaced_segments)
+
+        if len(manifest["segments"]) > MAX_SEGMENTS:
+            _compact(index_dir, manifest)
+
+    logger.info(f"Indexed {len(new_rows)} new tweets into {index_dir}")
+    return len(new_rows)
+
+
+def _compact(index_dir: str, manifest: dict) -> None:
+    """
+    Merge all segments into one so queries touch a single postings file.
+    """
+    old_segments = list(manifest["segments"])
+    docs, terms, doc_ids, tfs = [], [], [], []
+    for name in old_segments:
+        docs.append(pd.read_parquet(os.path.join(index_dir, f"{name}.docs.parquet")))
+        with np.load(os.path.join(index_dir, f"{name}.postings.npz")) as postings:
+            terms.append(np.repeat(postings["terms"], np.diff(postings["offsets"])))
+            doc_ids.append(postings["doc_ids"])
+            tfs.append(postings["tfs"])
+
+    name = _next_segment_name(manifest)
+    _write_segment(index_dir, name, pd.concat(docs, ignore_index=True),
+                   np.concatenate(terms), np.concatenate(doc_ids), np.concatenate(tfs))
+    manifest["segments"] = [name]
+    _write_manifest(index_dir, manifest)
+    _remove_segments(index_dir, old_segments)
+
+
+def _remove_segments(index_dir: str, names: list) -> None:
+    for old in names:
+        for suffix in (".docs.parquet", ".postings.npz"):
+            os.remove(os.path.join(index_dir, old + suffix))
+
+
+class SearchIndex:
+    """
+    Read-only, in-memory view of the on-disk index used to answer BM25 queries.
+    """
+
+    def __init__(self, index_dir: str):
+        manifest = _read_manifest(index_dir)
+        self.doc_count = manifest["doc_count"]
+        self.avg_length = manifest["total_length"] / self.doc_count if self.doc_count else 0.0
+        self.segments = []
+        docs = []
+        for name in manifest["segments"]:
+            with np.load(os.path.join(index_dir, f"{name}.postings.npz")) as postings:
+                self.segments.append({key: postings[key] for key in ("terms", "offsets", "doc_ids", "tfs")})
+            docs.append(pd.read_parquet(os.path.join(index_dir, f"{name}.docs.parquet"),
+                                        columns=["doc_id", "date", "brand", "tweet", "length"]))
+
+        docs = pd.concat(docs, ignore_index=True) if docs else pd.DataFrame(
+            columns=["doc_id", "date", "brand", "tweet", "length"])
+        # Doc ids are dense and assigned in order, so row position == doc id.
+        docs = docs.sort_values("doc_id").reset_index(drop=True)
+        self.tweets = docs["tweet"].to_numpy()
+        self.lengths = docs["length"].to_numpy(dtype=np.float64)
+        self.dates = pd.to_datetime(docs["date"], utc=True)
+        self.date_values = self.dates.to_numpy(dtype="datetime64[ns]")
+        brands = docs["brand"].astype("category")
+        self.brands = brands.to_numpy()
+        self.brand_categories = brands.cat.categories
+        self.brand_codes = brands.cat.codes.to_numpy()
+
+    def _postings(self, term: str):
+        for segment in self.segments:
+            terms = segment["terms"]
+            pos = np.searchsorted(terms, term)
+            if pos < len(terms) and terms[pos] == term:
+                start, end = segment["offsets"][pos], segment["offsets"][pos + 1]
+                yield segment["doc_ids"][start:end], segment["tfs"][start:end]
+
+    def _mentions(self, doc_ids: np.ndarray, brands: list) -> np.ndarray:
+        """
+        Which of doc_ids contain all terms of at least one of the brands: the brand filter
+        for tweets indexed without a brand (the corpus is indexed before brand extraction).
+        """
+        mentioning = []
+        for brand in brands:
+            docs = None
+            for term in brand.split():
+                postings = list(self._postings(term))
+                term_docs = np.concatenate([p[0] for p in postings]) if postings else np.empty(0, dtype=np.int64)
+                docs = term_docs if docs is None else np.intersect1d(docs, term_docs)
+            if docs is not None:
+                mentioning.append(docs)
+        if not mentioning:
+            return np.zeros(len(doc_ids), dtype=bool)
+        return np.isin(doc_ids, np.concatenate(mentioning))
+
+    def search(self, query_terms: list, k: int = 10, brands: Optional[list] = None,
+               start_date=None, end_date=None) -> list:
+        """
+        Rank tweets for the query terms with Okapi BM25.
+
+        Returns:
+            list: Up to k dicts with 'doc_id', 'score', 'date', 'brand' and 'tweet'.
+        """
+        if self.doc_count == 0:
+            return []
+
+        ids, contributions = [], []
+        for term in set(query_terms):
+            postings = list(self._postings(term))
+            if not postings:
+                continue
+            doc_ids = np.concatenate([p[0] for p in postings])
+            tfs = np.concatenate([p[1] for p in postings]).astype(np.float64)
+            idf = np.log(1 + (self.doc_count - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_ids] / self.avg_length)
+            ids.append(doc_ids)
+            contributions.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+
+        if not ids:
+            return []
+
+        candidates, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+
+        # Filters only ever look at matching docs, never at the whole corpus.
+        keep = np.ones(len(candidates), dtype=bool)
+        if brands:
+            wanted = self.brand_categories.get_indexer(brands)
+            keep &= np.isin(self.brand_codes[candidates], wanted[wanted >= 0]) | self._mentions(candidates, brands)
+        if start_date is not None:
+            keep &= self.date_values[candidates] >= pd.Timestamp(start_date, tz="UTC").to_datetime64()
+        if end_date is not None:
+            keep &= self.date_values[candidates] <= pd.Timestamp(end_date, tz="UTC").to_datetime64()
+        candidates, scores = candidates[keep], scores[keep]
+
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+
+        return [
+            {
+                "doc_id": int(candidates[i]),
+                "score": float(scores[i]),
+                "date": self.dates.iloc[candidates[i]].isoformat() if not pd.isna(self.dates.iloc[candidates[i]]) else None,
+                "brand": self.brands[candidates[i]],
+                "tweet": self.tweets[candidates[i]],
+            }
+            for i in order
+        ]
+
+
+def load_search_index(index_dir: Optional[str] = None) -> SearchIndex:
+    """
+    Return the in-memory index, reloading it only when the manifest changed on disk.
+    """
+    global _loaded_index
+    index_dir = get_index_dir(index_dir)
+    manifest_path = os.path.join(index_dir, MANIFEST_NAME)
+    mtime = os.path.getmtime(manifest_path) if os.path.exists(manifest_path) else None
+
+    with _index_lock:
+        if _loaded_index is None or _loaded_index[0] != (index_dir, mtime):
+            _loaded_index = ((index_dir, mtime), SearchIndex(index_dir))
+        return _loaded_index[1]
+
+
+def search_tweets(query: str, k: int = 10, brands: Optional[list] = None,
+                  start_date=None, end_date=None, index_dir: Optional[str] = None) -> list:
+    """
+    Clean the query the same way tweets are cleaned and return the top-k tweets by BM25.
+
+    Args:
+        query (str): Free-text search phrase.
+        k (int): Number of results to return.
+        brands (list): Only return tweets for these brands.
+        start_date, end_date: Optional inclusive date bounds.
+
+    Returns:
+        list: Ranked result dicts.
+    """
+    from .tweets_cleaner import process_tweets_column
+
+    cleaned = process_tweets_column(pd.DataFrame({"query": [query]}), "query")["query"].iloc[0]
+    if brands:
+        # Cleaned like the tweets, to match brand mentions in untagged tweets
+        brands = list(brands) + process_tweets_column(pd.DataFrame({"brand": brands}), "brand")["brand"].tolist()
+    return load_search_index(index_dir).search(cleaned.split(), k=k, brands=brands,
+                                               start_date=start_date, end_date=end_date)
@@ -3,6 +3,11 @@ from textblob import TextBlob
 from spacy.matcher import Matcher
 import pandas as pd
 import logging
+from typing import Callable, Optional
+from .fuzzy_matcher import BrandDeletionIndex
+from .tweets_cleaner import PROGRESS_EVERY
+from ..metrics import instrument_stage
+from ..profiling import profile_stage
 
 logger = logging.getLogger(__name__)
 nlp = spacy.load("en_core_web_sm")
@@ -39,7 +44,10 @@ def analyze_sentiment(tweet: str) -> float:
     analysis = TextBlob(tweet)
     return analysis.sentiment.polarity
 
-def process_tweets(data: pd.DataFrame, brands: list):
+@instrument_stage("process_tweets")
+@profile_stage("process_tweets")
+def process_tweets(data: pd.DataFrame, brands: list, fuzzy: bool = False,
+                   progress: Optional[Callable[[int, int], None]] = None):
     """
     Process tweets for brand mentions and sentiment.
     This function appends new columns 'brand' and 'sentiment' to the original DataFrame,
@@ -49,6 +57,8 @@ def process_tweets(data: pd.DataFrame, brands: list):
     Args:
         data (pd.DataFrame): DataFrame with a 'tweets' column.
         brands (list): List of brands to track.
+        fuzzy (bool): Also match misspelled brand mentions when the exact matcher finds none.
+        progress (callable): Called as progress(tweets_done, total_tweets) while tweets are matched.
 
     Returns:
         pd.DataFrame: Original DataFrame updated with 'brand' and 'sentiment' columns,
@@ -58,6 +68,7 @@ def process_tweets(data: pd.DataFrame, brands: list):
         raise TypeError("Input must be a pandas DataFrame")
 
     matcher = create_matcher(brands)
+    deletion_index = BrandDeletionIndex(brands) if fuzzy else None
     tweets = data['tweets'].tolist()
 
     # Prepare lists to store results
@@ -68,13 +79,15 @@ def process_tweets(data: pd.DataFrame, brands: list):
     for tweet, doc in zip(tweets, nlp.pipe(tweets, disable=["ner", "parser"])):
         try:
             matches = matcher(doc)
+            brand = None
             if matches:
                 # Get the first matched brand
                 brand = nlp.vocab.strings[matches[0][0]]
-                sentiment = analyze_sentiment(tweet)
-            else:
-                brand = None
-                sentiment = None
+            elif deletion_index is not None:
+                fuzzy_matches = deletion_index.find_mentions(tweet)
+                brand = fuzzy_matches[0] if fuzzy_matches else None
+
+            sentiment = analyze_sentiment(tweet) if brand is not None else None
         except Exception as e:
             logger.error(f"Error processing tweet: {e}")
             brand = None
@@ -82,6 +95,11 @@ def process_tweets(data: pd.DataFrame, brands: list):
 
         brand_list.append(brand)
         sentiment_list.append(sentiment)
+        if progress is not None and len(brand_list) % PROGRESS_EVERY == 0:
+            progress(len(brand_list), len(tweets))
+
+    if progress is not None:
+        progress(len(tweets), len(tweets))
 
     # Append the results as new columns in the original DataFrame
     data['brand'] = brand_list
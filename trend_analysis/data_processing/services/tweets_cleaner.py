@@ -1,11 +1,20 @@
 import re
 import pandas as pd
 import spacy
+from typing import Callable, Optional
+from ..metrics import instrument_stage
+from ..profiling import profile_stage
 
 # Load the spaCy language model once
 nlp = spacy.load("en_core_web_sm")
 
-def process_tweets_column(df: pd.DataFrame, column_name: str) -> pd.DataFrame:
+# Rows between progress reports
+PROGRESS_EVERY = 1000
+
+@instrument_stage("process_tweets_column")
+@profile_stage("process_tweets_column")
+def process_tweets_column(df: pd.DataFrame, column_name: str,
+                          progress: Optional[Callable[[int, int], None]] = None) -> pd.DataFrame:
     """
     Clean, tokenize, and remove stopwords from a specified column in a DataFrame.
     This version is optimized by batch processing texts with spaCy and precompiling regex patterns.
@@ -13,6 +22,7 @@ def process_tweets_column(df: pd.DataFrame, column_name: str) -> pd.DataFrame:
     Args:
         df (pd.DataFrame): The input DataFrame.
         column_name (str): The name of the column to process.
+        progress (callable): Called as progress(rows_done, total_rows) while texts are processed.
     
     Returns:
         pd.DataFrame: The DataFrame with the processed tweets column.
@@ -29,11 +39,16 @@ def process_tweets_column(df: pd.DataFrame, column_name: str) -> pd.DataFrame:
         lambda text: special_char_pattern.sub('', url_mention_pattern.sub('', text)).lower()
     ).tolist()
     
-    # Process texts in batch; disable parser and ner for faster performance
-    docs = list(nlp.pipe(cleaned_texts, disable=["parser", "ner"]))
-    
+    # Process texts in batch; disable parser and ner for faster performance.
     # Lemmatize tokens and remove stopwords using spaCy's built-in is_stop attribute
-    processed_texts = [' '.join(token.lemma_ for token in doc if not token.is_stop) for doc in docs]
+    total = len(cleaned_texts)
+    processed_texts = []
+    for doc in nlp.pipe(cleaned_texts, disable=["parser", "ner"]):
+        processed_texts.append(' '.join(token.lemma_ for token in doc if not token.is_stop))
+        if progress is not None and len(processed_texts) % PROGRESS_EVERY == 0:
+            progress(len(processed_texts), total)
+    if progress is not None:
+        progress(total, total)
     
     df[column_name] = processed_texts
     return df
@@ -1,3 +1,893 @@
-from django.test import TestCase
+import os
+import json
+import sys
+import types
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient
+from . import concurrency, data_api, metrics, pipeline, tracing
+from .concurrency import SingleFlight, StageBusy, StageLimiter
+from .forecast_worker import fit_prophet_forecast
+from .jobs import Job, JobCancelled, JobRunner, job_events, CANCELLED, DONE
+from .data_api import DataTable, DataQueryError, read_table, page, encode_cursor
+from .pipeline import result_cache, run_process_stage, run_engagement_stage
+from .process_pool import StageProcessPool
+from .views import encode_job_event
+from .raw_dataset import RawDataset
+from .result_cache import ResultCache, make_key
+from .services import forecast
+from .services.backtest import summarize_backtest
+from .services.fast_forecast import ridge_forecast
+from .services.forecast_store import FORECAST_OUTPUT_COLUMNS, compact_forecast, save_forecast, load_forecast
+from .services.forecast import forecast_trends
+from .services.fuzzy_matcher import DEFAULT_IGNORED_TOKENS, BrandDeletionIndex
+from .services.engagement_model import ENGAGEMENT_FEATURES
+from .services.online_scaling import OnlineEngagementScorer, QuantileSketch
+from .services.search_engine import build_inverted_index
+from .services.search_index import SearchIndex, update_search_index
 
-# Create your tests here.
+
+class DataTableTestCase(SimpleTestCase):
+    """
+    A small scores table served as /api/data/test_scores/.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "scores.parquet")
+        pd.DataFrame({
+            "date": pd.date_range("2024-01-01", periods=10, freq="D"),
+            "brand": ["nike", "apple"] * 5,
+            "engagement_score": range(10),
+        }).to_parquet(self.path, index=False)
+        patcher = mock.patch.dict(data_api.DATA_TABLES, {"test_scores": DataTable(self.path, "date", None)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+
+class DataApiTests(DataTableTestCase):
+    def test_cursor_pages_cover_table_once(self):
+        table, version = read_table("test_scores")
+        rows, cursor = [], None
+        while True:
+            chunk, cursor = page(table, version, cursor, 3)
+            rows.extend(chunk.column("engagement_score").to_pylist())
+            if cursor is None:
+                break
+        self.assertEqual(rows, list(range(10)))
+
+    def test_cursor_of_older_version_is_conflict(self):
+        table, version = read_table("test_scores")
+        with self.assertRaises(DataQueryError) as raised:
+            page(table, version, encode_cursor("older-version", 3), 3)
+        self.assertEqual(raised.exception.status, 409)
+
+    def test_invalid_cursor_is_rejected(self):
+        table, version = read_table("test_scores")
+        with self.assertRaises(DataQueryError) as raised:
+            page(table, version, "not-a-cursor", 3)
+        self.assertEqual(raised.exception.status, 400)
+
+    def test_filters(self):
+        table, _ = read_table("test_scores", columns=["brand"], brands=["nike"], start_date="2024-01-03", end_date="2024-01-05")
+        self.assertEqual(table.column_names, ["brand"])
+        self.assertEqual(table.column("brand").to_pylist(), ["nike", "nike"])
+
+    def test_queries_do_not_use_stage_cache(self):
+        before = result_cache.stats()["entries"]
+        for day in range(1, 60):
+            read_table("test_scores", start_date=f"2024-01-{day % 28 + 1:02d}", brands=[f"brand{day}"])
+        self.assertEqual(result_cache.stats()["entries"], before)
+        self.assertLessEqual(data_api.query_cache.stats()["entries"], data_api.query_cache.max_entries)
+
+
+class DataViewCacheTests(DataTableTestCase):
+    def get(self, url, **headers):
+        return APIClient().get(url, {"format": "json"}, headers=headers)
+
+    def test_matching_if_none_match_is_not_modified(self):
+        for url in ("/api/data/test_scores/", "/api/data/test_scores/brands/"):
+            response = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+            cached = self.get(url, **{"If-None-Match": etag})
+            self.assertEqual(cached.status_code, 304, url)
+            self.assertEqual(cached.content, b"")
+            self.assertEqual(cached["ETag"], etag)
+
+    def test_etag_changes_with_the_data(self):
+        etag = self.get("/api/data/test_scores/")["ETag"]
+        pd.DataFrame({"date": pd.date_range("2024-02-01", periods=3, freq="D"), "brand": "nike",
+                      "engagement_score": range(3)}).to_parquet(self.path, index=False)
+        response = self.get("/api/data/test_scores/", **{"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(json.loads(response.content)), 3)
+
+    def test_etag_depends_on_the_query(self):
+        self.assertNotEqual(self.get("/api/data/test_scores/")["ETag"],
+                            APIClient().get("/api/data/test_scores/", {"format": "json", "brands": "nike"})["ETag"])
+
+
+class ResultCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used_entry(self):
+        cache = ResultCache(max_entries=2)
+        cache.put(make_key("v1", "a"), 1)
+        cache.put(make_key("v1", "b"), 2)
+        cache.get(make_key("v1", "a"))
+        cache.put(make_key("v1", "c"), 3)
+        self.assertIsNone(cache.get(make_key("v1", "b")))
+        self.assertEqual(cache.get(make_key("v1", "a")), 1)
+
+    def test_evicts_by_bytes(self):
+        frame = pd.DataFrame({"x": range(1000)})
+        cache = ResultCache(max_entries=10, max_bytes=int(frame.memory_usage(index=True).sum() * 1.5))
+        cache.put(make_key("v1", "a"), frame)
+        cache.put(make_key("v1", "b"), frame.copy())
+        self.assertIsNone(cache.get(make_key("v1", "a")))
+        self.assertEqual(cache.stats()["entries"], 1)
+
+    def test_get_or_compute_computes_once(self):
+        cache = ResultCache()
+        calls = []
+        compute = lambda: calls.append(1) or "value"
+        self.assertEqual(cache.get_or_compute(make_key("v1", "a"), compute), "value")
+        self.assertEqual(cache.get_or_compute(make_key("v1", "a"), compute), "value")
+        self.assertEqual(len(calls), 1)
+
+
+class StageDependencyTests(SimpleTestCase):
+    """
+    Later stages recompute what an earlier stage produced when it is no longer cached.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        raw_path = os.path.join(self.tmp, "raw.parquet")
+        pd.DataFrame({
+            "date": pd.date_range("2024-01-01", periods=4, freq="D"),
+            "tweets": ["nike run", "apple phone", "nike shoe", "other"],
+        }).to_parquet(raw_path, index=False)
+        self.processed_calls = 0
+
+        def fake_process_tweets(df, brands, fuzzy=False, progress=None):
+            self.processed_calls += 1
+            df = df.copy()
+            df["brand"] = df["tweets"].str.split().str[0]
+            return df[df["brand"].isin(brands)]
+
+        self.cache = ResultCache(max_entries=8)
+        patches = [
+            mock.patch.object(pipeline, "raw_dataset", RawDataset(raw_path, loader=pd.read_parquet)),
+            mock.patch.object(pipeline, "result_cache", self.cache),
+            mock.patch.object(pipeline, "process_pool", StageProcessPool(0)),
+            mock.patch.object(pipeline, "process_tweets_column", lambda df, column, progress=None: df),
+            mock.patch.object(pipeline, "process_tweets", fake_process_tweets),
+            mock.patch.object(pipeline, "update_search_index", lambda df, column, dataset_version=None: len(df)),
+            mock.patch.object(pipeline, "get_or_train_engagement_model", lambda df, retrain=False: ({"version": "m1"}, False)),
+            mock.patch.object(pipeline, "calculate_engagement_score", lambda df, model: df.assign(engagement_score=1.0)),
+            mock.patch.object(pipeline, "COUNT_PATH", os.path.join(self.tmp, "count.parquet")),
+            mock.patch.object(pipeline, "ENGAGEMENT_SCORE_PATH", os.path.join(self.tmp, "scores.parquet")),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_engagement_after_eviction_recomputes_processed_tweets(self):
+        run_process_stage(["nike"])
+        self.cache.invalidate()
+        scores = run_engagement_stage(["nike"])
+        self.assertEqual(scores["brand"].tolist(), ["nike", "nike"])
+        self.assertEqual(self.processed_calls, 2)
+
+    def test_engagement_reuses_cached_processed_tweets(self):
+        run_process_stage(["nike"])
+        run_engagement_stage(["nike"])
+        self.assertEqual(self.processed_calls, 1)
+
+    def test_engagement_without_brands_is_client_error(self):
+        with self.assertRaises(pipeline.PipelineError):
+            run_engagement_stage([])
+
+
+class SearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_dir)
+        self.corpus = pd.DataFrame({
+            "date": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03"]),
+            "tweets": ["love nike shoe", "apple phone great", "nike run shoe"],
+        })
+
+    def test_corpus_indexed_once_per_dataset_version(self):
+        self.assertEqual(update_search_index(self.corpus, "tweets", self.index_dir, dataset_version="v1"), 3)
+        self.assertEqual(update_search_index(self.corpus, "tweets", self.index_dir, dataset_version="v1"), 0)
+        self.assertEqual(update_search_index(self.corpus.iloc[:1], "tweets", self.index_dir, dataset_version="v2"), 1)
+        self.assertEqual(SearchIndex(self.index_dir).doc_count, 1)
+
+    def test_same_text_under_different_brands_is_kept(self):
+        tagged = pd.DataFrame({"date": ["2024-01-01"] * 2, "brand": ["nike", "adidas"], "tweets": ["shoe sale"] * 2})
+        self.assertEqual(update_search_index(tagged, "tweets", self.index_dir), 2)
+
+    def test_brand_filter_matches_untagged_mentions(self):
+        update_search_index(self.corpus, "tweets", self.index_dir, dataset_version="v1")
+        results = SearchIndex(self.index_dir).search(["shoe", "phone"], k=10, brands=["nike"])
+        self.assertEqual(sorted(result["tweet"] for result in results), ["love nike shoe", "nike run shoe"])
+
+    def test_top_k(self):
+        update_search_index(self.corpus, "tweets", self.index_dir, dataset_version="v1")
+        results = SearchIndex(self.index_dir).search(["shoe"], k=1)
+        self.assertEqual(len(results), 1)
+
+
+class SearchViewTests(SimpleTestCase):
+    def test_k_out_of_range_is_rejected(self):
+        client = APIClient()
+        for k in ("0", "-3", "x", "1.5", str(10 ** 6)):
+            response = client.get("/api/search_tweets/", {"q": "nike", "k": k})
+            self.assertEqual(response.status_code, 400, k)
+
+
+class ProcessDataViewTests(SimpleTestCase):
+    def test_empty_brands_are_rejected(self):
+        client = APIClient()
+        with mock.patch("data_processing.views.run_process_stage") as run_stage:
+            for data in ({}, {"brands": []}):
+                response = client.post("/api/process_data/", data, format="json")
+                self.assertEqual(response.status_code, 400, data)
+        run_stage.assert_not_called()
+
+
+class FakeProphet:
+    """
+    Stands in for Prophet: its optimizer rejects initial values whose 'delta' does not have
+    one value per changepoint, like Stan does.
+    """
+    def __init__(self, n_changepoints=3, **config):
+        self.n_changepoints = n_changepoints
+        self.mcmc_samples = 0
+        self.fitted_with_init = False
+
+    def fit(self, df, init=None):
+        if init is not None:
+            if len(init["delta"]) != self.n_changepoints:
+                raise RuntimeError("mismatch in dimension declared and found in context; delta")
+            self.fitted_with_init = True
+        self.params = {"k": [[0.1]], "m": [[0.2]], "sigma_obs": [[0.3]],
+                       "delta": [[0.0] * self.n_changepoints], "beta": [[0.0]]}
+        return self
+
+    def make_future_dataframe(self, periods):
+        return pd.DataFrame({"ds": pd.date_range("2024-01-01", periods=periods)})
+
+    def predict(self, future):
+        return future.assign(yhat=1.0)
+
+
+class WarmStartTests(SimpleTestCase):
+    def setUp(self):
+        prophet = types.ModuleType("prophet")
+        prophet.Prophet = FakeProphet
+        serialize = types.ModuleType("prophet.serialize")
+        serialize.model_from_json = lambda text: FakeProphet(n_changepoints=int(text)).fit(None)
+        patcher = mock.patch.dict(sys.modules, {"prophet": prophet, "prophet.serialize": serialize})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.brand_data = pd.DataFrame({"ds": pd.date_range("2024-01-01", periods=10), "y": 1.0})
+
+    def test_warm_start_used_when_parameters_fit(self):
+        _, model = fit_prophet_forecast(self.brand_data, 5, {"n_changepoints": 3}, init_model_json="3")
+        self.assertTrue(model.fitted_with_init)
+
+    def test_changed_changepoint_count_falls_back_to_cold_fit(self):
+        forecast, model = fit_prophet_forecast(self.brand_data, 5, {"n_changepoints": 3}, init_model_json="2")
+        self.assertFalse(model.fitted_with_init)
+        self.assertEqual(len(forecast), 5)
+
+
+class MetricsTests(SimpleTestCase):
+    def test_stage_samples_are_rendered(self):
+        @metrics.instrument_stage("test_stage")
+        def stage(df):
+            return df.head(2)
+
+        stage(pd.DataFrame({"x": range(5)}))
+        text = metrics.render()
+        self.assertIn('trend_stage_calls_total{stage="test_stage",outcome="ok"} 1.0', text)
+        self.assertIn('trend_stage_rows_in_total{stage="test_stage"} 5.0', text)
+        self.assertIn('trend_stage_rows_out_total{stage="test_stage"} 2.0', text)
+        self.assertIn('trend_stage_duration_seconds_count{stage="test_stage"} 1', text)
+        self.assertIn('trend_stage_duration_seconds_bucket{stage="test_stage",le="+Inf"} 1', text)
+
+    def test_rss_growth_is_what_the_call_added_to_the_peak(self):
+        with metrics.capture() as samples, mock.patch.object(metrics, "peak_rss_bytes", side_effect=[1000, 1500]):
+            metrics.instrument_stage("test_rss")(lambda: None)()
+        self.assertEqual(samples[0].rss_growth, 500)
+
+    def test_merged_chunk_samples(self):
+        samples = [metrics.StageSample("clean", 0.5, 3, 3, 100, True), metrics.StageSample("clean", 0.7, 2, 1, 300, False),
+                   metrics.StageSample("match", 0.1, None, 4, 0, True)]
+        self.assertEqual(metrics.merge_samples(samples, 0.9), [metrics.StageSample("clean", 0.9, 5, 4, 300, False),
+                                                                metrics.StageSample("match", 0.9, None, 4, 0, True)])
+
+    def test_label_values_are_escaped(self):
+        gauge = metrics.Gauge("test_escaped", "Escaping.", ["brand"])
+        self.addCleanup(metrics.REGISTRY.remove, gauge)
+        gauge.set(1, brand='a"b\\c')
+        self.assertIn('test_escaped{brand="a\\"b\\\\c"} 1.0', gauge.render())
+
+
+def watch_joins(test):
+    """
+    Event set when a caller joins an in-flight computation, to start the computation's
+    leader only once its follower waits for it.
+    """
+    joined = threading.Event()
+    info = concurrency.logger.info
+
+    def log(message, *args, **kwargs):
+        if message.startswith("Joining"):
+            joined.set()
+        info(message, *args, **kwargs)
+
+    patcher = mock.patch.object(concurrency.logger, "info", log)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    return joined
+
+
+class SingleFlightTests(SimpleTestCase):
+    def _join_leader(self, leader_fn, follower_fn):
+        """
+        Run leader_fn under key "k" and, while it runs, follower_fn under the same key.
+        Returns (leader outcome, follower outcome), each a result or an exception.
+        """
+        flight = SingleFlight()
+        joined, started = watch_joins(self), threading.Event()
+        outcomes = {}
+
+        def leader():
+            started.set()
+            joined.wait(5)
+            return leader_fn()
+
+        def run(name, fn):
+            try:
+                outcomes[name] = flight.do("k", fn)
+            except Exception as e:
+                outcomes[name] = e
+
+        threads = [threading.Thread(target=run, args=("leader", leader))]
+        threads[0].start()
+        started.wait(5)
+        threads.append(threading.Thread(target=run, args=("follower", follower_fn)))
+        threads[1].start()
+        for thread in threads:
+            thread.join(5)
+        return outcomes["leader"], outcomes["follower"]
+
+    def test_followers_share_the_leaders_result(self):
+        calls = []
+        leader, follower = self._join_leader(lambda: calls.append("leader") or 1,
+                                             lambda: calls.append("follower") or 2)
+        self.assertEqual((leader, follower), (1, 1))
+        self.assertEqual(calls, ["leader"])
+
+    def test_followers_share_the_leaders_error(self):
+        def fail():
+            raise ValueError("bad input")
+        leader, follower = self._join_leader(fail, lambda: 2)
+        self.assertIsInstance(leader, ValueError)
+        self.assertIs(follower, leader)
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        def cancelled():
+            raise JobCancelled()
+        leader, follower = self._join_leader(cancelled, lambda: 2)
+        self.assertIsInstance(leader, JobCancelled)
+        self.assertEqual(follower, 2)
+
+
+class JobTests(SimpleTestCase):
+    def test_stages_run_in_order(self):
+        job = Job("test", [("one", lambda job: 1), ("two", lambda job: 2)])
+        job.run()
+        self.assertEqual(job.status, DONE)
+        self.assertEqual([stage["result"] for stage in job.stages], [1, 2])
+
+    def test_cancel_at_progress_report_skips_later_stages(self):
+        def first(job):
+            job.cancel()
+            job.report_progress(0.5)
+
+        job = Job("test", [("one", first), ("two", lambda job: 2)])
+        job.run()
+        self.assertEqual(job.status, CANCELLED)
+        self.assertEqual([stage["status"] for stage in job.stages], [CANCELLED, CANCELLED])
+
+    def test_cancelled_job_does_not_fail_a_shared_computation(self):
+        cache = ResultCache()
+        key = make_key("v1", "processed", ["nike"])
+        joined, started = watch_joins(self), threading.Event()
+
+        def cancelled_stage(job):
+            def compute():
+                started.set()
+                joined.wait(5)
+                job.cancel()
+                job.report_progress(0.5)
+                return "from cancelled job"
+            return cache.get_or_compute(key, compute)
+
+        cancelled = Job("cancelled", [("process", cancelled_stage)])
+        other = Job("other", [("process", lambda job: cache.get_or_compute(key, lambda: "from other job"))])
+        threads = [threading.Thread(target=cancelled.run)]
+        threads[0].start()
+        started.wait(5)
+        threads.append(threading.Thread(target=other.run))
+        threads[1].start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(cancelled.status, CANCELLED)
+        self.assertEqual(other.status, DONE)
+        self.assertEqual(other.stages[0]["result"], "from other job")
+
+
+class TracingTests(SimpleTestCase):
+    def test_parse_traceparent(self):
+        context = tracing.parse_traceparent("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+        self.assertEqual(context, tracing.SpanContext("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331"))
+        self.assertEqual(tracing.parse_traceparent(" 00-0AF7651916CD43DD8448EB211C80319C-B7AD6B7169203331-01 "), context)
+
+    def test_parse_traceparent_rejects_invalid_and_unsampled(self):
+        for header in (None, "", "garbage", "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331",
+                       "00-0af7651916cd43dd8448eb211c8031-b7ad6b7169203331-01",
+                       "00-zzf7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01",
+                       "00-00000000000000000000000000000000-b7ad6b7169203331-01",
+                       "00-0af7651916cd43dd8448eb211c80319c-0000000000000000-01",
+                       "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00"):
+            self.assertIsNone(tracing.parse_traceparent(header), header)
+
+    def test_format_round_trips(self):
+        context = tracing.SpanContext("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331")
+        self.assertEqual(tracing.parse_traceparent(tracing.format_traceparent(context)), context)
+
+    def test_spans_are_children_of_the_current_span(self):
+        with tracing.capture(tracing.new_trace()) as spans:
+            with tracing.span("outer"):
+                with tracing.span("inner"):
+                    pass
+        inner, outer = spans
+        self.assertEqual(inner["parent_id"], outer["span_id"])
+        self.assertIsNone(outer["parent_id"])
+
+    def test_untraced_work_is_not_recorded(self):
+        with mock.patch.object(tracing, "export") as export:
+            with tracing.span("stage") as attributes:
+                attributes["rows"] = 1
+        export.assert_not_called()
+
+    def test_trace_file_is_rotated_at_its_size_limit(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, "traces.jsonl")
+        with self.settings(TRACE_FILE=path, TRACE_FILE_MAX_BYTES=100):
+            for index in range(3):
+                tracing.export({"name": f"span{index}", "attributes": {"padding": "x" * 80}})
+        with open(path) as f:
+            self.assertIn("span2", f.read())
+        with open(path + ".1") as f:
+            self.assertIn("span1", f.read())
+
+    def test_unwritable_trace_file_does_not_raise(self):
+        with self.settings(TRACE_FILE=os.path.join(os.devnull, "traces.jsonl")), self.assertLogs(tracing.logger, "WARNING"):
+            tracing.export({"name": "span"})
+
+
+class RawDatasetTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.path = os.path.join(self.tmp, "raw.parquet")
+        pd.DataFrame({"tweets": ["a"]}).to_parquet(self.path, index=False)
+
+    def test_requests_use_current_snapshot_while_new_version_loads(self):
+        loading, release = threading.Event(), threading.Event()
+        loads = []
+
+        def slow_loader(path):
+            loads.append(path)
+            if len(loads) > 1:
+                loading.set()
+                release.wait(5)
+            return pd.read_parquet(path)
+
+        dataset = RawDataset(self.path, check_interval=0, loader=slow_loader)
+        first = dataset.get()
+        pd.DataFrame({"tweets": ["a", "b"]}).to_parquet(self.path, index=False)
+        loader_thread = threading.Thread(target=dataset.get)
+        loader_thread.start()
+        self.assertTrue(loading.wait(5))
+
+        self.assertIs(dataset.get(), first)
+        release.set()
+        loader_thread.join(5)
+        self.assertEqual(len(dataset.get().data), 2)
+
+    def test_first_load_waits_for_the_data(self):
+        dataset = RawDataset(self.path, loader=pd.read_parquet)
+        self.assertEqual(len(dataset.get().data), 1)
+
+
+class ForecastStatusTests(SimpleTestCase):
+    def test_requested_brands_without_trends_are_no_data(self):
+        trends = pd.DataFrame({"brand": "nike", "ds": pd.date_range("2024-01-01", periods=20), "y": range(20)})
+        forecast = forecast_trends(trends, 5, workers=1, use_cache=False, engine="ridge", brands=["nike", "ghost"])
+        status = forecast.attrs["brand_status"]
+        self.assertEqual(status["nike"]["status"], "ok")
+        self.assertEqual(status["ghost"], {"status": "no_data"})
+        self.assertEqual(set(forecast["brand"]), {"nike"})
+
+    def test_no_trends_at_all(self):
+        trends = pd.DataFrame({"brand": pd.Series(dtype=str), "ds": pd.Series(dtype="datetime64[ns]"), "y": pd.Series(dtype=float)})
+        forecast = forecast_trends(trends, 5, workers=1, use_cache=False, engine="ridge", brands=["ghost"])
+        self.assertTrue(forecast.empty)
+        self.assertEqual(forecast.attrs["brand_status"], {"ghost": {"status": "no_data"}})
+
+
+class ConcurrentJobTests(SimpleTestCase):
+    def test_jobs_queue_for_a_busy_stage_instead_of_failing(self):
+        cache = ResultCache(limiter=StageLimiter({"processed": 1}, wait=0.01))
+
+        def process(brand):
+            def stage(job):
+                return cache.get_or_compute(make_key("v1", "processed", [brand]), lambda: time.sleep(0.2) or brand)
+            return stage
+
+        runner = JobRunner(max_workers=2)
+        jobs = [runner.submit(Job("pipeline", [("process_data", process(brand))])) for brand in ("nike", "apple")]
+        for job in jobs:
+            for _ in job_events(job, heartbeat=5):
+                pass
+        self.assertEqual([job.status for job in jobs], [DONE, DONE])
+        self.assertEqual([job.stages[0]["result"] for job in jobs], ["nike", "apple"])
+
+    def test_requests_still_get_stage_busy(self):
+        limiter = StageLimiter({"processed": 1}, wait=0.01)
+        with limiter.slot("processed"):
+            with self.assertRaises(StageBusy):
+                with limiter.slot("processed"):
+                    pass
+
+
+class ForecastPoolTests(SimpleTestCase):
+    def setUp(self):
+        context = mock.Mock()
+        context.Pool.side_effect = lambda processes, initializer: mock.Mock(_pool=[])
+        patchers = [mock.patch.object(forecast.multiprocessing, "get_context", return_value=context),
+                    mock.patch.dict(forecast._pools, clear=True)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_pool_is_shared_and_kept_between_calls(self):
+        with forecast.forecast_pool(2) as first:
+            with forecast.forecast_pool(2) as second:
+                self.assertIs(first, second)
+        with forecast.forecast_pool(2) as third:
+            self.assertIs(third, first)
+        first.pool.terminate.assert_not_called()
+
+    def test_other_worker_count_does_not_replace_a_pool_in_use(self):
+        with forecast.forecast_pool(2) as first:
+            with forecast.forecast_pool(3) as other:
+                self.assertIsNot(other, first)
+            first.pool.terminate.assert_not_called()
+
+    def test_retired_pool_is_terminated_after_its_last_user(self):
+        with forecast.forecast_pool(2) as shared:
+            with forecast.forecast_pool(2):
+                forecast.retire_forecast_pool(shared)
+                with forecast.forecast_pool(2) as fresh:
+                    self.assertIsNot(fresh, shared)
+            shared.pool.terminate.assert_not_called()
+        shared.pool.terminate.assert_called_once()
+        fresh.pool.terminate.assert_not_called()
+
+
+def slow_first_chunk(chunk, log_path=None, progress=None):
+    """
+    map_frame task for the tests: the first chunk finishes last. Logs each chunk it runs.
+    """
+    if log_path is not None:
+        with open(log_path, "a") as f:
+            f.write(f"{chunk.index[0]}\n")
+    time.sleep(0.2 if chunk.index[0] == 0 else 0.02)
+    return chunk.assign(doubled=chunk["x"] * 2)
+
+
+@metrics.instrument_stage("test_chunked")
+def instrumented_chunk(chunk, progress=None):
+    return chunk.head(1)
+
+
+class StageProcessPoolTests(SimpleTestCase):
+    def setUp(self):
+        # Forked, so the workers share this module (and the test stubs) with the test process
+        self.pool = StageProcessPool(2, "fork")
+        self.addCleanup(self.pool.shutdown)
+        self.df = pd.DataFrame({"x": range(10)})
+
+    def test_results_keep_input_order_across_chunks(self):
+        progress = []
+        result = self.pool.map_frame(slow_first_chunk, self.df, chunk_rows=3,
+                                     progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(result["doubled"].tolist(), [x * 2 for x in range(10)])
+        self.assertEqual(progress[-1], (10, 10))
+        self.assertNotIn("doubled", self.df.columns)
+
+    def test_error_cancels_chunks_not_started(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        log_path = os.path.join(tmp, "chunks.log")
+        pool = StageProcessPool(1, "fork")
+
+        def cancel(done, total):
+            raise JobCancelled()
+
+        with self.assertRaises(JobCancelled):
+            pool.map_frame(slow_first_chunk, pd.DataFrame({"x": range(40)}), chunk_rows=2, progress=cancel, log_path=log_path)
+        pool.shutdown()
+        time.sleep(1)
+        # Of 20 chunks, only those already handed to the worker process still run
+        with open(log_path) as f:
+            self.assertLessEqual(len(f.read().split()), 5)
+
+    def test_chunks_record_one_stage_call(self):
+        self.pool.map_frame(instrumented_chunk, self.df, chunk_rows=3)
+        text = metrics.render()
+        self.assertIn('trend_stage_calls_total{stage="test_chunked",outcome="ok"} 1.0', text)
+        self.assertIn('trend_stage_rows_in_total{stage="test_chunked"} 10.0', text)
+        self.assertIn('trend_stage_rows_out_total{stage="test_chunked"} 4.0', text)
+
+    def test_no_workers_runs_inline_on_the_whole_frame(self):
+        pool = StageProcessPool(0)
+        calls = []
+
+        def fn(df, progress=None):
+            calls.append((len(df), progress))
+            df["x"] = 0
+            return df
+
+        report = lambda done, total: None
+        result = pool.map_frame(fn, self.df, chunk_rows=3, progress=report)
+        self.assertEqual(calls, [(10, report)])
+        self.assertEqual(result["x"].tolist(), [0] * 10)
+        self.assertEqual(self.df["x"].tolist(), list(range(10)))
+
+
+class JobEventEncodingTests(SimpleTestCase):
+    snapshot = {"job_id": "abc", "revision": 3, "status": "running"}
+
+    def test_sse(self):
+        self.assertEqual(encode_job_event(self.snapshot, "sse"),
+                         b'id: 3\nevent: job\ndata: {"job_id": "abc", "revision": 3, "status": "running"}\n\n')
+
+    def test_ndjson(self):
+        self.assertEqual(encode_job_event(self.snapshot, "ndjson"),
+                         b'{"job_id": "abc", "revision": 3, "status": "running"}\n')
+
+    def test_keep_alive(self):
+        self.assertEqual(encode_job_event(None, "sse"), b": keep-alive\n\n")
+        self.assertEqual(encode_job_event(None, "ndjson"), b"\n")
+
+
+class RidgeForecastTests(SimpleTestCase):
+    columns = ["ds", "yhat", "yhat_lower", "yhat_upper", "trend", "brand", "type"]
+
+    def setUp(self):
+        ds = pd.date_range("2024-01-01", periods=70, freq="D")
+        t = np.arange(70)
+        self.trends = pd.concat([
+            pd.DataFrame({"brand": "nike", "ds": ds, "y": 10 + 0.5 * t + 3.0 * (ds.dayofweek == 5)}),
+            pd.DataFrame({"brand": "apple", "ds": ds, "y": 50 - 0.2 * t + np.sin(t)}),
+        ], ignore_index=True)
+
+    def test_schema_and_rows(self):
+        forecast = ridge_forecast(self.trends, 14)
+        self.assertEqual(list(forecast.columns), self.columns)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(forecast["ds"]))
+        for brand in ("nike", "apple"):
+            rows = forecast[forecast["brand"] == brand]
+            self.assertEqual((rows["type"] == "actual").sum(), 70)
+            self.assertEqual((rows["type"] == "forecasted").sum(), 14)
+            self.assertEqual(rows["ds"].max(), pd.Timestamp("2024-03-10") + pd.Timedelta(days=14))
+
+    def test_recovers_trend_and_weekly_pattern(self):
+        # Without the penalty's shrinkage the calendar features reproduce the series exactly
+        forecast = ridge_forecast(self.trends, 14, alpha=1e-9)
+        future = forecast[(forecast["brand"] == "nike") & (forecast["type"] == "forecasted")]
+        t = (future["ds"] - pd.Timestamp("2024-01-01")).dt.days
+        expected = 10 + 0.5 * t + 3.0 * (future["ds"].dt.dayofweek == 5)
+        np.testing.assert_allclose(future["yhat"], expected, atol=1e-6)
+
+    def test_interval_contains_prediction(self):
+        forecast = ridge_forecast(self.trends, 14)
+        self.assertTrue((forecast["yhat_lower"] <= forecast["yhat"]).all())
+        self.assertTrue((forecast["yhat"] <= forecast["yhat_upper"]).all())
+        self.assertTrue((forecast["yhat_upper"] > forecast["yhat_lower"]).all())
+
+    def test_single_observation_gives_flat_forecast(self):
+        trends = pd.DataFrame({"brand": ["nike"], "ds": [pd.Timestamp("2024-01-03")], "y": [7.0]})
+        forecast = ridge_forecast(trends, 10)
+        np.testing.assert_allclose(forecast["yhat"], 7.0)
+        np.testing.assert_allclose(forecast["yhat_lower"], forecast["yhat_upper"])
+
+    def test_empty_input(self):
+        forecast = ridge_forecast(pd.DataFrame(columns=["brand", "ds", "y"]), 10)
+        self.assertTrue(forecast.empty)
+        self.assertEqual(list(forecast.columns), self.columns)
+
+
+class BacktestMetricsTests(SimpleTestCase):
+    timings = pd.DataFrame([{"engine": "ridge", "config": "c", "fit_seconds": 1.0, "predict_seconds": 0.5,
+                             "fit_cpu_seconds": 2.0, "predict_cpu_seconds": 0.25, "errors": {"nike": "failed"}}])
+
+    def points(self, rows):
+        return pd.DataFrame(rows, columns=["h", "y", "yhat", "yhat_lower", "yhat_upper"]).assign(engine="ridge", config="c")
+
+    def test_metrics_match_hand_computed_values(self):
+        points = self.points([
+            (1, 10, 8, 7, 9),     # APE 20%, sMAPE 4/18, outside the interval
+            (2, 0, 1, 0, 2),      # no APE (zero actual), sMAPE 2
+            (3, 0, 0, -1, 1),     # both zero: sMAPE 0
+            (5, 20, 25, 15, 30),  # APE 25%, sMAPE 10/45
+        ])
+        summary = summarize_backtest(points, self.timings, [3, 5]).set_index("horizon")
+        self.assertAlmostEqual(summary.loc[3, "mape"], 20.0)
+        self.assertAlmostEqual(summary.loc[3, "smape"], 100 * (4 / 18 + 2 + 0) / 3)
+        self.assertAlmostEqual(summary.loc[3, "coverage"], 2 / 3)
+        self.assertEqual(summary.loc[3, "points"], 3)
+        self.assertAlmostEqual(summary.loc[5, "mape"], 22.5)
+        self.assertAlmostEqual(summary.loc[5, "smape"], 100 * (4 / 18 + 2 + 0 + 10 / 45) / 4)
+        self.assertAlmostEqual(summary.loc[5, "coverage"], 0.75)
+        self.assertEqual(summary.loc[5, "cpu_seconds"], 2.25)
+        self.assertEqual(summary.loc[5, "errors"], 1)
+
+    def test_mape_undefined_when_every_actual_is_zero(self):
+        summary = summarize_backtest(self.points([(1, 0, 3, 0, 4)]), self.timings, [1])
+        self.assertTrue(np.isnan(summary.loc[0, "mape"]))
+        self.assertAlmostEqual(summary.loc[0, "smape"], 200.0)
+
+
+class ForecastStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.path = os.path.join(self.tmp, "forecast.parquet")
+        self.forecast = pd.DataFrame({
+            "ds": list(pd.date_range("2024-01-01", periods=3)) * 2,
+            "brand": ["nike"] * 3 + ["apple"] * 3,
+            "type": ["actual", "actual", "forecasted"] * 2,
+            "yhat": np.arange(6, dtype=float), "yhat_lower": np.arange(6) - 1.0, "yhat_upper": np.arange(6) + 1.0,
+            "trend": np.arange(6, dtype=float), "additive_terms": 0.0, "weekly": 0.0,
+        })
+
+    def test_compact_keeps_only_output_columns(self):
+        compact = compact_forecast(self.forecast)
+        self.assertEqual(list(compact.columns), FORECAST_OUTPUT_COLUMNS)
+        self.assertEqual(compact["yhat"].dtype, np.float32)
+        self.assertIsInstance(compact["brand"].dtype, pd.CategoricalDtype)
+
+    def test_round_trip(self):
+        save_forecast(self.forecast, self.path)
+        loaded = load_forecast(self.path).sort_values(["brand", "ds"]).reset_index(drop=True)
+        expected = self.forecast.sort_values(["brand", "ds"]).reset_index(drop=True)
+        self.assertEqual(set(loaded.columns), set(FORECAST_OUTPUT_COLUMNS))
+        self.assertEqual(loaded["brand"].astype(str).tolist(), expected["brand"].tolist())
+        np.testing.assert_allclose(loaded["yhat"], expected["yhat"])
+        self.assertEqual(load_forecast(self.path, brands=["nike"])["brand"].astype(str).unique().tolist(), ["nike"])
+
+    def test_interrupted_write_keeps_previous_forecast(self):
+        save_forecast(self.forecast, self.path)
+
+        def crash(df, path, **kwargs):
+            os.makedirs(os.path.join(path, "brand=nike"))
+            raise OSError("disk full")
+
+        with mock.patch.object(pd.DataFrame, "to_parquet", crash), self.assertRaises(OSError):
+            save_forecast(self.forecast.assign(yhat=100.0), self.path)
+        self.assertEqual(load_forecast(self.path)["yhat"].max(), 5.0)
+
+        save_forecast(self.forecast.assign(yhat=100.0), self.path)
+        self.assertEqual(load_forecast(self.path)["yhat"].min(), 100.0)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+
+class BrandDeletionIndexTests(SimpleTestCase):
+    brands = ["nike", "apple", "microsoft", "coca-cola", "samsung", "google", "amazon"]
+
+    def setUp(self):
+        self.index = BrandDeletionIndex(self.brands)
+
+    def test_misspellings_match(self):
+        for text, brand in (("new nikee shoes", "nike"), ("micro soft update", "microsoft"),
+                            ("a cold cocacola", "coca-cola"), ("my appel watch", "apple"),
+                            ("Coca Cola classic", "coca-cola"), ("samsnug phone", "samsung")):
+            self.assertEqual(self.index.find_mentions(text), [brand], text)
+
+    def test_near_words_do_not_match(self):
+        for text in ("rode my bike", "mike said hi", "apply now", *DEFAULT_IGNORED_TOKENS):
+            self.assertEqual(self.index.find_mentions(text), [], text)
+
+    def test_each_brand_reported_once(self):
+        self.assertEqual(self.index.find_mentions("nike nikee apple NIKE"), ["nike", "apple"])
+
+    def test_inverted_index_lists_each_tweet_once(self):
+        df = pd.DataFrame({"tweets": ["Nike nikee run", "apple", "nikee"]}, index=[10, 11, 12])
+        nlp = mock.Mock(pipe=lambda tweets, batch_size: [mock.Mock(ents=[]) for _ in tweets])
+        self.assertEqual(build_inverted_index(df, ["nike", "apple"], nlp, fuzzy=True), {"nike": [10, 12], "apple": [11]})
+
+
+class QuantileSketchTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.values = np.concatenate([rng.lognormal(5, 2, 20_000), -rng.lognormal(1, 1, 2_000), np.zeros(500)])
+        rng.shuffle(self.values)
+
+    def test_quantiles_within_relative_accuracy(self):
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for batch in np.array_split(self.values, 7):
+            sketch.update(batch)
+        for q in (0.0, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 1.0):
+            exact = np.quantile(self.values, q, method="lower")
+            self.assertLessEqual(abs(sketch.quantile(q) - exact), 0.01 * abs(exact) + 1e-12, q)
+
+    def test_merge_matches_single_sketch(self):
+        whole = QuantileSketch()
+        whole.update(self.values)
+        left, right = QuantileSketch(), QuantileSketch()
+        left.update(self.values[:9_000])
+        right.update(self.values[9_000:])
+        merged = left.merge(right)
+        self.assertEqual(merged.to_dict(), whole.to_dict())
+
+    def test_merge_rejects_other_accuracy(self):
+        with self.assertRaises(ValueError):
+            QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+    def test_round_trip(self):
+        sketch = QuantileSketch()
+        sketch.update(self.values)
+        self.assertEqual(QuantileSketch.from_dict(json.loads(json.dumps(sketch.to_dict()))).quantile(0.9), sketch.quantile(0.9))
+
+
+class OnlineEngagementScorerTests(SimpleTestCase):
+    def test_batches_give_the_statistics_of_all_rows(self):
+        rng = np.random.default_rng(3)
+        df = pd.DataFrame({feature: rng.poisson(20, 3_000).astype(float) for feature in ENGAGEMENT_FEATURES})
+        df["followersCount"] = rng.lognormal(6, 1.5, 3_000)
+
+        scorer = OnlineEngagementScorer()
+        for batch in np.array_split(df, 4):
+            scorer = OnlineEngagementScorer.from_dict(json.loads(json.dumps(scorer.partial_fit(batch).to_dict())))
+        model = scorer.as_model()
+
+        self.assertEqual(model["n_rows"], 3_000)
+        for feature in ENGAGEMENT_FEATURES:
+            self.assertAlmostEqual(model["engagement_scaler"][feature]["mean"], df[feature].mean())
+            self.assertAlmostEqual(model["engagement_scaler"][feature]["scale"], df[feature].std(ddof=0))
+        median = np.quantile(df["followersCount"], 0.5, method="lower")
+        self.assertLessEqual(abs(model["followers_scaler"]["center"] - median), 0.01 * median)
+
+    def test_model_needs_data(self):
+        with self.assertRaises(ValueError):
+            OnlineEngagementScorer().as_model()
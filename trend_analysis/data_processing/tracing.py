@@ -0,0 +1,151 @@
+"""
+Request-scoped tracing across the dashboard, the API and the pipeline services.
+
+With DASHBOARD_TRACING=true the dashboard starts one trace per interaction and sends a W3C
+`traceparent` header with every API call. tracing_middleware continues that trace in a
+span for the request, and spans opened inside it (each instrumented service call, each background job stage) become
+its descendants. Finished spans are appended as JSON lines to settings.TRACE_FILE, which
+is rotated to TRACE_FILE.1 once it reaches settings.TRACE_FILE_MAX_BYTES; the trace_view
+command prints a trace and its critical path.
+
+Only work inside a trace is recorded: requests without a traceparent header are not
+traced unless settings.TRACE_ALL_REQUESTS is on.
+"""
+import os
+import json
+import time
+import logging
+import secrets
+import threading
+import contextvars
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import List, Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SpanContext = namedtuple("SpanContext", ["trace_id", "span_id"])
+
+_current = contextvars.ContextVar("trace_span", default=None)
+_capture = threading.local()
+_write_lock = threading.Lock()
+
+
+def new_trace() -> SpanContext:
+    """
+    Context for a new trace, with no span of its own yet.
+    """
+    return SpanContext(secrets.token_hex(16), None)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """
+    Parent context from a W3C traceparent header ("00-<trace id>-<span id>-<flags>").
+    None if the header is missing, malformed or not sampled.
+    """
+    if not header:
+        return None
+    parts = header.strip().lower().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        sampled = int(parts[3], 16) & 1
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if not sampled or parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return SpanContext(parts[1], parts[2])
+
+
+def format_traceparent(context: SpanContext) -> str:
+    return f"00-{context.trace_id}-{context.span_id}-01"
+
+
+def current() -> Optional[SpanContext]:
+    """
+    Context of the span running in this thread or coroutine; None outside a trace.
+    """
+    return _current.get()
+
+
+def export(record: dict) -> None:
+    """
+    Write a finished span to the trace file, or to the active capture() buffer.
+    """
+    buffer = getattr(_capture, "spans", None)
+    if buffer is not None:
+        buffer.append(record)
+        return
+    line = json.dumps(record, default=str) + "\n"
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(settings.TRACE_FILE), exist_ok=True)
+            if os.path.exists(settings.TRACE_FILE) and os.path.getsize(settings.TRACE_FILE) >= settings.TRACE_FILE_MAX_BYTES:
+                os.replace(settings.TRACE_FILE, settings.TRACE_FILE + ".1")
+            with open(settings.TRACE_FILE, "a") as f:
+                f.write(line)
+    except OSError as e:
+        # Tracing must never fail the request or stage it records
+        logger.warning(f"Could not write span {record.get('name')} to {settings.TRACE_FILE}: {e}")
+
+
+@contextmanager
+def span(name: str, parent: Optional[SpanContext] = None, **attributes):
+    """
+    Record the block as a span, a child of `parent` (default: the current span). Outside a
+    trace nothing is recorded. Yields the span's attributes dict, so the block can add to it.
+    """
+    parent = parent or _current.get()
+    if parent is None:
+        yield {}
+        return
+
+    context = SpanContext(parent.trace_id, secrets.token_hex(8))
+    token = _current.set(context)
+    started_at = time.time()
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield attributes
+    except BaseException as e:
+        status = "error"
+        attributes["error"] = repr(e)[:200]
+        raise
+    finally:
+        _current.reset(token)
+        export({
+            "trace_id": context.trace_id,
+            "span_id": context.span_id,
+            "parent_id": parent.span_id,
+            "name": name,
+            "service": "api",
+            "start": started_at,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            "status": status,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            "attributes": attributes,
+        })
+
+
+@contextmanager
+def capture(parent: Optional[SpanContext]):
+    """
+    Continue the trace `parent` in a worker process, collecting its spans instead of
+    writing them; the parent process exports them with the task's result.
+    """
+    previous = getattr(_capture, "spans", None)
+    _capture.spans = []
+    token = _current.set(parent)
+    try:
+        yield _capture.spans
+    finally:
+        _current.reset(token)
+        _capture.spans = previous
+
+
+def export_all(records: List[dict]) -> None:
+    for record in records:
+        export(record)
@@ -1,5 +1,6 @@
 from django.urls import path
-from .views import search_brands, process_data, engagement_scores, forecast_trends_api, delete_files
+from . import async_views
+from .views import search_brands, process_data, engagement_scores, forecast_trends_api, delete_files, search_tweets_api, reload_raw_data, submit_pipeline, pipeline_status, pipeline_events, cancel_pipeline, data_table, data_table_brands
 
 urlpatterns = [
 	path('search_brands/', search_brands, name='search_brands'),
@@ -7,4 +8,18 @@ urlpatterns = [
 	path('engagement_scores/', engagement_scores, name='engagement_scores'),
 	path('forecast_trends/', forecast_trends_api, name='forecast_trends'),
 	path('delete_files/', delete_files, name='delete_files'),
+	path('search_tweets/', search_tweets_api, name='search_tweets'),
+	path('pipeline/', submit_pipeline, name='submit_pipeline'),
+	path('pipeline/<str:job_id>/', pipeline_status, name='pipeline_status'),
+	path('pipeline/<str:job_id>/events/', pipeline_events, name='pipeline_events'),
+	path('pipeline/<str:job_id>/cancel/', cancel_pipeline, name='cancel_pipeline'),
+	path('data/<str:name>/', data_table, name='data_table'),
+	path('data/<str:name>/brands/', data_table_brands, name='data_table_brands'),
+	path('admin/reload_data/', reload_raw_data, name='reload_raw_data'),
+	# Async variants for ASGI deployments
+	path('async/process_data/', async_views.process_data, name='async_process_data'),
+	path('async/engagement_scores/', async_views.engagement_scores, name='async_engagement_scores'),
+	path('async/forecast_trends/', async_views.forecast_trends, name='async_forecast_trends'),
+	path('async/pipeline/<str:job_id>/', async_views.pipeline_status, name='async_pipeline_status'),
+	path('async/pipeline/<str:job_id>/events/', async_views.pipeline_events, name='async_pipeline_events'),
 ]
\ No newline at end of file
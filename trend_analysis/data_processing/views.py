@@ -1,75 +1,312 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
-from .services import process_tweets, count_brand_mentions, process_tweets_column, calculate_engagement_score, get_brand_trends, forecast_trends, search_multiple_brands, load_raw_data
+from .services import search_multiple_brands, search_tweets
+from .pipeline import PROJECT_DIR, raw_dataset, current_selection, run_process_stage, run_engagement_stage, run_forecast_stage, PipelineError
+from .jobs import Job, JobRunner, job_events
+from .data_api import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, FORMATS, ArrowRenderer, ParquetRenderer, DataQueryError, read_table, list_brands, page, encode_page, table_version, make_etag
+from rest_framework.renderers import JSONRenderer
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from .permissions import HasAdminToken
+from .concurrency import StageBusy
+from . import metrics
+from .profiling import profile_session, requested_mode
+from django.conf import settings
 import os 
+import json
+import shutil
 
-PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
 print(PROJECT_DIR)
-# Store processed data globally (for the lifetime of the server)
-raw_data = load_raw_data(f"{PROJECT_DIR}/temp/test_data_set.parquet")
-processed_data = None  # Initially empty
-engagement_scores_cache = None  # Cache engagement scores
-brand_trends_cache = None  # Cache brand trends
+# Largest 'k' accepted by /search
+MAX_SEARCH_RESULTS = 1000
+# Background pipeline jobs, run in this process
+job_runner = JobRunner(max_workers=settings.PIPELINE_JOB_WORKERS, history=settings.PIPELINE_JOB_HISTORY)
+
+
+def _busy_response(error: StageBusy):
+    return Response({"error": str(error)}, status=503, headers={"Retry-After": str(int(error.wait))})
 
 
 
 @api_view(['POST'])
 def search_brands(request):
     brands = request.data.get("brands", [])  
-    valid_brands, not_available = search_multiple_brands(raw_data, brands)
+    fuzzy = bool(request.data.get("fuzzy", False))
+    valid_brands, not_available = search_multiple_brands(raw_dataset.get().data, brands, fuzzy=fuzzy)
     return Response({"valid_brands": valid_brands, "not_available": not_available})
 
 @api_view(['POST'])
 def process_data(request):
-    global processed_data 
-
     brands = request.data.get("brands", [])
+    if not brands:
+        return Response({"error": "'brands' is required."}, status=400)
+    fuzzy = bool(request.data.get("fuzzy", False))
 
-    if processed_data is None:
-        processed_data = process_tweets_column(raw_data, "tweets")
-        processed_data = process_tweets(processed_data, brands)
-        
-    count = count_brand_mentions(processed_data)
-    count_F = os.path.join(PROJECT_DIR, "data_lake/count", "count.parquet")
-    count.to_parquet(count_F, index=False)
+    try:
+        run_process_stage(brands, fuzzy)
+    except StageBusy as e:
+        return _busy_response(e)
 
     return Response({"message": "Data processing complete"})
 
+@api_view(['GET'])
+def search_tweets_api(request):
+    query = request.query_params.get("q", "").strip()
+    if not query:
+        return Response({"error": "Query parameter 'q' is required."}, status=400)
+
+    try:
+        k = int(request.query_params.get("k", 10))
+    except ValueError:
+        k = None
+    if k is None or not 1 <= k <= MAX_SEARCH_RESULTS:
+        return Response({"error": f"'k' must be an integer between 1 and {MAX_SEARCH_RESULTS}."}, status=400)
+
+    brands = [b.strip().lower() for b in request.query_params.get("brands", "").split(",") if b.strip()]
+
+    try:
+        results = search_tweets(
+            query,
+            k=k,
+            brands=brands or None,
+            start_date=request.query_params.get("start_date"),
+            end_date=request.query_params.get("end_date"),
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    return Response({"query": query, "count": len(results), "results": results})
+
 @api_view(['GET'])
 def engagement_scores(request):
-    global engagement_scores_cache
+    active_brands, fuzzy = current_selection()
+    brands = [b.strip() for b in request.query_params.get("brands", "").split(",") if b.strip()] or active_brands
+    retrain = request.query_params.get("retrain") == "1"
 
-    if processed_data is None:
-        return Response({"error": "Data not processed yet. Call /process_data first."}, status=400)
-    
-    if engagement_scores_cache is None:
-        engagement_scores_cache = calculate_engagement_score(processed_data)
-        enSc_output_F = os.path.join(PROJECT_DIR, "data_lake/engagement_score", "engagement_score.parquet")
-        engagement_scores_cache.to_parquet(enSc_output_F, index=False)
+    try:
+        scores = run_engagement_stage(brands, fuzzy, retrain=retrain)
+    except PipelineError as e:
+        return Response({"error": str(e)}, status=e.status)
+    except StageBusy as e:
+        return _busy_response(e)
 
-    return Response({"engagement_scores"})
+    return Response({
+        "message": "Engagement scores calculated",
+        "rows": len(scores),
+        "brands": brands,
+        "data_url": "/api/data/engagement_scores/",
+    })
 
 
 @api_view(['POST'])
 def forecast_trends_api(request):
-    global engagement_scores_cache
-    global brand_trends_cache
+    active_brands, fuzzy = current_selection()
+    brands = request.data.get("brands") or active_brands
+
+    try:
+        brand_status = run_forecast_stage(brands, fuzzy, engine=request.data.get("engine"))
+    except PipelineError as e:
+        return Response({"error": str(e)}, status=e.status)
+    except StageBusy as e:
+        return _busy_response(e)
+
+    return Response({"message": "Trend forecasting complete", "brands": brand_status})
+
+
+def _csv_param(value):
+    return [item.strip() for item in value.split(",") if item.strip()] if value else None
+
+
+def _cache_headers(response, etag):
+    """
+    Make a data response cacheable: clients may reuse it for DATA_CACHE_MAX_AGE seconds,
+    then revalidate it with If-None-Match.
+    """
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=settings.DATA_CACHE_MAX_AGE, must_revalidate=True)
+    patch_vary_headers(response, ["Accept"])
+    return response
+
+
+def _not_modified(request, etag):
+    """
+    304 response if the client's If-None-Match already names `etag`, else None.
+    """
+    response = get_conditional_response(request, etag=etag)
+    return _cache_headers(response, etag) if response is not None else None
+
+
+@api_view(['GET'])
+@renderer_classes([JSONRenderer, ArrowRenderer, ParquetRenderer])
+def data_table(request, name):
+    """
+    One page of a data lake table (engagement_scores, mention_counts or forecast).
+
+    Query parameters: columns, brands (comma-separated), start_date, end_date, limit, cursor
+    and format (arrow, parquet or json; otherwise taken from the Accept header, default json).
+    Binary pages carry the paging state in X-Next-Cursor and X-Total-Rows headers.
+    Pages carry an ETag of the table version and query; If-None-Match gets a 304.
+    """
+    params = request.query_params
+    # Errors are always JSON, whatever format the client asked for
+    try:
+        limit = int(params.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": "'limit' must be an integer."}, status=400)
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        return JsonResponse({"error": f"'limit' must be between 1 and {MAX_PAGE_SIZE}."}, status=400)
+
+    fmt = request.accepted_renderer.format
+    query = [name, fmt, sorted(params.items())]
+    try:
+        not_modified = _not_modified(request, make_etag(table_version(name), *query))
+        if not_modified is not None:
+            return not_modified
+        table, version = read_table(
+            name,
+            columns=_csv_param(params.get("columns")),
+            brands=_csv_param(params.get("brands")),
+            start_date=params.get("start_date"),
+            end_date=params.get("end_date"),
+        )
+        chunk, next_cursor = page(table, version, params.get("cursor"), limit)
+    except DataQueryError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+
+    body = encode_page(chunk, fmt)
+    if fmt == "json":
+        body = b'{"total_rows": %d, "next_cursor": %s, "rows": %s}' % (
+            table.num_rows, json.dumps(next_cursor).encode(), body
+        )
+    response = HttpResponse(body, content_type=FORMATS[fmt])
+    response["X-Total-Rows"] = str(table.num_rows)
+    response["X-Data-Version"] = version
+    if next_cursor:
+        response["X-Next-Cursor"] = next_cursor
+    # Tagged with the version actually read, in case the table changed since the check above
+    return _cache_headers(response, make_etag(version, *query))
+
+
+@api_view(['GET'])
+def data_table_brands(request, name):
+    try:
+        etag = make_etag(table_version(name), name, "brands")
+        not_modified = _not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+        return _cache_headers(Response({"table": name, "brands": list_brands(name)}), etag)
+    except DataQueryError as e:
+        return Response({"error": str(e)}, status=e.status)
+
+
+@api_view(['POST'])
+def submit_pipeline(request):
+    """
+    Run processing, engagement scoring and forecasting for `brands` as one background job.
+    Returns the job id at once; poll /pipeline/<job_id>/ for progress.
+    With "profile": true (or a profile mode) each stage is profiled and its result lists
+    the profile files; this needs the admin token unless DEBUG is on.
+    """
     brands = request.data.get("brands", [])
+    if not brands:
+        return Response({"error": "'brands' is required."}, status=400)
+    fuzzy = bool(request.data.get("fuzzy", False))
+    retrain = bool(request.data.get("retrain", False))
+    engine = request.data.get("engine")
+    profile_mode = requested_mode(str(request.data.get("profile", "")))
+    if profile_mode is not None and not HasAdminToken().has_permission(request, None):
+        return Response({"error": HasAdminToken.message}, status=403)
 
-    if processed_data is None:
-        return Response({"error": "Data not processed yet. Call /process_data first."}, status=400)
-    
-    if engagement_scores_cache is None:
-        return Response({"error": "Engagement scores not calculated. Call /engagement_scores first."}, status=400)
-    
-    if brand_trends_cache is None:
-        brand_trends_cache = get_brand_trends(engagement_scores_cache, brands)
+    def process(job):
+        processed = run_process_stage(brands, fuzzy, progress=job.report_progress)
+        return {"tweets": len(processed)}
+
+    def score(job):
+        scores = run_engagement_stage(brands, fuzzy, retrain=retrain)
+        return {"tweets": len(scores)}
+
+    def forecast(job):
+        return {"brands": run_forecast_stage(brands, fuzzy, engine=engine, progress=job.report_progress)}
+
+    def profiled(name, fn):
+        def run(job):
+            with profile_session(f"pipeline-{name}", profile_mode) as files:
+                result = fn(job)
+            return {**result, "profile_files": files}
+        return run
+
+    stages = [("process_data", process), ("engagement_scores", score), ("forecast_trends", forecast)]
+    if profile_mode is not None:
+        stages = [(name, profiled(name, fn)) for name, fn in stages]
+    job = job_runner.submit(Job(
+        "pipeline",
+        stages,
+        params={"brands": brands, "fuzzy": fuzzy, "retrain": retrain, "engine": engine, "profile": profile_mode},
+    ))
+    return Response({"job_id": job.id, "status": job.status}, status=202)
+
+
+@api_view(['GET'])
+def pipeline_status(request, job_id):
+    job = job_runner.get(job_id)
+    if job is None:
+        return Response({"error": f"Unknown job '{job_id}'."}, status=404)
+    return Response(job.to_dict())
+
+
+EVENT_STREAM_TYPES = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}
+
+
+def event_stream_format(request) -> str:
+    requested = request.GET.get("format")
+    if requested in EVENT_STREAM_TYPES:
+        return requested
+    return "ndjson" if "application/x-ndjson" in request.headers.get("Accept", "") else "sse"
 
-    forecasted_data = forecast_trends(brand_trends_cache, 30)
-    output_processed = os.path.join(PROJECT_DIR, "data_lake/processed", "mini_final_with_trends.parquet")
-    forecasted_data.to_parquet(output_processed, index=False)
 
-    return Response({"message": "Trend forecasting complete"})
+def encode_job_event(snapshot, fmt: str) -> bytes:
+    """
+    One job state as a Server-Sent Event or an NDJSON line; None is a keep-alive
+    (an SSE comment, or an empty line that NDJSON readers skip).
+    """
+    if snapshot is None:
+        return b": keep-alive\n\n" if fmt == "sse" else b"\n"
+    data = json.dumps(snapshot, default=str)
+    if fmt == "sse":
+        return f"id: {snapshot['revision']}\nevent: job\ndata: {data}\n\n".encode()
+    return f"{data}\n".encode()
+
+
+def event_stream_response(events, fmt: str) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type=EVENT_STREAM_TYPES[fmt])
+    response["Cache-Control"] = "no-cache"
+    # Stop reverse proxies (nginx) from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@require_GET
+def pipeline_events(request, job_id):
+    """
+    Stream the job's status and per-stage progress (with ETA) as it changes, until it
+    finishes. Server-Sent Events by default; NDJSON with ?format=ndjson or
+    Accept: application/x-ndjson.
+    """
+    job = job_runner.get(job_id)
+    if job is None:
+        return JsonResponse({"error": f"Unknown job '{job_id}'."}, status=404)
+    fmt = event_stream_format(request)
+    events = (encode_job_event(snapshot, fmt) for snapshot in job_events(job, settings.PIPELINE_EVENTS_HEARTBEAT))
+    return event_stream_response(events, fmt)
+
+
+@api_view(['POST'])
+def cancel_pipeline(request, job_id):
+    job = job_runner.cancel(job_id)
+    if job is None:
+        return Response({"error": f"Unknown job '{job_id}'."}, status=404)
+    return Response(job.to_dict())
 
 
 
@@ -85,7 +322,11 @@ def delete_files(request):
     try:
         deleted_files = []
         for file in file_paths:
-            if os.path.exists(file):
+            if os.path.isdir(file):
+                # The forecast is a brand-partitioned parquet dataset
+                shutil.rmtree(file)
+                deleted_files.append(file)
+            elif os.path.exists(file):
                 os.remove(file)
                 deleted_files.append(file)
 
@@ -96,4 +337,32 @@ def delete_files(request):
         return Response({"message": "Processed files deleted successfully!", "deleted_files": deleted_files})
     
     except Exception as e:
-        return Response({"error": str(e)}, status=500)
\ No newline at end of file
+        return Response({"error": str(e)}, status=500)
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Stage and request metrics in the Prometheus text format, for scraping.
+    """
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@api_view(['POST'])
+@permission_classes([HasAdminToken])
+def reload_raw_data(request):
+    """
+    Re-read the raw dataset now instead of waiting for the next version check.
+    """
+    previous = raw_dataset.snapshot
+    try:
+        snapshot = raw_dataset.reload()
+    except Exception as e:
+        return Response({"error": str(e)}, status=500)
+
+    return Response({
+        "message": "Raw data reloaded",
+        "version": snapshot.version,
+        "previous_version": previous.version if previous is not None else None,
+        "rows": len(snapshot.data),
+    })
@@ -26,6 +26,69 @@ BEARER_TOKEN_API = os.getenv('BEARER_TOKEN_API')
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_LAKE_PATH = os.path.join(BASE_DIR, 'data_lake')
+SEARCH_INDEX_PATH = os.path.join(DATA_LAKE_PATH, 'search_index')
+ENGAGEMENT_MODEL_DIR = os.path.join(DATA_LAKE_PATH, 'models', 'engagement')
+ENGAGEMENT_ONLINE_STATE_PATH = os.path.join(ENGAGEMENT_MODEL_DIR, 'online_state.json')
+# Retrain the engagement model when a feature's mean moves more than this many training std devs
+ENGAGEMENT_DRIFT_THRESHOLD = float(os.getenv('ENGAGEMENT_DRIFT_THRESHOLD', 0.5))
+# random_forest | random_forest_subsampled | hist_gradient_boosting | linear
+ENGAGEMENT_WEIGHT_BACKEND = os.getenv('ENGAGEMENT_WEIGHT_BACKEND', 'random_forest')
+
+# Forecasting: brands are fitted in a persistent pool of warm worker processes
+FORECAST_WORKERS = int(os.getenv('FORECAST_WORKERS', min(4, os.cpu_count() or 1)))
+FORECAST_BRAND_TIMEOUT = float(os.getenv('FORECAST_BRAND_TIMEOUT', 300))
+# Not 'fork': the server is threaded, and a child forked from it can inherit locks held by other threads
+FORECAST_START_METHOD = os.getenv('FORECAST_START_METHOD', 'forkserver' if os.name == 'posix' else 'spawn')
+FORECAST_CACHE_ENABLED = os.getenv('FORECAST_CACHE_ENABLED', 'true').lower() == 'true'
+FORECAST_CACHE_DIR = os.path.join(DATA_LAKE_PATH, 'forecast_cache')
+FORECAST_ENGINE = os.getenv('FORECAST_ENGINE', 'auto')  # auto, prophet or ridge
+FORECAST_MIN_PROPHET_DAYS = int(os.getenv('FORECAST_MIN_PROPHET_DAYS', 90))
+
+# Raw tweets served by the API; loaded on first use and reloaded when the file changes
+RAW_DATA_PATH = os.getenv('RAW_DATA_PATH', os.path.join(BASE_DIR.parent, 'temp', 'test_data_set.parquet'))
+RAW_DATA_CHECK_INTERVAL = float(os.getenv('RAW_DATA_CHECK_INTERVAL', 5))
+# Token for the admin endpoints (X-Admin-Token header); unset means open only when DEBUG is on
+ADMIN_API_TOKEN = os.getenv('ADMIN_API_TOKEN')
+
+# In-memory cache of pipeline stage results (cleaned tweets, processed tweets, scores, trends)
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 32))
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_MB', 1024)) * 2**20
+# Concurrent runs allowed per pipeline stage, and how long a request waits for a free slot
+PIPELINE_STAGE_CONCURRENCY = {
+    'cleaned': int(os.getenv('PIPELINE_CLEAN_CONCURRENCY', 1)),
+    'processed': int(os.getenv('PIPELINE_PROCESS_CONCURRENCY', 1)),
+    'engagement_scores': int(os.getenv('PIPELINE_SCORE_CONCURRENCY', 2)),
+    'brand_trends': int(os.getenv('PIPELINE_TRENDS_CONCURRENCY', 4)),
+    'forecast': int(os.getenv('PIPELINE_FORECAST_CONCURRENCY', 1)),
+}
+PIPELINE_STAGE_WAIT = float(os.getenv('PIPELINE_STAGE_WAIT', 30))
+# Worker processes for tweet cleaning and brand extraction (0 = run on the request thread)
+PIPELINE_PROCESS_WORKERS = int(os.getenv('PIPELINE_PROCESS_WORKERS', min(2, os.cpu_count() or 1)))
+PIPELINE_PROCESS_START_METHOD = os.getenv('PIPELINE_PROCESS_START_METHOD') or FORECAST_START_METHOD
+# Rows per task sent to the process pool; progress is reported as tasks finish
+PIPELINE_CHUNK_ROWS = int(os.getenv('PIPELINE_CHUNK_ROWS', 20000))
+# Background pipeline jobs (/api/pipeline/): worker threads and finished jobs kept for status queries
+PIPELINE_JOB_WORKERS = int(os.getenv('PIPELINE_JOB_WORKERS', 2))
+PIPELINE_JOB_HISTORY = int(os.getenv('PIPELINE_JOB_HISTORY', 100))
+# Seconds between keep-alives on /api/pipeline/<job_id>/events/ while a job is quiet
+PIPELINE_EVENTS_HEARTBEAT = float(os.getenv('PIPELINE_EVENTS_HEARTBEAT', 15))
+# Opt-in profiling: PROFILE_STAGES profiles every service call; requests can ask with ?profile=1.
+# cprofile writes .pstats files, sampling writes collapsed stacks for flamegraphs, or both
+PROFILE_STAGES = os.getenv('PROFILE_STAGES', 'false').lower() == 'true'
+PROFILE_MODE = os.getenv('PROFILE_MODE', 'cprofile')
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.005))
+PROFILE_DIR = os.path.join(BASE_DIR, 'logs', 'profiles')
+# Spans of traced requests (traceparent header from the dashboard) are appended here as JSON lines.
+# TRACE_ALL_REQUESTS also traces requests that come without one
+TRACE_FILE = os.getenv('TRACE_FILE', os.path.join(BASE_DIR, 'logs', 'traces.jsonl'))
+TRACE_ALL_REQUESTS = os.getenv('TRACE_ALL_REQUESTS', 'false').lower() == 'true'
+# Size at which the trace file is rotated to TRACE_FILE.1, replacing the previous one
+TRACE_FILE_MAX_BYTES = int(os.getenv('TRACE_FILE_MAX_MB', 100)) * 2**20
+# Seconds clients may reuse /api/data/ responses before revalidating them (ETag / If-None-Match)
+DATA_CACHE_MAX_AGE = int(os.getenv('DATA_CACHE_MAX_AGE', 10))
+# In-memory cache of filtered /api/data/ tables being paged through, separate from the stage results
+DATA_QUERY_CACHE_MAX_ENTRIES = int(os.getenv('DATA_QUERY_CACHE_MAX_ENTRIES', 64))
+DATA_QUERY_CACHE_MAX_BYTES = int(os.getenv('DATA_QUERY_CACHE_MAX_MB', 256)) * 2**20
 
 
 
@@ -58,6 +121,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'data_processing.middleware.tracing_middleware',
+    'data_processing.middleware.request_metrics_middleware',
+    'data_processing.middleware.profile_request_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
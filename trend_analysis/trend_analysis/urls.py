@@ -16,9 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from data_processing.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
 	path('api/', include('data_processing.urls')),
+	path('metrics', metrics_view, name='metrics'),
 	
 ]